@@ -0,0 +1,184 @@
+"""
+Headless analysis: run the CrowdSafe pipeline over a video file and stream
+metrics as JSONL or CSV, without Flask, the database or Socket.IO.
+
+CrowdSafeAI, CrowdAnalyzer and RiskCalculator are wired directly through
+FramePipeline, the same per-frame path the server uses, with timestamps taken
+from the media clock, so runs are reproducible and comparable with the
+server's stored metrics.
+
+Usage:
+    python analyze_video.py path/to/video.mp4 [--format jsonl|csv] [--output FILE]
+                            [--frame-skip N] [--interval SECONDS] [--max-frames N]
+                            [--imgsz 960] [--backend pytorch|onnx|openvino|tensorrt]
+                            [--device cpu|0] [--tracker botsort|bytetrack|centroid]
+                            [--area 100] [--capacity 500] [--no-cache]
+
+Detections are cached next to other runs in DETECTION_CACHE_FOLDER (see
+backend/services/detection_cache.py): the first full pass records them, later
+runs with the same model/imgsz/conf/tracker skip YOLO and the tracker.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+
+import cv2
+
+from config import Config
+from backend.services.ai_engine import CrowdSafeAI
+from backend.services.crowd_analyzer import CrowdAnalyzer
+from backend.services.detection_cache import DetectionCache
+from backend.services.frame_pipeline import FramePipeline
+from backend.services.media_clock import MediaClock
+from backend.services.risk_calculator import RiskCalculator
+from backend.services.trackers import TRACKER_CHOICES
+
+# Exported model naming used by `yolo export`, relative to the .pt stem
+BACKEND_SUFFIX = {
+    'pytorch': '.pt',
+    'torchscript': '.torchscript',
+    'onnx': '.onnx',
+    'openvino': '_openvino_model',
+    'tensorrt': '.engine',
+}
+
+
+def build_config(args):
+    overrides = {
+        'YOLO_IMGSZ': args.imgsz,
+        'YOLO_DEVICE': args.device,
+        'TRACKER': args.tracker,
+    }
+    model = args.model or Config.YOLO_MODEL
+    if args.backend:
+        model = os.path.splitext(model)[0] + BACKEND_SUFFIX[args.backend]
+    overrides['YOLO_MODEL'] = model
+    if args.conf is not None:
+        overrides['YOLO_CONFIDENCE'] = args.conf
+    return type('Cfg', (Config,), {k: v for k, v in overrides.items() if v is not None})
+
+
+class MetricWriter:
+    """Line-buffered JSONL / CSV writer so consumers can follow the stream."""
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        self._csv = None
+
+    def write(self, metrics):
+        if self.fmt == 'jsonl':
+            self.stream.write(json.dumps(metrics) + '\n')
+        else:
+            if self._csv is None:
+                self._csv = csv.DictWriter(self.stream, fieldnames=list(metrics))
+                self._csv.writeheader()
+            self._csv.writerow(metrics)
+        self.stream.flush()
+
+
+def run(args, out):
+    cfg = build_config(args)
+    ai = CrowdSafeAI(cfg)
+    pipeline = FramePipeline(
+        'cli', ai, CrowdAnalyzer(cfg), RiskCalculator(cfg),
+        area_sqm=args.area, expected_capacity=args.capacity, tracker=cfg.TRACKER,
+    )
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open video: {args.video}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    clock = MediaClock(cap, args.video, origin=args.origin)
+    writer = MetricWriter(out, args.format)
+    if not args.no_cache:
+        pipeline.cache = DetectionCache.for_video(args.video, cfg, pipeline.tracker.name)
+        if pipeline.cache is not None and args.frame_skip > 1:
+            pipeline.cache.close()  # replay only: a skipping pass cannot record
+
+    frame_index = 0
+    analyzed = 0
+    last_emit = None
+    started = time.perf_counter()
+    try:
+        while args.max_frames is None or frame_index < args.max_frames:
+            # grab() demuxes without decoding, so skipped frames are cheap
+            if not cap.grab():
+                if pipeline.cache is not None:
+                    pipeline.cache.finish()
+                break
+            frame_index += 1
+            frame_ts = clock.tick(cap)
+            if (frame_index - 1) % args.frame_skip:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+
+            _, analysis, ml_analysis, risk_score, risk_level = pipeline.process(
+                frame, frame_ts, fps, frame_index=frame_index - 1)
+            analyzed += 1
+
+            if last_emit is not None and clock.media_time - last_emit < args.interval:
+                continue
+            last_emit = clock.media_time
+            metrics = pipeline.build_metrics(
+                analysis, ml_analysis, risk_score, risk_level,
+                frame_number=frame_index,
+                timestamp=frame_ts,
+                media_time=clock.media_time,
+            )
+            metrics['processing_time_ms'] = analysis.get('processing_time_ms', 0)
+            writer.write(metrics)
+    finally:
+        cap.release()
+        if pipeline.cache is not None:
+            pipeline.cache.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"{analyzed} frames analysed ({frame_index} read) in {elapsed:.1f}s "
+          f"({analyzed / max(elapsed, 1e-9):.1f} fps)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('video', help='Video file to analyse')
+    parser.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl')
+    parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+    parser.add_argument('--frame-skip', type=int, default=1,
+                        help='Analyse every Nth frame (default 1 = every frame)')
+    parser.add_argument('--interval', type=float, default=0.0,
+                        help='Emit at most one row per this many media seconds (default: every analysed frame)')
+    parser.add_argument('--max-frames', type=int, default=None)
+    parser.add_argument('--imgsz', type=int, default=None, help=f'YOLO input size (default {Config.YOLO_IMGSZ})')
+    parser.add_argument('--model', default=None, help=f'Model file in MODEL_FOLDER (default {Config.YOLO_MODEL})')
+    parser.add_argument('--backend', choices=sorted(BACKEND_SUFFIX), default=None,
+                        help='Inference backend; picks the matching exported model file')
+    parser.add_argument('--device', default=None, help="Inference device, e.g. 'cpu', '0'")
+    parser.add_argument('--conf', type=float, default=None, help='Detection confidence threshold')
+    parser.add_argument('--tracker', choices=TRACKER_CHOICES, default=None)
+    parser.add_argument('--area', type=float, default=Config.SCENE_AREA_SQ_METERS, help='Monitored area in m^2')
+    parser.add_argument('--capacity', type=int, default=500, help='Expected capacity (people)')
+    parser.add_argument('--no-cache', action='store_true', help='Neither read nor record the detection cache')
+    parser.add_argument('--origin', type=float, default=0.0,
+                        help='Epoch seconds of the first frame (default 0, timestamps = media time)')
+    args = parser.parse_args()
+    if args.frame_skip < 1:
+        parser.error('--frame-skip must be >= 1')
+
+    # Keep stdout clean for the metric stream
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', newline='') as out:
+            run(args, out)
+    else:
+        run(args, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
 from backend import create_app
 from backend.extensions import socketio
+from backend.services.task_scheduler import task_scheduler
 from config import Config
 
 app = create_app()
+task_scheduler.init_app(app)
 
 if __name__ == '__main__':
     socketio.run(app, host=Config.HOST, port=Config.PORT, debug=Config.DEBUG,
@@ -1,10 +1,22 @@
-from flask import Flask
-from config import Config
-from backend.extensions import db, socketio
+"""
+CrowdSafe backend package.
+
+Flask, SQLAlchemy and Socket.IO are imported inside create_app() so the
+analysis services (backend.services.ai_engine, crowd_analyzer, ...) can be
+imported by headless tools without pulling in the web stack.
+"""
+
 import os
 
 
-def create_app(config_class=Config):
+def create_app(config_class=None):
+    from flask import Flask
+    from config import Config
+    from backend.extensions import db, socketio
+
+    if config_class is None:
+        config_class = Config
+
     app = Flask(
         __name__,
         template_folder=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'frontend', 'templates'),
@@ -14,7 +26,8 @@ def create_app(config_class=Config):
 
     # Ensure directories exist
     for folder in [app.config['UPLOAD_FOLDER'], app.config['RECORDING_FOLDER'],
-                   app.config['MODEL_FOLDER'],
+                   app.config['MODEL_FOLDER'], app.config['DETECTION_CACHE_FOLDER'],
+                   app.config['REPORT_CACHE_FOLDER'],
                    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance')]:
         os.makedirs(folder, exist_ok=True)
 
@@ -53,14 +66,82 @@ def create_app(config_class=Config):
     # Create tables and default admin
     with app.app_context():
         import backend.models  # noqa: F401
+        _prepare_database()
         db.create_all()
+        _ensure_columns()
+        _ensure_indexes()
         _ensure_defaults(app)
+        _ensure_partitions()
+        _ensure_rollups(app)
 
     return app
 
 
+def _prepare_database():
+    """Create new SQLite databases with incremental auto-vacuum, so dropped metric partitions free disk space."""
+    from sqlalchemy import inspect
+    from backend.extensions import db
+
+    if db.engine.dialect.name != 'sqlite' or inspect(db.engine).get_table_names():
+        return
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.exec_driver_sql('VACUUM')
+
+
+def _ensure_columns(tables=None):
+    """Add columns introduced after a table was first created (create_all skips them)."""
+    from sqlalchemy import inspect, text
+    from backend.extensions import db
+
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in (db.metadata.sorted_tables if tables is None else tables):
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                col_type = col.type.compile(dialect=db.engine.dialect)
+                default = ''
+                if col.default is not None and col.default.is_scalar:
+                    value = col.default.arg
+                    default = f" DEFAULT {int(value) if isinstance(value, bool) else repr(value)}"
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}{default}'))
+
+
+def _ensure_indexes():
+    """Create indexes added to a model after its table was first created."""
+    from backend.extensions import db
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def _ensure_partitions():
+    """Bring metric day partitions up to the Metric schema and move in pre-partitioning rows."""
+    from backend.services.metric_store import metric_store
+
+    metric_store.reload()
+    _ensure_columns(metric_store.tables())
+    metric_store.migrate_legacy()
+
+
+def _ensure_rollups(app):
+    """Backfill metric rollups once for databases that predate them."""
+    from backend.models.metric_rollup import MetricRollup
+    from backend.services.metric_store import metric_store
+
+    if MetricRollup.query.first() is None and metric_store.tables():
+        from backend.tasks.rollups import backfill_rollups
+        backfill_rollups(app)
+
+
 def _ensure_defaults(app):
     """Create default admin user and settings if they don't exist."""
+    from backend.extensions import db
     from backend.models.user import User
     from backend.models.setting import Setting
 
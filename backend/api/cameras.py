@@ -4,10 +4,12 @@ from flask import Blueprint, request, jsonify, Response, current_app
 from werkzeug.utils import secure_filename
 from backend.extensions import db
 from backend.models.camera import Camera
+from backend.models.metric_rollup import MetricRollup
 from backend.models.recording import Recording
 from backend.services.camera_manager import camera_manager
+from backend.services.metric_store import metric_store
 from backend.utils.helpers import generate_id
-from backend.utils.validators import allowed_video_file, sanitize_string
+from backend.utils.validators import allowed_video_file, sanitize_string, validate_tracker
 
 cameras_bp = Blueprint('cameras', __name__)
 
@@ -28,6 +30,9 @@ def list_cameras():
 @cameras_bp.route('', methods=['POST'])
 def create_camera():
     data = request.get_json() or {}
+    tracker = data.get('tracker', current_app.config.get('TRACKER', 'botsort'))
+    if not validate_tracker(tracker):
+        return jsonify({'error': 'Invalid tracker. Allowed: botsort, bytetrack, centroid'}), 400
     cam_id = generate_id('CAM')
     cam = Camera(
         id=cam_id,
@@ -39,6 +44,7 @@ def create_camera():
         expected_capacity=int(data.get('expected_capacity', 500)),
         fps_target=int(data.get('fps_target', 30)),
         resolution=data.get('resolution', '1280x720'),
+        tracker=tracker,
     )
     db.session.add(cam)
     db.session.commit()
@@ -63,7 +69,9 @@ def update_camera(camera_id):
     if not cam:
         return jsonify({'error': 'Camera not found'}), 404
     data = request.get_json() or {}
-    for field in ['name', 'location', 'source_type', 'source_url', 'resolution']:
+    if 'tracker' in data and not validate_tracker(data['tracker']):
+        return jsonify({'error': 'Invalid tracker. Allowed: botsort, bytetrack, centroid'}), 400
+    for field in ['name', 'location', 'source_type', 'source_url', 'resolution', 'tracker']:
         if field in data:
             setattr(cam, field, sanitize_string(str(data[field]), 200))
     for field in ['area_sqm']:
@@ -84,6 +92,8 @@ def delete_camera(camera_id):
     if not cam:
         return jsonify({'error': 'Camera not found'}), 404
     camera_manager.stop_camera(camera_id)
+    metric_store.delete(db.session.connection(), camera_id)
+    MetricRollup.query.filter_by(camera_id=camera_id).delete()
     db.session.delete(cam)
     db.session.commit()
     return jsonify({'message': 'Camera deleted'})
@@ -157,7 +167,8 @@ def start_processing(camera_id):
         return jsonify({'error': 'No video source configured. Upload a video first.'}), 400
     if camera_manager._app is None:
         camera_manager.init_app(current_app._get_current_object())
-    started = camera_manager.start_camera(cam.id, source, cam.area_sqm, cam.expected_capacity)
+    started = camera_manager.start_camera(cam.id, source, cam.area_sqm, cam.expected_capacity,
+                                          tracker=cam.tracker)
     if started:
         cam.status = 'processing'
         db.session.commit()
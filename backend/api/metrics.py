@@ -1,9 +1,20 @@
-from flask import Blueprint, request, jsonify, Response
-from backend.models.metric import Metric
+from flask import Blueprint, request, jsonify, Response, current_app, send_file, stream_with_context
 from backend.models.camera import Camera
+from backend.models.metric import Metric
 from backend.services.camera_manager import camera_manager
-from datetime import datetime, timedelta, timezone
-from sqlalchemy import func
+from backend.services.downsample import lttb, minmax
+from backend.services.metric_ring import MetricRing
+from backend.services.metric_store import metric_store
+from backend.services.report_jobs import FORMATS, report_service
+from backend.services.rollups import (combine, empty_bucket, finalize, fingerprint, range_stats,
+                                      range_stats_multi, summarize)
+from backend.services.task_scheduler import task_scheduler
+from backend.utils.helpers import naive_utc
+import hashlib
+import itertools
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
 
 metrics_bp = Blueprint('metrics', __name__)
 
@@ -18,26 +29,222 @@ def _parse_dt(val):
         return None
 
 
-def _build_query(camera_id, start=None, end=None):
-    """Build filtered query for a camera's metrics."""
-    q = Metric.query.filter_by(camera_id=camera_id)
-    if start:
-        q = q.filter(Metric.timestamp >= start)
-    if end:
-        q = q.filter(Metric.timestamp <= end)
-    return q
+def _max_hold():
+    return float(current_app.config.get('METRIC_HEARTBEAT_SECONDS', 30.0))
+
+
+def _closed_lag():
+    """Seconds after which a bucket's rows (and rollups) are final."""
+    cfg = current_app.config
+    return cfg.get('METRIC_HEARTBEAT_SECONDS', 30.0) + cfg.get('METRIC_FLUSH_INTERVAL', 2.0)
+
+
+def _range_stats_partials(camera_id, start=None, end=None, fmt='all', resolution='day'):
+    """
+    Bucket partials per strftime(fmt) bucket, in bucket order, from rollups
+    for closed buckets and raw rows for the open/partial edges (see rollups.py).
+    """
+    stats = range_stats(camera_id, start, end, fmt=fmt, resolution=resolution,
+                        max_hold=_max_hold(), closed_lag=_closed_lag())
+    return dict(sorted(stats.items()))
+
+
+def _range_stats(camera_id, start=None, end=None, fmt='all', resolution='day'):
+    """Time-weighted statistics per strftime(fmt) bucket (see _range_stats_partials)."""
+    return {bucket: finalize(b)
+            for bucket, b in _range_stats_partials(camera_id, start, end, fmt, resolution).items()}
+
+
+def _range_summary(camera_id, start=None, end=None):
+    """Whole-range statistics (zeros when the range holds no rows)."""
+    return _range_stats(camera_id, start, end).get('all') or finalize(empty_bucket())
+
+
+# interval -> (SQLite strftime bucket pattern, rollup resolution); weekly
+# buckets are summed from day rollups
+_INTERVALS = {
+    'hourly': ('%Y-%m-%d %H:00', 'hour'),
+    'daily': ('%Y-%m-%d', 'day'),
+    'weekly': ('%Y-W%W', 'day'),
+}
+
+
+def _aggregate_row(bucket, r):
+    return {
+        'bucket': bucket,
+        'avg_count': round(r['count_avg'], 1),
+        'max_count': int(r['count_max']),
+        'avg_density': round(r['density_avg'], 3),
+        'max_density': round(r['density_max'], 3),
+        'avg_velocity': round(r['avg_velocity_avg'], 2),
+        'avg_risk': round(r['risk_score_avg'], 3),
+        'max_risk': round(r['risk_score_max'], 3),
+        'sample_count': r['samples'],
+    }
+
+
+def _risk_distribution(stats):
+    """Seconds and share of time at each risk level for one finalize()d bucket."""
+    hold = stats['hold_seconds']
+    return {lvl: {'seconds': round(s, 1), 'percent': round(100.0 * s / hold, 2) if hold else 0.0}
+            for lvl, s in stats['level_seconds'].items()}
+
+
+def _step_series(camera_id, rows, step, max_hold, start, end):
+    """
+    Resample stored rows (mappings, ascending, naive UTC) onto a regular
+    grid over [start, end] by sample-and-hold, in one pass over `rows`.
+    """
+    rows = iter(rows)
+    nxt = next(rows, None)
+    held = held_dict = None
+    t = naive_utc(start)
+    end = naive_utc(end)
+    out = []
+    while t <= end:
+        while nxt is not None and nxt['timestamp'] <= t:
+            held, held_dict = nxt, None
+            nxt = next(rows, None)
+        if held is not None and (t - held['timestamp']).total_seconds() <= max_hold:
+            if held_dict is None:
+                held_dict = Metric.row_to_dict(held)
+            point = dict(held_dict)
+        else:
+            point = {'camera_id': camera_id}
+        point['timestamp'] = t.isoformat() + 'Z'
+        out.append(point)
+        t += timedelta(seconds=step)
+    return out
+
+
+_MAX_PAGE = 10000  # rows per `since` page
+_MAX_STEP_POINTS = 10000  # grid points per step series
+_MAX_RECENT_MINUTES = 24 * 60
+
+_DOWNSAMPLE_FIELDS = ('count', 'density', 'avg_velocity', 'max_velocity', 'surge_rate',
+                      'risk_score', 'capacity_utilization', 'crowd_pressure', 'flow_coherence')
+
+
+def _downsampled(camera_id, start, end, points, field, mode):
+    """`points` rows (mappings) of a chart series over [start, end] from one streaming pass (see downsample.py)."""
+    if start is None:
+        first = metric_store.fetch(camera_id, None, end, limit=1)
+        start = first[0].timestamp if first else None
+    if end is None:
+        last = metric_store.fetch(camera_id, start, None, limit=1, desc=True)
+        end = last[0].timestamp if last else None
+    if start is None or end is None:
+        return []
+    rows = metric_store.scan(camera_id, start, end)
+    if mode == 'minmax':
+        picked = minmax(rows, max(points // 2, 1), field, start, end)
+    else:
+        picked = lttb(rows, points, field, start, end)
+    return picked
+
+
+_SERIES_FORMATS = ('json', 'columns', 'msgpack')
+
+
+def _series_format_error(fmt):
+    """Error response for an unusable `format`, else None."""
+    if fmt not in _SERIES_FORMATS:
+        return jsonify({'error': f'format must be one of: {", ".join(_SERIES_FORMATS)}'}), 400
+    if fmt == 'msgpack':
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            return jsonify({'error': 'MessagePack output requires the msgpack package'}), 501
+    return None
+
+
+def _series(camera_id, rows, fmt):
+    """Metric rows (mappings) as a list of dicts, or columnar for `columns`/`msgpack`."""
+    if fmt == 'json':
+        return [Metric.row_to_dict(r) for r in rows]
+    return {'camera_id': camera_id, **Metric.rows_to_columns(rows)}
+
+
+def _send_series(payload, fmt):
+    if fmt == 'msgpack':
+        import msgpack
+        return Response(msgpack.packb(payload), mimetype='application/msgpack')
+    if fmt == 'columns':
+        # Compact regardless of debug pretty-printing; these responses are large
+        return Response(json.dumps(payload, separators=(',', ':')), mimetype='application/json')
+    return jsonify(payload)
 
 
 @metrics_bp.route('/<camera_id>', methods=['GET'])
 def get_metrics(camera_id):
+    """
+    Stored metrics: the latest `limit` rows in [start, end], a step series
+    of the whole range (`step` seconds apart, at most _MAX_STEP_POINTS
+    points; `limit` does not apply), a downsample (`points`), or with
+    `since=<id>` the rows after that cursor as {metrics, next_cursor,
+    has_more} (`since=0` pages from the beginning of the range).
+
+    `format=columns` returns the rows column-oriented ({camera_id,
+    timestamps (epoch ms), count: [...], ...}) and `format=msgpack` the
+    same as MessagePack; neither applies to step series.
+    """
     limit = request.args.get('limit', 100, type=int)
     start = _parse_dt(request.args.get('start'))
     end = _parse_dt(request.args.get('end'))
+    step = request.args.get('step', type=float)
+    points = request.args.get('points', type=int)
+    since = request.args.get('since', type=int)
+    fmt = request.args.get('format', 'json')
+
+    error = _series_format_error(fmt)
+    if error:
+        return error
+    if fmt != 'json' and step:
+        return jsonify({'error': 'Step series are only available as JSON'}), 400
+
+    if since is not None:
+        # Keyset polling/paging: rows after the cursor only, plus the next cursor
+        limit = max(1, min(limit, _MAX_PAGE))
+        rows = metric_store.after(camera_id, max(since, 0), start, end, limit=limit + 1)
+        page = rows[:limit]
+        return _send_series({
+            'metrics': _series(camera_id, page, fmt),
+            'next_cursor': page[-1]['id'] if page else since,
+            'has_more': len(rows) > limit,
+        }, fmt)
+
+    if points and points > 0:
+        field = request.args.get('field', 'risk_score')
+        mode = request.args.get('mode', 'lttb')
+        if field not in _DOWNSAMPLE_FIELDS:
+            return jsonify({'error': f'Unknown field: {field}'}), 400
+        if mode not in ('lttb', 'minmax'):
+            return jsonify({'error': 'mode must be lttb or minmax'}), 400
+        rows = _downsampled(camera_id, start, end, min(points, 10000), field, mode)
+        return _send_series(_series(camera_id, rows, fmt), fmt)
 
-    q = _build_query(camera_id, start, end)
-    q = q.order_by(Metric.timestamp.desc()).limit(limit)
-    metrics = q.all()
-    return jsonify([m.to_dict() for m in reversed(metrics)])
+    if step and step > 0:
+        # Regular grid reconstructed from every change-driven row in the range;
+        # the row before `start` supplies the value holding at its beginning
+        if start is None:
+            first = metric_store.fetch(camera_id, None, end, limit=1)
+            start = first[0].timestamp if first else None
+        if end is None:
+            last = metric_store.fetch(camera_id, start, None, limit=1, desc=True)
+            end = last[0].timestamp if last else None
+        if start is None or end is None:
+            return jsonify([])
+        grid = (naive_utc(end) - naive_utc(start)).total_seconds() / step + 1
+        if grid > _MAX_STEP_POINTS:
+            return jsonify({'error': f'step series limited to {_MAX_STEP_POINTS} points; '
+                                     f'use a larger step or a shorter range'}), 400
+        prev = metric_store.fetch(camera_id, None, start, limit=1, desc=True, mappings=True)
+        rows = itertools.chain(prev, metric_store.scan(camera_id, start, end))
+        return jsonify(_step_series(camera_id, rows, step, _max_hold(), start, end))
+
+    rows = metric_store.fetch(camera_id, start, end, limit=limit, desc=True, mappings=True)
+    rows.reverse()
+    return _send_series(_series(camera_id, rows, fmt), fmt)
 
 
 @metrics_bp.route('/<camera_id>/current', methods=['GET'])
@@ -45,9 +252,56 @@ def get_current(camera_id):
     proc = camera_manager.get_processor(camera_id)
     if proc and proc.is_running:
         return jsonify(proc.latest_metrics)
-    metric = (Metric.query.filter_by(camera_id=camera_id)
-              .order_by(Metric.timestamp.desc()).first())
-    return jsonify(metric.to_dict() if metric else {})
+    latest = metric_store.fetch(camera_id, limit=1, desc=True)
+    return jsonify(latest[0].to_dict() if latest else {})
+
+
+@metrics_bp.route('/<camera_id>/recent', methods=['GET'])
+def get_recent(camera_id):
+    """
+    The last `minutes` of metrics at full frame rate from the running
+    processor's in-memory ring, with persisted rows filling in whatever
+    part of the window the ring does not cover (or all of it when the
+    camera is not running). Supports format=json|columns|msgpack as
+    get_metrics; rows from memory have no id.
+    """
+    minutes = min(max(request.args.get('minutes', 5, type=float), 0.0), _MAX_RECENT_MINUTES)
+    fmt = request.args.get('format', 'json')
+    error = _series_format_error(fmt)
+    if error:
+        return error
+
+    proc = camera_manager.get_processor(camera_id)
+    # One snapshot: a processor restart may empty the ring at any time
+    window, db_end = proc.ring.recent(minutes * 60) if proc is not None else (None, None)
+    if db_end is not None:
+        latest = float(window[0][-1])
+    else:
+        last = metric_store.fetch(camera_id, limit=1, desc=True)
+        if not last:
+            return _send_series(_series(camera_id, [], fmt), fmt)
+        latest = (last[0].timestamp.replace(tzinfo=timezone.utc)).timestamp()
+        window, db_end = None, None
+
+    # Older part of the window from the database (rows strictly before the ring)
+    start_dt = datetime.fromtimestamp(latest - minutes * 60, timezone.utc)
+    end_dt = None if db_end is None else datetime.fromtimestamp(db_end, timezone.utc)
+    persisted = []
+    if end_dt is None or start_dt < end_dt:
+        cutoff = None if end_dt is None else naive_utc(end_dt)
+        persisted = [r for r in metric_store.scan(camera_id, start_dt, end_dt)
+                     if cutoff is None or r['timestamp'] < cutoff]
+
+    payload = _series(camera_id, persisted, fmt)
+    if window is not None:
+        if fmt == 'json':
+            payload.extend(MetricRing.to_rows(camera_id, window))
+        else:
+            live = MetricRing.to_columns(camera_id, window)
+            for key, values in live.items():
+                if key != 'camera_id':
+                    payload[key].extend(values)
+    return _send_series(payload, fmt)
 
 
 @metrics_bp.route('/<camera_id>/summary', methods=['GET'])
@@ -55,28 +309,7 @@ def get_camera_summary(camera_id):
     start = _parse_dt(request.args.get('start'))
     end = _parse_dt(request.args.get('end'))
 
-    q = _build_query(camera_id, start, end)
-    row = q.with_entities(
-        func.avg(Metric.density).label('avg_density'),
-        func.max(Metric.count).label('peak_count'),
-        func.avg(Metric.count).label('avg_count'),
-        func.max(Metric.risk_score).label('max_risk'),
-        func.avg(Metric.avg_velocity).label('avg_velocity'),
-        func.avg(Metric.risk_score).label('avg_risk'),
-        func.max(Metric.density).label('max_density'),
-        func.count(Metric.id).label('total_records'),
-    ).first()
-
-    return jsonify({
-        'avg_density': round(row.avg_density or 0, 3),
-        'peak_count': row.peak_count or 0,
-        'avg_count': round(row.avg_count or 0, 1),
-        'max_risk_score': round(row.max_risk or 0, 3),
-        'avg_velocity': round(row.avg_velocity or 0, 2),
-        'avg_risk': round(row.avg_risk or 0, 3),
-        'max_density': round(row.max_density or 0, 3),
-        'total_records': row.total_records or 0,
-    })
+    return jsonify(summarize(_range_summary(camera_id, start, end)))
 
 
 @metrics_bp.route('/<camera_id>/aggregate', methods=['GET'])
@@ -85,119 +318,296 @@ def get_aggregate(camera_id):
     start = _parse_dt(request.args.get('start'))
     end = _parse_dt(request.args.get('end'))
     interval = request.args.get('interval', 'hourly')
+    fmt, resolution = _INTERVALS.get(interval, _INTERVALS['hourly'])
 
-    # SQLite strftime patterns
-    fmt_map = {
-        'hourly': '%Y-%m-%d %H:00',
-        'daily': '%Y-%m-%d',
-        'weekly': '%Y-W%W',
-    }
-    fmt = fmt_map.get(interval, '%Y-%m-%d %H:00')
-
-    q = _build_query(camera_id, start, end)
-    time_bucket = func.strftime(fmt, Metric.timestamp).label('bucket')
-
-    rows = (q.with_entities(
-        time_bucket,
-        func.avg(Metric.count).label('avg_count'),
-        func.max(Metric.count).label('max_count'),
-        func.avg(Metric.density).label('avg_density'),
-        func.max(Metric.density).label('max_density'),
-        func.avg(Metric.avg_velocity).label('avg_velocity'),
-        func.avg(Metric.risk_score).label('avg_risk'),
-        func.max(Metric.risk_score).label('max_risk'),
-        func.count(Metric.id).label('sample_count'),
-    ).group_by(time_bucket)
-     .order_by(time_bucket)
-     .all())
+    result = [_aggregate_row(bucket, r)
+              for bucket, r in _range_stats(camera_id, start, end, fmt, resolution).items()]
+    return jsonify(result)
 
-    result = []
-    for r in rows:
-        result.append({
-            'bucket': r.bucket,
-            'avg_count': round(r.avg_count or 0, 1),
-            'max_count': r.max_count or 0,
-            'avg_density': round(r.avg_density or 0, 3),
-            'max_density': round(r.max_density or 0, 3),
-            'avg_velocity': round(r.avg_velocity or 0, 2),
-            'avg_risk': round(r.avg_risk or 0, 3),
-            'max_risk': round(r.max_risk or 0, 3),
-            'sample_count': r.sample_count or 0,
-        })
 
-    return jsonify(result)
+@metrics_bp.route('/<camera_id>/analytics', methods=['GET'])
+def get_analytics(camera_id):
+    """
+    Everything the analytics page shows for one range: summary, bucketed
+    aggregates, risk-level time distribution and a downsampled series.
+
+    Statistics come from one grouped pass over rollups (plus raw edges)
+    and the series from one streaming scan. The ETag is derived from the
+    request and the range's rollup totals, so it is stable once the range
+    is closed and a revalidation that matches returns 304 without
+    computing anything.
+    """
+    start = _parse_dt(request.args.get('start'))
+    end = _parse_dt(request.args.get('end'))
+    interval = request.args.get('interval', 'hourly')
+    points = min(request.args.get('points', 1000, type=int), 10000)
+    field = request.args.get('field', 'risk_score')
+    mode = request.args.get('mode', 'lttb')
+    if interval not in _INTERVALS:
+        return jsonify({'error': f'interval must be one of: {", ".join(_INTERVALS)}'}), 400
+    if field not in _DOWNSAMPLE_FIELDS:
+        return jsonify({'error': f'Unknown field: {field}'}), 400
+    if mode not in ('lttb', 'minmax'):
+        return jsonify({'error': 'mode must be lttb or minmax'}), 400
+
+    version = [camera_id, request.args.get('start'), request.args.get('end'), interval, points,
+               field, mode, [d.isoformat() for d in metric_store.days(start, end)[:1]],
+               fingerprint(camera_id, start, end)]
+    etag = hashlib.blake2b(json.dumps(version, default=str).encode(), digest_size=16).hexdigest()
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+
+    fmt, resolution = _INTERVALS[interval]
+    buckets = _range_stats_partials(camera_id, start, end, fmt, resolution)
+    total = finalize(combine(buckets.values()))
+
+    resp = jsonify({
+        'camera_id': camera_id,
+        'interval': interval,
+        'summary': summarize(total),
+        'risk_distribution': _risk_distribution(total),
+        'aggregates': [_aggregate_row(bucket, finalize(b)) for bucket, b in buckets.items()],
+        'series': _series(camera_id, _downsampled(camera_id, start, end, points, field, mode)
+                          if points > 0 else [], 'json'),
+    })
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
+@metrics_bp.route('/compare', methods=['GET'])
+def compare_cameras():
+    """
+    Per-camera summaries, risk-level distributions and (with `interval`)
+    aggregates for `cameras` (comma-separated ids, or `all`) over one range.
+
+    All cameras are answered by the same grouped queries over rollups and
+    the raw edges, so the cost does not grow with one round trip per camera.
+    """
+    start = _parse_dt(request.args.get('start'))
+    end = _parse_dt(request.args.get('end'))
+    interval = request.args.get('interval')
+    requested = request.args.get('cameras', 'all')
+    if interval is not None and interval not in _INTERVALS:
+        return jsonify({'error': f'interval must be one of: {", ".join(_INTERVALS)}'}), 400
+
+    cameras = Camera.query.order_by(Camera.id)
+    if requested != 'all':
+        ids = [c.strip() for c in requested.split(',') if c.strip()]
+        if not ids:
+            return jsonify({'error': 'cameras must be a list of camera ids or "all"'}), 400
+        cameras = cameras.filter(Camera.id.in_(ids))
+    names = {c.id: c.name for c in cameras.with_entities(Camera.id, Camera.name)}
+    if requested != 'all':
+        missing = [c for c in ids if c not in names]
+        if missing:
+            return jsonify({'error': f'Unknown cameras: {", ".join(missing)}'}), 404
+
+    fmt, resolution = _INTERVALS[interval] if interval else ('all', 'day')
+    stats = range_stats_multi(None if requested == 'all' else list(names), start, end, fmt=fmt,
+                              resolution=resolution, max_hold=_max_hold(), closed_lag=_closed_lag())
+
+    result = []
+    for cam_id, name in names.items():
+        buckets = dict(sorted(stats.get(cam_id, {}).items()))
+        total = finalize(combine(buckets.values()))
+        entry = {
+            'camera_id': cam_id,
+            'name': name,
+            'summary': summarize(total),
+            'risk_distribution': _risk_distribution(total),
+        }
+        if interval:
+            entry['aggregates'] = [_aggregate_row(bucket, finalize(b)) for bucket, b in buckets.items()]
+        result.append(entry)
+    return jsonify({'interval': interval, 'cameras': result})
 
 
 @metrics_bp.route('/<camera_id>/export', methods=['GET'])
 def export_metrics(camera_id):
-    """Export metrics as CSV, DOCX, PDF, or MD."""
+    """
+    Export metrics as CSV, JSONL, DOCX, PDF, or MD.
+
+    CSV and JSONL stream every row in the range straight from the database
+    with the summary computed in the same pass. The document formats are
+    capped at `limit` rows and generated as background report jobs: a
+    cached report is sent directly, otherwise 202 returns the job to poll
+    at /reports/<job_id> and fetch from /reports/<job_id>/download.
+    """
     fmt = request.args.get('format', 'csv').lower()
     start = _parse_dt(request.args.get('start'))
     end = _parse_dt(request.args.get('end'))
-    limit = request.args.get('limit', 5000, type=int)
+    limit = request.args.get('limit', current_app.config.get('REPORT_ROW_LIMIT', 5000), type=int)
 
     # Get camera name
     cam = Camera.query.get(camera_id)
     camera_name = cam.name if cam else camera_id
 
-    # Fetch metrics
-    q = _build_query(camera_id, start, end)
-    records = q.order_by(Metric.timestamp.asc()).limit(limit).all()
-    metrics = [m.to_dict() for m in records]
+    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename_base = f'crowdsafe_{camera_name}_{ts}'
 
-    # Compute summary
-    summary_q = _build_query(camera_id, start, end)
-    row = summary_q.with_entities(
-        func.avg(Metric.density).label('avg_density'),
-        func.max(Metric.count).label('peak_count'),
-        func.avg(Metric.count).label('avg_count'),
-        func.max(Metric.risk_score).label('max_risk'),
-    ).first()
-    summary = {
-        'avg_density': round(row.avg_density or 0, 3),
-        'peak_count': row.peak_count or 0,
-        'avg_count': round(row.avg_count or 0, 1),
-        'max_risk_score': round(row.max_risk or 0, 3),
-    }
+    if fmt in ('csv', 'jsonl'):
+        from backend.services.export_service import RunningSummary, stream_csv, stream_jsonl
 
-    from backend.services.export_service import (
-        export_csv, export_docx, export_pdf, export_markdown
-    )
+        summary = RunningSummary(_max_hold())
 
-    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename_base = f'crowdsafe_{camera_name}_{ts}'
+        def rows():
+            for row in metric_store.scan(camera_id, start, end):
+                summary.add(row)
+                yield Metric.row_to_dict(row)
+            if end is not None:
+                following = metric_store.fetch(camera_id, end + timedelta(microseconds=1),
+                                               limit=1, mappings=True)
+                summary.hold_until(following[0] if following else None)
 
-    if fmt == 'csv':
-        data = export_csv(metrics, summary)
-        return Response(
-            data,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename="{filename_base}.csv"'}
-        )
-    elif fmt == 'docx':
-        data = export_docx(metrics, summary, camera_name)
-        return Response(
-            data,
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            headers={'Content-Disposition': f'attachment; filename="{filename_base}.docx"'}
-        )
-    elif fmt == 'pdf':
-        data = export_pdf(metrics, summary, camera_name)
-        return Response(
-            data,
-            mimetype='application/pdf',
-            headers={'Content-Disposition': f'attachment; filename="{filename_base}.pdf"'}
-        )
-    elif fmt == 'md':
-        data = export_markdown(metrics, summary, camera_name)
+        stream, mimetype = (stream_csv, 'text/csv') if fmt == 'csv' else (stream_jsonl, 'application/x-ndjson')
         return Response(
-            data.encode('utf-8'),
-            mimetype='text/markdown',
-            headers={'Content-Disposition': f'attachment; filename="{filename_base}.md"'}
+            stream_with_context(stream(rows(), summary)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename_base}.{fmt}"'}
         )
-    else:
+
+    if fmt not in FORMATS:
         return jsonify({'error': f'Unsupported format: {fmt}'}), 400
 
+    # Document formats render in the background report pool
+    records = metric_store.fetch(camera_id, start, end, limit=limit)
+    metrics = [m.to_dict() for m in records]
+
+    summary = summarize(_range_summary(camera_id, start, end))
+
+    job = report_service.submit(
+        current_app._get_current_object(), camera_id, camera_name, fmt,
+        start.isoformat() if start else None, end.isoformat() if end else None,
+        metrics, summary,
+    )
+    if job.status == 'completed':
+        return _send_report(job)
+    return jsonify(job.to_dict()), 202, {'Location': f'/api/metrics/reports/{job.job_id}'}
+
+
+def _send_report(job):
+    return send_file(job.path, mimetype=job.mimetype, as_attachment=True, download_name=job.filename)
+
+
+@metrics_bp.route('/reports', methods=['GET'])
+def list_reports():
+    camera_id = request.args.get('camera_id')
+    return jsonify([j.to_dict() for j in report_service.list_jobs(camera_id)])
+
+
+@metrics_bp.route('/reports/<job_id>', methods=['GET'])
+def get_report(job_id):
+    job = report_service.get(job_id)
+    if not job:
+        return jsonify({'error': 'Report job not found'}), 404
+    return jsonify(job.to_dict())
+
+
+@metrics_bp.route('/reports/<job_id>/download', methods=['GET'])
+def download_report(job_id):
+    job = report_service.get(job_id)
+    if not job:
+        return jsonify({'error': 'Report job not found'}), 404
+    if job.status != 'completed':
+        return jsonify({'error': f'Report is {job.status}', 'job': job.to_dict()}), 409
+    if not os.path.exists(job.path):
+        return jsonify({'error': 'Report file has expired; request the export again'}), 410
+    return _send_report(job)
+
+
+@metrics_bp.route('/<camera_id>/daily/<day>', methods=['GET'])
+def get_daily_report(camera_id, day):
+    """Manifest (summary and files) of a camera's pre-generated report for a UTC day."""
+    from backend.tasks.daily_reports import load_manifest
+    try:
+        day = date.fromisoformat(day)
+    except ValueError:
+        return jsonify({'error': 'Day must be YYYY-MM-DD'}), 400
+    manifest = load_manifest(current_app.config, camera_id, day)
+    if manifest is None:
+        return jsonify({'error': 'No daily report for this day'}), 404
+    return jsonify(manifest)
+
+
+@metrics_bp.route('/<camera_id>/daily/<day>/<fmt>', methods=['GET'])
+def download_daily_report(camera_id, day, fmt):
+    """Send a pre-generated daily export file without querying metrics."""
+    from backend.tasks.daily_reports import MIMETYPES, daily_folder, load_manifest
+    try:
+        day = date.fromisoformat(day)
+    except ValueError:
+        return jsonify({'error': 'Day must be YYYY-MM-DD'}), 400
+    manifest = load_manifest(current_app.config, camera_id, day)
+    entry = (manifest or {}).get('files', {}).get(fmt.lower())
+    if entry is None:
+        return jsonify({'error': f'No {fmt} daily report for this day'}), 404
+    return send_file(os.path.join(daily_folder(current_app.config, camera_id, day), entry['filename']),
+                     mimetype=MIMETYPES[fmt.lower()], as_attachment=True, download_name=entry['filename'])
+
+
+@metrics_bp.route('/<camera_id>/rescore', methods=['POST'])
+def rescore(camera_id):
+    """
+    Start a background re-scoring of stored risk scores/levels; returns 202
+    with the JobRun id to poll at /api/system/jobs/runs/<id>. What-if
+    `weights` (differing from RISK_WEIGHT_*) require `dry_run`.
+    """
+    data = request.get_json() or {}
+    weights = {}
+    for key, value in (data.get('weights') or {}).items():
+        if key not in ('density', 'surge', 'velocity'):
+            return jsonify({'error': f'Unknown weight: {key}. Allowed: density, surge, velocity'}), 400
+        try:
+            weights[key] = float(value)
+        except (TypeError, ValueError):
+            return jsonify({'error': f'Invalid value for weight {key}'}), 400
+
+    from backend.tasks.rescore import is_what_if
+    dry_run = bool(data.get('dry_run', False))
+    if not dry_run and is_what_if(current_app.config, weights):
+        return jsonify({'error': 'What-if weights require dry_run; change RISK_WEIGHT_* '
+                                 'to re-score stored history'}), 400
+
+    run_id = task_scheduler.start_run(
+        current_app._get_current_object(), 'rescore',
+        camera_id=camera_id,
+        weights=weights or None,
+        start=_parse_dt(data.get('start')),
+        end=_parse_dt(data.get('end')),
+        dry_run=dry_run,
+    )
+    if run_id is None:
+        return jsonify({'error': 'A re-scoring job is already running'}), 409
+    return jsonify({'run_id': run_id, 'job_name': 'rescore', 'status': 'started'}), 202, \
+        {'Location': f'/api/system/jobs/runs/{run_id}'}
+
+
+@metrics_bp.route('/<camera_id>/rollups/rebuild', methods=['POST'])
+def rebuild_rollups(camera_id):
+    """Rebuild the camera's minute/hour/day rollups from raw metrics."""
+    data = request.get_json(silent=True) or {}
+
+    from backend.tasks.rollups import backfill_rollups
+    result = backfill_rollups(
+        current_app._get_current_object(), camera_id,
+        start=_parse_dt(data.get('start')),
+        end=_parse_dt(data.get('end')),
+    )
+    return jsonify(result)
+
+
+@metrics_bp.route('/<camera_id>/rollups/verify', methods=['GET'])
+def verify_camera_rollups(camera_id):
+    """Compare rollup-backed statistics over [start, end] with the same range computed from raw rows."""
+    from backend.tasks.rollups import verify_rollups
+    end = _parse_dt(request.args.get('end')) or datetime.now(timezone.utc)
+    start = _parse_dt(request.args.get('start')) or end - timedelta(days=1)
+    result = verify_rollups(current_app._get_current_object(), camera_id, start, end)
+    return jsonify({**result, 'ok': not result['mismatches']})
+
 
 @metrics_bp.route('/summary', methods=['GET'])
 def get_global_summary():
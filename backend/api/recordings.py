@@ -1,7 +1,9 @@
 import os
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, current_app
 from backend.extensions import db
+from backend.models.camera import Camera
 from backend.models.recording import Recording
+from backend.services.batch_analyzer import batch_analyzer
 
 recordings_bp = Blueprint('recordings', __name__)
 
@@ -17,6 +19,20 @@ def list_recordings():
     return jsonify([r.to_dict() for r in recordings])
 
 
+@recordings_bp.route('/jobs', methods=['GET'])
+def list_analysis_jobs():
+    camera_id = request.args.get('camera_id')
+    return jsonify([j.to_dict() for j in batch_analyzer.list_jobs(camera_id)])
+
+
+@recordings_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    job = batch_analyzer.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+
 @recordings_bp.route('/<recording_id>', methods=['GET'])
 def get_recording(recording_id):
     rec = Recording.query.filter_by(recording_id=recording_id).first()
@@ -35,6 +51,20 @@ def download_recording(recording_id):
     return send_file(rec.filepath, as_attachment=True, download_name=rec.filename)
 
 
+@recordings_bp.route('/<recording_id>/analyze', methods=['POST'])
+def analyze_recording(recording_id):
+    rec = Recording.query.filter_by(recording_id=recording_id).first()
+    if not rec:
+        return jsonify({'error': 'Recording not found'}), 404
+    if not os.path.exists(rec.filepath):
+        return jsonify({'error': 'File not found on disk'}), 404
+    cam = db.session.get(Camera, rec.camera_id)
+    if not cam:
+        return jsonify({'error': 'Camera not found'}), 404
+    job = batch_analyzer.submit(current_app._get_current_object(), rec, cam)
+    return jsonify(job.to_dict()), 202
+
+
 @recordings_bp.route('/<recording_id>', methods=['DELETE'])
 def delete_recording(recording_id):
     rec = Recording.query.filter_by(recording_id=recording_id).first()
@@ -1,12 +1,17 @@
 import time
 import platform
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from backend.extensions import db
 from backend.models.camera import Camera
 from backend.models.alert import Alert
-from backend.models.metric import Metric
+from backend.models.job_run import JobRun
 from backend.models.system_log import SystemLog
 from backend.services.camera_manager import camera_manager
+from backend.services.event_bus import event_bus
+from backend.services.live_broadcaster import live_broadcaster
+from backend.services.metric_store import metric_store
+from backend.services.metric_writer import metric_writer
+from backend.services.task_scheduler import JOBS, task_scheduler
 
 system_bp = Blueprint('system', __name__)
 
@@ -29,7 +34,7 @@ def stats():
     camera_count = Camera.query.count()
     alert_count = Alert.query.count()
     unack_alerts = Alert.query.filter_by(acknowledged=False).count()
-    metric_count = Metric.query.count()
+    metric_count = metric_store.count()
     active = camera_manager.get_all_status()
     active_count = sum(1 for v in active.values() if v['running'])
 
@@ -45,6 +50,9 @@ def stats():
         'alerts_unacknowledged': unack_alerts,
         'metrics_recorded': metric_count,
         'total_people_detected': total_people,
+        'metric_writer': metric_writer.stats(),
+        'live_broadcaster': live_broadcaster.stats(),
+        'event_bus': event_bus.stats(),
     })
 
 
@@ -60,3 +68,38 @@ def logs():
     if component:
         query = query.filter_by(component=component)
     return jsonify([l.to_dict() for l in query.limit(limit).all()])
+
+
+@system_bp.route('/jobs', methods=['GET'])
+def jobs():
+    """Maintenance job schedule and recent runs."""
+    name = request.args.get('job_name')
+    limit = request.args.get('limit', 50, type=int)
+
+    query = JobRun.query.order_by(JobRun.started_at.desc())
+    if name:
+        query = query.filter_by(job_name=name)
+    return jsonify({
+        'jobs': task_scheduler.schedule(),
+        'runs': [r.to_dict() for r in query.limit(limit).all()],
+    })
+
+
+@system_bp.route('/jobs/<name>/run', methods=['POST'])
+def run_job(name):
+    """Run a maintenance job now, in the background."""
+    if name not in JOBS:
+        return jsonify({'error': f'Unknown job: {name}. Allowed: {", ".join(JOBS)}'}), 400
+    run_id = task_scheduler.start_run(current_app._get_current_object(), name)
+    if run_id is None:
+        return jsonify({'error': f'Job {name} is already running'}), 409
+    return jsonify({'run_id': run_id, 'job_name': name, 'status': 'started'}), 202
+
+
+@system_bp.route('/jobs/runs/<int:run_id>', methods=['GET'])
+def job_run(run_id):
+    """One job run: status, duration and result details."""
+    run = db.session.get(JobRun, run_id)
+    if run is None:
+        return jsonify({'error': 'Job run not found'}), 404
+    return jsonify(run.to_dict())
@@ -1,9 +1,11 @@
 from backend.models.user import User
 from backend.models.camera import Camera
 from backend.models.metric import Metric
+from backend.models.metric_rollup import MetricRollup
 from backend.models.alert import Alert
 from backend.models.recording import Recording
 from backend.models.setting import Setting
 from backend.models.system_log import SystemLog
+from backend.models.job_run import JobRun
 
-__all__ = ['User', 'Camera', 'Metric', 'Alert', 'Recording', 'Setting', 'SystemLog']
+__all__ = ['User', 'Camera', 'Metric', 'MetricRollup', 'Alert', 'Recording', 'Setting', 'SystemLog', 'JobRun']
@@ -22,6 +22,7 @@ class Camera(db.Model):
     longitude = db.Column(db.Float, nullable=True)
     fps_target = db.Column(db.Integer, default=30)
     resolution = db.Column(db.String(20), default='1280x720')
+    tracker = db.Column(db.String(20), default='botsort')  # botsort, bytetrack, centroid
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
                            onupdate=lambda: datetime.now(timezone.utc))
@@ -47,6 +48,7 @@ class Camera(db.Model):
             'longitude': self.longitude,
             'fps_target': self.fps_target,
             'resolution': self.resolution,
+            'tracker': self.tracker,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
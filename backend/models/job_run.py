@@ -0,0 +1,33 @@
+from backend.extensions import db
+from datetime import datetime, timezone
+import json
+
+
+class JobRun(db.Model):
+    """One execution of a scheduled (or manually triggered) maintenance job."""
+    __tablename__ = 'job_runs'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    job_name = db.Column(db.String(50), nullable=False, index=True)
+    trigger = db.Column(db.String(20), default='scheduled')  # scheduled, manual
+    status = db.Column(db.String(20), default='running')  # running, completed, failed
+    started_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_ms = db.Column(db.Float, default=0.0)
+    rows_affected = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text, nullable=True)
+    details = db.Column(db.Text, default='{}')  # JSON
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_name': self.job_name,
+            'trigger': self.trigger,
+            'status': self.status,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': round(self.duration_ms or 0.0, 1),
+            'rows_affected': self.rows_affected,
+            'error': self.error,
+            'details': json.loads(self.details or '{}'),
+        }
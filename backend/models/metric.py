@@ -1,9 +1,17 @@
 from backend.extensions import db
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
 
 
 class Metric(db.Model):
     __tablename__ = 'metrics'
+    __table_args__ = (
+        db.Index('ix_metrics_camera_ts', 'camera_id', 'timestamp'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     camera_id = db.Column(db.String(50), db.ForeignKey('cameras.id'), nullable=False, index=True)
@@ -18,6 +26,8 @@ class Metric(db.Model):
     risk_score = db.Column(db.Float, default=0.0)
     risk_level = db.Column(db.String(20), default='SAFE')
     capacity_utilization = db.Column(db.Float, default=0.0)
+    crowd_pressure = db.Column(db.Float, default=0.0)
+    flow_coherence = db.Column(db.Float, default=0.0)
     frame_number = db.Column(db.Integer, default=0)
 
     @staticmethod
@@ -30,20 +40,51 @@ class Metric(db.Model):
             s += 'Z'
         return s
 
-    def to_dict(self):
+    @classmethod
+    def row_to_dict(cls, row):
+        """to_dict() for a `metrics` row mapping (Core result), without building an ORM object."""
         return {
-            'id': self.id,
-            'camera_id': self.camera_id,
-            'timestamp': self._utc_iso(self.timestamp),
-            'count': self.count,
-            'density': round(self.density, 3),
-            'avg_velocity': round(self.avg_velocity, 2),
-            'max_velocity': round(self.max_velocity, 2),
-            'surge_rate': round(self.surge_rate, 3),
-            'flow_in': self.flow_in,
-            'flow_out': self.flow_out,
-            'risk_score': round(self.risk_score, 3),
-            'risk_level': self.risk_level,
-            'capacity_utilization': round(self.capacity_utilization, 1),
-            'frame_number': self.frame_number,
+            'id': row['id'],
+            'camera_id': row['camera_id'],
+            'timestamp': cls._utc_iso(row['timestamp']),
+            'count': row['count'],
+            'density': round(row['density'], 3),
+            'avg_velocity': round(row['avg_velocity'], 2),
+            'max_velocity': round(row['max_velocity'], 2),
+            'surge_rate': round(row['surge_rate'], 3),
+            'flow_in': row['flow_in'],
+            'flow_out': row['flow_out'],
+            'risk_score': round(row['risk_score'], 3),
+            'risk_level': row['risk_level'],
+            'capacity_utilization': round(row['capacity_utilization'], 1),
+            'crowd_pressure': round(row['crowd_pressure'] or 0.0, 3),
+            'flow_coherence': round(row['flow_coherence'] or 0.0, 3),
+            'frame_number': row['frame_number'],
         }
+
+    # Series columns of rows_to_columns() and their rounding (None: integer/text as stored)
+    COLUMN_DIGITS = {
+        'id': None, 'count': None, 'density': 3, 'avg_velocity': 2, 'max_velocity': 2,
+        'surge_rate': 3, 'flow_in': None, 'flow_out': None, 'risk_score': 3, 'risk_level': None,
+        'capacity_utilization': 1, 'crowd_pressure': 3, 'flow_coherence': 3, 'frame_number': None,
+    }
+
+    @classmethod
+    def rows_to_columns(cls, rows):
+        """
+        Column-oriented form of `metrics` row mappings (naive UTC timestamps):
+        one list per column, `timestamps` as epoch milliseconds, floats
+        rounded as in to_dict(). Each float column is rounded as one array.
+        """
+        rows = list(rows)
+        out = {'timestamps': [(r['timestamp'] - _EPOCH) // _MS for r in rows]}
+        for name, digits in cls.COLUMN_DIGITS.items():
+            if digits is None:
+                out[name] = [r[name] for r in rows]
+            else:
+                values = np.array([r[name] or 0.0 for r in rows], dtype=np.float64)
+                out[name] = np.round(values, digits).tolist()
+        return out
+
+    def to_dict(self):
+        return self.row_to_dict({c.key: getattr(self, c.key) for c in self.__table__.columns})
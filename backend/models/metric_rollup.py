@@ -0,0 +1,53 @@
+from backend.extensions import db
+
+# Metrics rolled up per bucket, each with sum, hold-weighted sum, min and max
+ROLLUP_METRICS = ('count', 'density', 'avg_velocity', 'risk_score')
+RISK_LEVEL_COLUMNS = {
+    'SAFE': 'safe_seconds',
+    'CAUTION': 'caution_seconds',
+    'WARNING': 'warning_seconds',
+    'CRITICAL': 'critical_seconds',
+}
+
+
+class MetricRollup(db.Model):
+    """
+    Per-camera minute/hour/day aggregates of the `metrics` step series.
+
+    `samples` and the *_sum/*_min/*_max columns aggregate stored rows;
+    `hold_seconds` and *_wsum weight each row by how long its values held
+    (see services/rollups.py), giving time-weighted averages as wsum / hold.
+    """
+    __tablename__ = 'metric_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('camera_id', 'resolution', 'bucket_start', name='uq_rollup_bucket'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    camera_id = db.Column(db.String(50), db.ForeignKey('cameras.id'), nullable=False)
+    resolution = db.Column(db.String(10), nullable=False)  # minute, hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    samples = db.Column(db.Integer, default=0)
+    hold_seconds = db.Column(db.Float, default=0.0)
+
+    count_sum = db.Column(db.Float, default=0.0)
+    count_wsum = db.Column(db.Float, default=0.0)
+    count_min = db.Column(db.Float, nullable=True)
+    count_max = db.Column(db.Float, nullable=True)
+    density_sum = db.Column(db.Float, default=0.0)
+    density_wsum = db.Column(db.Float, default=0.0)
+    density_min = db.Column(db.Float, nullable=True)
+    density_max = db.Column(db.Float, nullable=True)
+    avg_velocity_sum = db.Column(db.Float, default=0.0)
+    avg_velocity_wsum = db.Column(db.Float, default=0.0)
+    avg_velocity_min = db.Column(db.Float, nullable=True)
+    avg_velocity_max = db.Column(db.Float, nullable=True)
+    risk_score_sum = db.Column(db.Float, default=0.0)
+    risk_score_wsum = db.Column(db.Float, default=0.0)
+    risk_score_min = db.Column(db.Float, nullable=True)
+    risk_score_max = db.Column(db.Float, nullable=True)
+
+    safe_seconds = db.Column(db.Float, default=0.0)
+    caution_seconds = db.Column(db.Float, default=0.0)
+    warning_seconds = db.Column(db.Float, default=0.0)
+    critical_seconds = db.Column(db.Float, default=0.0)
@@ -2,7 +2,8 @@
 CrowdSafe AI Engine - YOLOv11 + BoT-SORT + Professional Visualization.
 
 Detection: YOLOv11s (small) for better accuracy than nano.
-Tracking: BoT-SORT with Kalman filter + appearance matching.
+Tracking: per-camera selectable tracker (BoT-SORT, ByteTrack, centroid),
+  see trackers.py.
 Visualization: Corner-style bounding boxes, proximity halos,
   cluster outlines, flow direction arrows, confidence bars.
 """
@@ -13,6 +14,7 @@ import os
 import time
 import threading
 from ultralytics import YOLO
+from backend.services.trackers import create_tracker, DEFAULT_TRACKER
 from backend.utils.logger import get_logger
 
 logger = get_logger('ai_engine')
@@ -32,7 +34,7 @@ COLOR_HUD_ACCENT = (255, 200, 50)
 
 
 class CrowdSafeAI:
-    """YOLOv11s + BoT-SORT person detection, tracking, and annotation."""
+    """YOLOv11s person detection, multi-object tracking, and annotation."""
 
     def __init__(self, config):
         self.config = config
@@ -42,107 +44,143 @@ class CrowdSafeAI:
         logger.info(f"Loading YOLO model: {config.YOLO_MODEL}")
         self.model = YOLO(model_path)
 
-        self.track_history = {}
+        # Default tracker, used when the caller does not bring its own
+        self.tracker = create_tracker(getattr(config, 'TRACKER', DEFAULT_TRACKER), config=config)
         self.dense_crowd_threshold = getattr(config, 'DENSE_CROWD_THRESHOLD', 50)
         self.grid_size = getattr(config, 'GRID_SIZE', 50)
         self.occlusion_factor = getattr(config, 'OCCLUSION_FACTOR', 1.3)
         self.pixel_to_meter = 1.0 / getattr(config, 'PIXELS_PER_METER', 100.0)
         self.imgsz = getattr(config, 'YOLO_IMGSZ', 960)
+        self.device = getattr(config, 'YOLO_DEVICE', '') or None
         self.min_box_area = getattr(config, 'YOLO_MIN_BOX_AREA', 400)
         self.max_box_ratio = getattr(config, 'YOLO_MAX_BOX_RATIO', 5.0)
 
+    @property
+    def track_history(self):
+        return self.tracker.track_history
+
     def reset_tracker(self):
         with self._lock:
-            if hasattr(self.model, 'predictor') and self.model.predictor is not None:
-                self.model.predictor = None
-            self.track_history.clear()
-
-    def analyze_frame(self, frame, area_sqm=100.0, expected_capacity=500, fps=30):
-        start_time = time.time()
-
-        # Copy BEFORE YOLO - tracker may modify source frame in-place
-        clean_frame = frame.copy()
+            self.tracker.reset()
 
+    def detect(self, frame):
+        """Run YOLO person detection only. Returns (xyxy, confs) float arrays."""
         with self._lock:
-            results = self.model.track(
+            results = self.model.predict(
                 frame,
-                persist=True,
-                tracker='botsort.yaml',
                 classes=[0],
                 conf=self.config.YOLO_CONFIDENCE,
                 iou=self.config.YOLO_IOU,
                 imgsz=self.imgsz,
+                device=self.device,
                 verbose=False,
             )
+        if results and len(results) > 0 and results[0].boxes is not None:
+            boxes = results[0].boxes.cpu().numpy()
+            return boxes.xyxy.astype(np.float32), boxes.conf.astype(np.float32)
+        return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)
+
+    def analyze_frame(self, frame, area_sqm=100.0, expected_capacity=500, fps=30, tracker=None,
+                      motion=None, timestamp=None, detections=None):
+        """
+        Detect, track and measure one frame.
+
+        `timestamp` is the frame's source time in epoch seconds (see
+        media_clock.py); it drives every velocity, so analysis results do not
+        depend on processing speed. Defaults to the current wall time.
+
+        When an OpticalFlowMotion is passed and the raw count is above its
+        threshold, tracking is skipped and per-person velocity comes from the
+        optical-flow field instead (see motion_field.py).
+
+        `detections` replays a cached (xyxy, confs, track_ids, raw_count)
+        frame instead of running the detector and tracker; the tracked
+        arrays of every frame are returned under 'tracked' for caching
+        (see detection_cache.py).
+        """
+        start_time = time.time()
+        if tracker is None:
+            tracker = self.tracker
+        track_history = tracker.track_history
+
+        # Copy BEFORE YOLO - tracker may modify source frame in-place
+        clean_frame = frame.copy()
+
+        if detections is not None:
+            xyxy, confs, track_ids, raw_count = detections
+        else:
+            xyxy, confs = self.detect(frame)
+            raw_count = len(xyxy)
+        flow_mode = motion is not None and motion.update_mode(raw_count)
+        if flow_mode:
+            # Too dense to track: drop stale tracks so IDs restart cleanly later
+            if track_history:
+                tracker.reset()
+            if detections is None:
+                track_ids = np.arange(len(xyxy))
+        elif detections is None:
+            xyxy, confs, track_ids = tracker.update(xyxy, confs, frame)
 
         annotated = clean_frame
         detections = []
-        velocities = []
-        current_time = time.time()
-
-        if results and len(results) > 0:
-            result = results[0]
-            boxes_obj = result.boxes
-
-            if boxes_obj is not None and len(boxes_obj) > 0:
-                xyxy = boxes_obj.xyxy.cpu().numpy()
-                confs = boxes_obj.conf.cpu().numpy()
-                track_ids = boxes_obj.id
-                if track_ids is not None:
-                    track_ids = track_ids.cpu().numpy().astype(int)
-                else:
-                    track_ids = np.arange(len(xyxy))
-
-                for box, conf, tid in zip(xyxy, confs, track_ids):
-                    x1, y1, x2, y2 = box.astype(int)
-                    bw, bh = x2 - x1, y2 - y1
-                    # Filter out false positives: too small or too thin
-                    if bw * bh < self.min_box_area:
-                        continue
-                    aspect = max(bw, bh) / max(min(bw, bh), 1)
-                    if aspect > self.max_box_ratio:
-                        continue
-                    cx = (x1 + x2) / 2.0
-                    cy = (y1 + y2) / 2.0
-
-                    if tid not in self.track_history:
-                        self.track_history[tid] = []
-                    self.track_history[tid].append((cx, cy, current_time))
-                    if len(self.track_history[tid]) > 60:
-                        self.track_history[tid] = self.track_history[tid][-60:]
-
-                    # Velocity from track displacement
-                    velocity = 0.0
-                    direction = (0.0, 0.0)
-                    hist = self.track_history[tid]
-                    if len(hist) >= 2:
-                        prev_cx, prev_cy, prev_t = hist[-2]
-                        dx = cx - prev_cx
-                        dy = cy - prev_cy
-                        dist_px = np.sqrt(dx * dx + dy * dy)
-                        dt = current_time - prev_t
-                        if dt > 0:
-                            velocity = (dist_px * self.pixel_to_meter) / dt
-                        mag = max(dist_px, 1e-6)
-                        direction = (dx / mag, dy / mag)
-                    velocities.append(velocity)
-
-                    detections.append({
-                        'track_id': int(tid),
-                        'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                        'confidence': float(conf),
-                        'center': (cx, cy),
-                        'velocity': velocity,
-                        'direction': direction,
-                    })
+        current_time = time.time() if timestamp is None else timestamp
+
+        for box, conf, tid in zip(xyxy, confs, track_ids):
+            x1, y1, x2, y2 = box.astype(int)
+            bw, bh = x2 - x1, y2 - y1
+            # Filter out false positives: too small or too thin
+            if bw * bh < self.min_box_area:
+                continue
+            aspect = max(bw, bh) / max(min(bw, bh), 1)
+            if aspect > self.max_box_ratio:
+                continue
+            cx = (x1 + x2) / 2.0
+            cy = (y1 + y2) / 2.0
+
+            if not flow_mode:
+                if tid not in track_history:
+                    track_history[tid] = []
+                track_history[tid].append((cx, cy, current_time))
+                if len(track_history[tid]) > 60:
+                    track_history[tid] = track_history[tid][-60:]
+
+            detections.append({
+                'track_id': int(tid),
+                'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                'confidence': float(conf),
+                'center': (cx, cy),
+                'velocity': 0.0,
+                'direction': (0.0, 0.0),
+            })
+
+        centers = np.array([d['center'] for d in detections], dtype=np.float64).reshape(-1, 2)
+        motion_result = None
+        if flow_mode:
+            # Optical-flow velocities for the dense path
+            motion_result = motion.estimate(frame, current_time, centers)
+            speeds, directions = motion_result['velocities'], motion_result['directions']
+        else:
+            # Kalman-smoothed velocity for all tracks in one batch update
+            vel_px = tracker.velocity_filter.update(
+                [d['track_id'] for d in detections], centers, current_time
+            )
+            speed_px = np.hypot(vel_px[:, 0], vel_px[:, 1])
+            speeds = speed_px * self.pixel_to_meter
+            directions = np.where(speed_px[:, np.newaxis] > 1e-6,
+                                  vel_px / np.maximum(speed_px, 1e-6)[:, np.newaxis], 0.0)
+        for det, v, (dx, dy) in zip(detections, speeds.tolist(), directions.tolist()):
+            det['velocity'] = v
+            det['direction'] = (dx, dy)
+        velocities = speeds.tolist()
 
         # Clean stale tracks
         active_ids = {d['track_id'] for d in detections}
         stale_cutoff = current_time - 3.0
-        for tid in list(self.track_history.keys()):
-            if tid not in active_ids:
-                if self.track_history[tid][-1][2] < stale_cutoff:
-                    del self.track_history[tid]
+        stale = [tid for tid, hist in track_history.items()
+                 if tid not in active_ids and hist[-1][2] < stale_cutoff]
+        for tid in stale:
+            del track_history[tid]
+        tracker.velocity_filter.drop(stale)
 
         # Count and density
         raw_count = len(detections)
@@ -183,15 +221,21 @@ class CrowdSafeAI:
             'detections': detections,
             'density_map': density_map,
             'method': method,
+            'motion_mode': 'optical_flow' if flow_mode else 'tracking',
+            'motion': motion_result,
+            'tracked': (xyxy, confs, track_ids, raw_count),
             'processing_time_ms': round(processing_time, 2),
         }
 
-    def annotate_frame(self, frame, detections, ml_analysis, risk_level, risk_score):
+    def annotate_frame(self, frame, detections, ml_analysis, risk_level, risk_score,
+                       track_history=None):
         """
         Professional annotation pass. Called separately so video_processor
         can pass ML results from crowd_analyzer.
         """
         annotated = frame.copy()
+        if track_history is None:
+            track_history = self.track_history
 
         # Layer 1: Cluster outlines
         self._draw_clusters(annotated, detections, ml_analysis)
@@ -203,7 +247,7 @@ class CrowdSafeAI:
         self._draw_flow_arrows(annotated, ml_analysis)
 
         # Layer 4: Per-person bounding boxes (corner style)
-        self._draw_detections(annotated, detections, ml_analysis)
+        self._draw_detections(annotated, detections, ml_analysis, track_history)
 
         # Layer 5: HUD panel
         self._draw_hud(annotated, detections, ml_analysis, risk_level, risk_score)
@@ -215,7 +259,7 @@ class CrowdSafeAI:
 
     # ---- Drawing: Corner-style bounding boxes ----
 
-    def _draw_detections(self, frame, detections, ml_analysis):
+    def _draw_detections(self, frame, detections, ml_analysis, track_history):
         anomaly_ids = {a['track_id'] for a in ml_analysis.get('anomalies', [])}
 
         for det in detections:
@@ -249,7 +293,7 @@ class CrowdSafeAI:
                 cv2.arrowedLine(frame, (cx, cy), (ex, ey), color, 1, tipLength=0.4)
 
             # Velocity trail (fading)
-            hist = self.track_history.get(tid, [])
+            hist = track_history.get(tid, [])
             if len(hist) > 2:
                 pts = [(int(p[0]), int(p[1])) for p in hist[-15:]]
                 for k in range(1, len(pts)):
@@ -47,6 +47,8 @@ class AlertManager:
             trigger = 'sudden_surge'
         elif velocity < 0.2 and density > 4:
             trigger = 'stagnation_with_density'
+        elif risk_level == 'WARNING' and metrics.get('risk_forecast', 0) >= 0.75:
+            trigger = 'escalation_forecast'
 
         # IST timestamp
         IST = timezone(timedelta(hours=5, minutes=30))
@@ -0,0 +1,328 @@
+"""
+Offline batch analysis of uploaded recordings.
+
+The live path loops a file forever at display speed. A batch job instead
+analyses a Recording once, as fast as the hardware allows:
+
+  - the video is split into time segments, analysed in parallel worker
+    processes (each loads its own model once, in the pool initializer)
+  - every segment starts a few seconds early so the tracker, Kalman
+    velocities and trend state are warm by the first frame it reports;
+    warm-up frames are analysed but not emitted
+  - rows are chosen by the same deadband policy as live cameras
+    (persistence_policy.py), evaluated on every frame
+  - frame numbers and media timestamps are global, so the per-segment
+    results stitch into one timeline by simple concatenation
+  - the timeline replaces any rows the camera already has for the
+    recording's time span and is bulk-inserted into `metrics`
+  - with the detection cache on, a first run records each segment's
+    detections as a part file and merges them; re-runs (e.g. after tuning
+    clustering or risk parameters) replay the cache and skip YOLO entirely
+
+Jobs run in a background thread and report progress in frames, both via
+the API and as `batch_progress` events in the camera's Socket.IO room.
+"""
+
+import math
+import multiprocessing as mp
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+
+import cv2
+
+from backend.extensions import db, socketio
+from backend.services.detection_cache import DetectionCache, cache_key
+from backend.services.frame_pipeline import FramePipeline, metric_row
+from backend.services.media_clock import MediaClock
+from backend.services.metric_store import metric_store
+from backend.services.persistence_policy import DeadbandPolicy
+from backend.services.rollups import rebuild as rebuild_rollups
+from backend.tasks.daily_reports import invalidate_daily_reports
+from backend.utils.helpers import generate_id
+from backend.utils.logger import get_logger
+
+logger = get_logger('batch_analyzer')
+
+_INSERT_CHUNK = 1000
+_PROGRESS_EVERY = 25  # frames between worker progress reports
+
+# Per-process engine state, built once by the pool initializer
+_worker = {}
+
+
+def _init_worker(config_values):
+    from backend.services.ai_engine import CrowdSafeAI
+    from backend.services.crowd_analyzer import CrowdAnalyzer
+    from backend.services.risk_calculator import RiskCalculator
+
+    cfg = type('Cfg', (), config_values)()
+    _worker['ai_engine'] = CrowdSafeAI(cfg)
+    _worker['crowd_analyzer'] = CrowdAnalyzer(cfg)
+    _worker['risk_calculator'] = RiskCalculator(cfg)
+
+
+def _analyze_segment(task, progress):
+    """
+    Analyse frames [start, end) of a file, warming up from `warm_start`.
+    Runs in a worker process. Returns (segment index, metrics list).
+    """
+    cap = cv2.VideoCapture(task['path'])
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {task['path']}")
+
+    pipeline = FramePipeline(
+        task['camera_id'], _worker['ai_engine'], _worker['crowd_analyzer'],
+        _worker['risk_calculator'], area_sqm=task['area_sqm'],
+        expected_capacity=task['expected_capacity'], tracker=task['tracker'],
+    )
+    pipeline.reset(history=True)
+    if task['cache_key']:
+        # Replay the merged cache if there is one, else record this segment as a part
+        part = None if DetectionCache.exists(task['cache_folder'], task['cache_key']) else task['index']
+        pipeline.cache = DetectionCache(task['cache_folder'], task['cache_key'],
+                                        start=task['start'], part=part)
+    fps = task['fps']
+    policy = DeadbandPolicy(_worker['ai_engine'].config)
+    results = []
+    reported = 0
+
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, task['warm_start'])
+        clock = MediaClock(cap, task['path'], origin=task['origin'])
+        for index in range(task['warm_start'], task['end']):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_ts = clock.tick(cap)
+            _, analysis, ml_analysis, risk_score, risk_level = pipeline.process(
+                frame, frame_ts, fps, frame_index=index)
+
+            if index >= task['start']:
+                metrics = pipeline.build_metrics(
+                    analysis, ml_analysis, risk_score, risk_level,
+                    frame_number=index + 1,
+                    timestamp=frame_ts,
+                    media_time=clock.media_time,
+                )
+                if policy.should_persist(metrics, frame_ts):
+                    results.append(metrics)
+
+            done = index - task['warm_start'] + 1
+            if done - reported >= _PROGRESS_EVERY:
+                progress.put(done - reported)
+                reported = done
+        if pipeline.cache is not None:
+            pipeline.cache.finish()
+    finally:
+        cap.release()
+        if pipeline.cache is not None:
+            pipeline.cache.close()
+        progress.put(task['end'] - task['warm_start'] - reported)
+
+    return task['index'], results
+
+
+class BatchJob:
+
+    def __init__(self, recording, camera):
+        self.job_id = generate_id('JOB')
+        self.recording_id = recording.recording_id
+        self.camera_id = camera.id
+        self.path = recording.filepath
+        self.area_sqm = camera.area_sqm
+        self.expected_capacity = camera.expected_capacity
+        self.tracker = camera.tracker
+        start = recording.start_time or datetime.now(timezone.utc)
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        self.origin = start.timestamp()
+
+        self.status = 'queued'  # queued, running, saving, completed, failed
+        self.total_frames = 0
+        self.processed_frames = 0
+        self.segments = 0
+        self.metrics_written = 0
+        self.error = None
+        self.created_at = datetime.now(timezone.utc)
+        self.finished_at = None
+
+    @property
+    def progress(self):
+        if self.status == 'completed':
+            return 100.0
+        if not self.total_frames:
+            return 0.0
+        return min(99.9, 100.0 * self.processed_frames / self.total_frames)
+
+    def to_dict(self):
+        elapsed_end = self.finished_at or datetime.now(timezone.utc)
+        return {
+            'job_id': self.job_id,
+            'recording_id': self.recording_id,
+            'camera_id': self.camera_id,
+            'status': self.status,
+            'progress': round(self.progress, 1),
+            'processed_frames': self.processed_frames,
+            'total_frames': self.total_frames,
+            'segments': self.segments,
+            'metrics_written': self.metrics_written,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'elapsed_seconds': round((elapsed_end - self.created_at).total_seconds(), 1),
+        }
+
+
+class BatchAnalyzer:
+    """Registry and runner for batch analysis jobs."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, app, recording, camera):
+        """Start analysing `recording` for `camera`; returns the BatchJob.
+
+        A recording already being analysed returns its running job.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.recording_id == recording.recording_id and job.status in ('queued', 'running', 'saving'):
+                    return job
+            job = BatchJob(recording, camera)
+            self._jobs[job.job_id] = job
+        threading.Thread(target=self._run, args=(app, job), daemon=True).start()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, camera_id=None):
+        jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return [j for j in jobs if camera_id is None or j.camera_id == camera_id]
+
+    def _run(self, app, job):
+        cfg = app.config
+        config_values = {k: cfg[k] for k in cfg if isinstance(cfg[k], (str, int, float, bool))}
+        try:
+            cap = cv2.VideoCapture(job.path)
+            if not cap.isOpened():
+                raise RuntimeError(f"Cannot open video: {job.path}")
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            if total <= 0:
+                raise RuntimeError('Video has no frames')
+
+            key = None
+            if cfg.get('DETECTION_CACHE_ENABLED', True):
+                key = cache_key(job.path, type('Cfg', (), config_values)(), job.tracker)
+                if not DetectionCache.exists(cfg['DETECTION_CACHE_FOLDER'], key):
+                    # Parts of a failed run may belong to another segment plan; record afresh
+                    DetectionCache.discard_parts(cfg['DETECTION_CACHE_FOLDER'], key)
+            tasks = self._plan(job, total, fps, cfg, key)
+            job.total_frames = sum(t['end'] - t['warm_start'] for t in tasks)
+            job.segments = len(tasks)
+            job.status = 'running'
+            logger.info(f"Batch job {job.job_id}: {total} frames in {len(tasks)} segments")
+
+            results = self._execute(job, tasks, cfg, config_values)
+            if key and not DetectionCache.exists(cfg['DETECTION_CACHE_FOLDER'], key):
+                DetectionCache.merge(cfg['DETECTION_CACHE_FOLDER'], key, len(tasks))
+
+            job.status = 'saving'
+            self._emit(job)
+            timeline = [m for _, metrics in sorted(results) for m in metrics]
+            with app.app_context():
+                job.metrics_written = self._store(job, timeline, total / fps,
+                                                  cfg.get('METRIC_HEARTBEAT_SECONDS', 30.0))
+                invalidate_daily_reports(cfg, job.camera_id, MediaClock.to_datetime(job.origin),
+                                         MediaClock.to_datetime(job.origin + total / fps + 1))
+            job.status = 'completed'
+            logger.info(f"Batch job {job.job_id} completed: {job.metrics_written} metrics")
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            logger.error(f"Batch job {job.job_id} failed: {e}")
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            self._emit(job)
+
+    @staticmethod
+    def _plan(job, total, fps, cfg, key=None):
+        workers = max(1, int(cfg.get('BATCH_WORKERS', 2)))
+        seg_frames = int(cfg.get('BATCH_SEGMENT_SECONDS', 300) * fps)
+        warmup = int(cfg.get('BATCH_WARMUP_SECONDS', 3) * fps)
+        # At least one segment per worker, but never shorter than a few warm-ups
+        n = max(math.ceil(total / max(seg_frames, 1)), workers)
+        n = max(1, min(n, total // max(4 * warmup, 1)))
+        bounds = [round(i * total / n) for i in range(n + 1)]
+        return [{
+            'index': i,
+            'path': job.path,
+            'camera_id': job.camera_id,
+            'area_sqm': job.area_sqm,
+            'expected_capacity': job.expected_capacity,
+            'tracker': job.tracker,
+            'origin': job.origin,
+            'fps': fps,
+            'start': bounds[i],
+            'end': bounds[i + 1],
+            'warm_start': max(0, bounds[i] - warmup),
+            'cache_key': key,
+            'cache_folder': cfg.get('DETECTION_CACHE_FOLDER', 'cache'),
+        } for i in range(n)]
+
+    def _execute(self, job, tasks, cfg, config_values):
+        workers = min(len(tasks), max(1, int(cfg.get('BATCH_WORKERS', 2))))
+        # spawn: workers must not inherit the server's threads, sockets or CUDA state
+        ctx = mp.get_context('spawn')
+        with ctx.Manager() as manager, ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx,
+            initializer=_init_worker, initargs=(config_values,),
+        ) as pool:
+            progress = manager.Queue()
+            pending = {pool.submit(_analyze_segment, t, progress) for t in tasks}
+            results = []
+            while pending:
+                finished, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                for f in finished:
+                    results.append(f.result())
+                self._drain(job, progress)
+            self._drain(job, progress)
+        return results
+
+    def _drain(self, job, progress):
+        advanced = False
+        while True:
+            try:
+                job.processed_frames += progress.get_nowait()
+                advanced = True
+            except queue.Empty:
+                break
+        if advanced:
+            self._emit(job)
+
+    @staticmethod
+    def _store(job, timeline, duration_s, max_hold):
+        """Replace the camera's rows over the recording span with the new timeline."""
+        start = MediaClock.to_datetime(job.origin)
+        end = MediaClock.to_datetime(job.origin + duration_s + 1)
+        rows = [metric_row(m) for m in timeline]
+        metric_store.ensure(r['timestamp'] for r in rows)
+        conn = db.session.connection()
+        metric_store.delete(conn, job.camera_id, start, end)
+        for i in range(0, len(rows), _INSERT_CHUNK):
+            metric_store.insert(conn, rows[i:i + _INSERT_CHUNK])
+        db.session.commit()
+        rebuild_rollups(job.camera_id, start, end, max_hold=max_hold)
+        return len(rows)
+
+    @staticmethod
+    def _emit(job):
+        socketio.emit('batch_progress', job.to_dict(), room=f'camera_{job.camera_id}')
+
+
+batch_analyzer = BatchAnalyzer()
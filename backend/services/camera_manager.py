@@ -1,8 +1,12 @@
 import threading
+from backend.extensions import db, socketio
 from backend.services.ai_engine import CrowdSafeAI
 from backend.services.crowd_analyzer import CrowdAnalyzer
 from backend.services.risk_calculator import RiskCalculator
 from backend.services.alert_manager import AlertManager
+from backend.services.event_bus import METRICS, STATUS, event_bus
+from backend.services.live_broadcaster import live_broadcaster
+from backend.services.metric_writer import metric_writer
 from backend.services.video_processor import VideoProcessor
 from backend.utils.logger import get_logger
 
@@ -28,17 +32,66 @@ class CameraManager:
             return cls._instance
 
     def init_app(self, app):
-        self._app = app
-        cfg = app.config
-        # Build config-like object from Flask config
-        _c = type('Cfg', (), {k: cfg[k] for k in cfg if isinstance(cfg[k], (str, int, float, bool))})()
-        self._ai_engine = CrowdSafeAI(_c)
-        self._crowd_analyzer = CrowdAnalyzer(_c)
-        self._risk_calculator = RiskCalculator(_c)
-        self._alert_manager = AlertManager(_c)
-        logger.info("CameraManager initialized")
-
-    def start_camera(self, camera_id, source_path, area_sqm=100.0, expected_capacity=500):
+        """Build the analysis engines and start the event consumers (once per app)."""
+        with self._lock:
+            if self._app is app:
+                return
+            cfg = app.config
+            # Build config-like object from Flask config
+            _c = type('Cfg', (), {k: cfg[k] for k in cfg if isinstance(cfg[k], (str, int, float, bool))})()
+            self._ai_engine = CrowdSafeAI(_c)
+            self._crowd_analyzer = CrowdAnalyzer(_c)
+            self._risk_calculator = RiskCalculator(_c)
+            self._alert_manager = AlertManager(_c)
+            metric_writer.init_app(app)
+            live_broadcaster.init_app(app)
+            event_bus.init_app(app)
+            # Frame loops only publish; each consumer runs on its own worker thread.
+            # Status changes are rare and must not be lost, so their consumers
+            # wait for room instead of dropping.
+            consumers = (
+                ('live', (METRICS,), self._emit_live, 'drop_oldest', event_bus.block_timeout),
+                ('status_events', (STATUS,), self._emit_status, 'block', None),
+                ('camera_status', (STATUS,), self._store_status, 'block', None),
+                ('alerts', (METRICS,), self._check_alerts, 'drop_oldest', event_bus.block_timeout),
+            )
+            for name, topics, handler, policy, block_timeout in consumers:
+                if event_bus.get(name) is None:
+                    event_bus.subscribe(name, topics, handler, policy=policy, block_timeout=block_timeout)
+            self._app = app
+            logger.info("CameraManager initialized")
+
+    # ---- Event consumers ---------------------------------------------------
+
+    def _emit_live(self, topic, payload):
+        camera_id, metrics, _ = payload
+        live_broadcaster.publish(camera_id, metrics)
+
+    def _emit_status(self, topic, payload):
+        socketio.emit('camera_status', {k: v for k, v in payload.items() if k != 'run'})
+
+    def _store_status(self, topic, payload):
+        from backend.models.camera import Camera
+        camera_id = payload['camera_id']
+        proc = self._processors.get(camera_id)
+        if proc is not None and (payload.get('run') != proc.run
+                                 or payload['status'] == 'processing' and not proc.is_running):
+            # From a run that has since been replaced or stopped (e.g. the
+            # final `offline` of a stopped run arriving after a restart)
+            logger.debug(f"Skipped stale status {payload['status']} for camera {camera_id}")
+            return
+        with self._app.app_context():
+            cam = db.session.get(Camera, camera_id)
+            if cam:
+                cam.status = payload['status']
+                db.session.commit()
+
+    def _check_alerts(self, topic, payload):
+        camera_id, metrics, frame_jpeg = payload
+        self._alert_manager.check_and_alert(camera_id, metrics, self._app, frame_jpeg=frame_jpeg)
+
+    def start_camera(self, camera_id, source_path, area_sqm=100.0, expected_capacity=500,
+                     tracker=None):
         if camera_id in self._processors and self._processors[camera_id].is_running:
             return False
 
@@ -52,6 +105,7 @@ class CameraManager:
             app=self._app,
             area_sqm=area_sqm,
             expected_capacity=expected_capacity,
+            tracker=tracker,
         )
         self._processors[camera_id] = processor
         processor.start()
@@ -4,15 +4,17 @@ Crowd Behavior Analyzer - ML-based analysis layer.
 Runs on top of raw YOLO detections to produce higher-level intelligence:
   - DBSCAN spatial clustering (group detection)
   - Per-person proximity scoring (social distance)
+  (both share one per-frame SpatialIndex, as does crowd pressure)
   - Anomaly detection via velocity z-score
-  - Crowd flow coherence (stampede indicator)
+  - Crowd flow coherence (stampede indicator), from tracks or optical flow
   - Movement direction field
-  - Temporal trend prediction using exponential moving average
+  - Temporal trend prediction using streaming EMA / Holt state per camera
 """
 
 import numpy as np
-from collections import deque
 from sklearn.cluster import DBSCAN
+from backend.services.spatial_index import SpatialIndex
+from backend.services.trend_estimator import MetricTrends
 
 
 class CrowdAnalyzer:
@@ -23,16 +25,18 @@ class CrowdAnalyzer:
         self.cluster_min = getattr(config, 'CLUSTER_MIN_SAMPLES', 2)
         self.anomaly_zscore = getattr(config, 'ANOMALY_VELOCITY_ZSCORE', 2.0)
         self.coherence_window = getattr(config, 'COHERENCE_WINDOW', 10)
+        # Alert dicts materialized per frame; the full pair count is still reported
+        self.max_proximity_alerts = getattr(config, 'MAX_PROXIMITY_ALERTS', 200)
 
-        # Rolling history for trend prediction
-        self._density_history = deque(maxlen=60)
-        self._count_history = deque(maxlen=60)
-        self._risk_history = deque(maxlen=60)
+        self.forecast_horizon = getattr(config, 'TREND_FORECAST_SECONDS', 10)
+
+        # Streaming trend state, one MetricTrends per camera
+        self._trends = {}
 
         # Per-track direction vectors for coherence
         self._direction_vectors = {}
 
-    def analyze(self, detections, track_history, frame_shape):
+    def analyze(self, detections, track_history, frame_shape, motion=None, camera_id=None):
         """
         Takes raw detections from ai_engine and produces ML analysis.
 
@@ -40,42 +44,52 @@ class CrowdAnalyzer:
             detections: list of dicts with track_id, bbox, center, velocity, confidence
             track_history: dict {track_id: [(cx, cy, t), ...]}
             frame_shape: (h, w, c)
+            motion: optional optical-flow result from ai_engine; when present,
+                flow coherence and vectors come from it instead of track history
+            camera_id: selects the per-camera trend state
 
         Returns dict with:
             clusters, proximity_alerts, anomalies, flow_coherence,
             flow_vectors, crowd_pressure, trend_prediction
         """
         if len(detections) == 0:
-            return self._empty_result()
+            return self._empty_result(camera_id)
 
         centers = np.array([d['center'] for d in detections], dtype=np.float64)
         velocities = np.array([d['velocity'] for d in detections], dtype=np.float64)
         track_ids = [d['track_id'] for d in detections]
 
+        # Neighbour queries for clustering, proximity and pressure share one index
+        index = SpatialIndex(centers, max(self.proximity_thresh, self.cluster_eps))
+
         # 1) DBSCAN clustering
-        clusters = self._cluster_people(centers)
+        clusters = self._cluster_people(centers, index)
 
         # 2) Proximity scoring
-        proximity_alerts = self._proximity_analysis(centers, track_ids)
+        proximity_alerts, proximity_count = self._proximity_analysis(centers, track_ids, index)
 
         # 3) Velocity anomaly detection
         anomalies = self._detect_anomalies(velocities, track_ids)
 
         # 4) Flow coherence (stampede indicator)
-        flow_coherence, flow_vectors = self._flow_analysis(
-            track_ids, track_history, centers
-        )
+        if motion is not None:
+            flow_coherence, flow_vectors = motion['flow_coherence'], motion['flow_vectors']
+        else:
+            flow_coherence, flow_vectors = self._flow_analysis(
+                track_ids, track_history, centers
+            )
 
         # 5) Crowd pressure estimation
-        crowd_pressure = self._crowd_pressure(centers, velocities, frame_shape)
+        crowd_pressure = self._crowd_pressure(centers, velocities, frame_shape, index)
 
         # 6) Trend prediction
-        trend = self._trend_prediction()
+        trend = self._trend_prediction(camera_id)
 
         return {
             'clusters': clusters,
             'num_clusters': int(clusters['n_clusters']),
             'proximity_alerts': proximity_alerts,
+            'proximity_count': proximity_count,
             'anomalies': anomalies,
             'flow_coherence': round(flow_coherence, 3),
             'flow_vectors': flow_vectors,
@@ -83,20 +97,31 @@ class CrowdAnalyzer:
             'trend_prediction': trend,
         }
 
-    def update_history(self, density, count, risk_score):
+    def update_history(self, density, count, risk_score, crowd_pressure=None,
+                       camera_id=None, timestamp=None):
         """Call after each frame to feed trend prediction."""
-        self._density_history.append(density)
-        self._count_history.append(count)
-        self._risk_history.append(risk_score)
+        self._camera_trends(camera_id).update(
+            timestamp, density=density, count=count, risk=risk_score, pressure=crowd_pressure,
+        )
+
+    def reset_history(self, camera_id=None):
+        self._trends.pop(camera_id, None)
+
+    def _camera_trends(self, camera_id):
+        trends = self._trends.get(camera_id)
+        if trends is None:
+            trends = self._trends[camera_id] = MetricTrends()
+        return trends
 
     # ---- DBSCAN Clustering ----
 
-    def _cluster_people(self, centers):
+    def _cluster_people(self, centers, index):
         if len(centers) < self.cluster_min:
             return {'n_clusters': 0, 'labels': [], 'cluster_centers': [], 'cluster_sizes': []}
 
-        db = DBSCAN(eps=self.cluster_eps, min_samples=self.cluster_min)
-        labels = db.fit_predict(centers)
+        # Precomputed sparse radius graph: DBSCAN skips its own neighbour search
+        db = DBSCAN(eps=self.cluster_eps, min_samples=self.cluster_min, metric='precomputed')
+        labels = db.fit_predict(index.neighbor_graph(self.cluster_eps))
 
         unique_labels = set(labels)
         unique_labels.discard(-1)
@@ -121,28 +146,22 @@ class CrowdAnalyzer:
 
     # ---- Proximity ----
 
-    def _proximity_analysis(self, centers, track_ids):
-        alerts = []
-        n = len(centers)
-        if n < 2:
-            return alerts
-
-        # Pairwise distance matrix
-        diffs = centers[:, np.newaxis, :] - centers[np.newaxis, :, :]
-        dists = np.sqrt((diffs ** 2).sum(axis=2))
-
-        for i in range(n):
-            for j in range(i + 1, n):
-                if dists[i, j] < self.proximity_thresh:
-                    alerts.append({
-                        'pair': (track_ids[i], track_ids[j]),
-                        'distance_px': round(float(dists[i, j]), 1),
-                        'midpoint': (
-                            float((centers[i][0] + centers[j][0]) / 2),
-                            float((centers[i][1] + centers[j][1]) / 2),
-                        ),
-                    })
-        return alerts
+    def _proximity_analysis(self, centers, track_ids, index):
+        if len(centers) < 2:
+            return [], 0
+
+        ii, jj, dists = index.pairs_within(self.proximity_thresh)
+        count = len(dists)
+        k = self.max_proximity_alerts
+        ii, jj, dists = ii[:k], jj[:k], dists[:k]
+        mids = (centers[ii] + centers[jj]) / 2
+        tids = np.asarray(track_ids)
+        return [{
+            'pair': (a, b),
+            'distance_px': d,
+            'midpoint': (mx, my),
+        } for a, b, d, (mx, my) in zip(tids[ii].tolist(), tids[jj].tolist(),
+                                       np.round(dists, 1).tolist(), mids.tolist())], count
 
     # ---- Anomaly Detection ----
 
@@ -218,7 +237,7 @@ class CrowdAnalyzer:
 
     # ---- Crowd Pressure ----
 
-    def _crowd_pressure(self, centers, velocities, frame_shape):
+    def _crowd_pressure(self, centers, velocities, frame_shape, index):
         """
         Pressure = density * velocity_variance in local neighborhoods.
         Higher pressure = higher stampede/crush risk.
@@ -232,10 +251,7 @@ class CrowdAnalyzer:
             return 0.0
 
         # Local density: average nearest-neighbor distance
-        diffs = centers[:, np.newaxis, :] - centers[np.newaxis, :, :]
-        dists = np.sqrt((diffs ** 2).sum(axis=2))
-        np.fill_diagonal(dists, np.inf)
-        min_dists = dists.min(axis=1)
+        min_dists = index.nearest_distances()
         avg_min_dist = float(min_dists.mean())
 
         # Normalize: smaller distances = higher pressure
@@ -252,63 +268,46 @@ class CrowdAnalyzer:
 
     # ---- Trend Prediction ----
 
-    def _trend_prediction(self):
+    def _trend_prediction(self, camera_id=None):
         """
-        Exponential moving average prediction of where density/risk is heading.
-        Returns prediction for next ~10 frames.
+        Trend direction from the streaming EMAs, plus a Holt forecast of
+        density and risk `forecast_horizon` seconds ahead.
         """
         result = {
             'density_trend': 'stable',
             'risk_trend': 'stable',
+            'count_trend': 'stable',
+            'pressure_trend': 'stable',
             'density_ema': 0.0,
             'risk_ema': 0.0,
+            'density_forecast': 0.0,
+            'risk_forecast': 0.0,
+            'forecast_horizon_s': self.forecast_horizon,
         }
 
-        if len(self._density_history) < 5:
+        trends = self._trends.get(camera_id)
+        if trends is None or trends['density'].n < 5:
             return result
 
-        # EMA with alpha=0.3
-        density_ema = self._ema(list(self._density_history), 0.3)
-        risk_ema = self._ema(list(self._risk_history), 0.3)
-
-        # Compare current EMA to EMA from 5 steps ago
-        if len(self._density_history) >= 10:
-            old_density_ema = self._ema(list(self._density_history)[:-5], 0.3)
-            density_delta = density_ema - old_density_ema
-            if density_delta > 0.1:
-                result['density_trend'] = 'increasing'
-            elif density_delta < -0.1:
-                result['density_trend'] = 'decreasing'
-
-        if len(self._risk_history) >= 10:
-            old_risk_ema = self._ema(list(self._risk_history)[:-5], 0.3)
-            risk_delta = risk_ema - old_risk_ema
-            if risk_delta > 0.03:
-                result['risk_trend'] = 'increasing'
-            elif risk_delta < -0.03:
-                result['risk_trend'] = 'decreasing'
-
-        result['density_ema'] = round(density_ema, 3)
-        result['risk_ema'] = round(risk_ema, 3)
-        return result
+        for name in ('density', 'risk', 'count', 'pressure'):
+            result[f'{name}_trend'] = trends[name].direction()
 
-    @staticmethod
-    def _ema(data, alpha):
-        if not data:
-            return 0.0
-        ema = data[0]
-        for val in data[1:]:
-            ema = alpha * val + (1 - alpha) * ema
-        return ema
+        density, risk = trends['density'], trends['risk']
+        result['density_ema'] = round(density.ema, 3)
+        result['risk_ema'] = round(risk.ema, 3)
+        result['density_forecast'] = round(max(0.0, density.forecast(self.forecast_horizon)), 3)
+        result['risk_forecast'] = round(min(1.0, max(0.0, risk.forecast(self.forecast_horizon))), 3)
+        return result
 
-    def _empty_result(self):
+    def _empty_result(self, camera_id=None):
         return {
             'clusters': {'n_clusters': 0, 'labels': [], 'cluster_centers': [], 'cluster_sizes': []},
             'num_clusters': 0,
             'proximity_alerts': [],
+            'proximity_count': 0,
             'anomalies': [],
             'flow_coherence': 0.0,
             'flow_vectors': [],
             'crowd_pressure': 0.0,
-            'trend_prediction': self._trend_prediction(),
+            'trend_prediction': self._trend_prediction(camera_id),
         }
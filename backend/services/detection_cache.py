@@ -0,0 +1,237 @@
+"""
+Per-video detection sidecar cache.
+
+The first analysis pass over a file stores every frame's tracked boxes,
+confidences and track IDs; later passes (looping playback, batch re-analysis
+after tuning clustering/proximity/risk parameters, CLI runs) replay them
+instead of running YOLO and the tracker again.
+
+A cache is keyed by the file's content hash plus everything that changes the
+detector/tracker output: model, imgsz, confidence, IoU, tracker and the
+optical-flow threshold (frames above it store positional IDs, not track
+IDs). It is two files in DETECTION_CACHE_FOLDER:
+
+  <key>.dets    flat little-endian records (x1, y1, x2, y2, conf, track_id),
+                read with np.memmap, so opening a cache costs nothing and
+                replay touches only the pages of frames actually read
+  <key>.frames  .npy index: per-frame (offset, count, raw_count), where
+                raw_count is the detector count before tracking (it drives
+                the optical-flow mode switch)
+
+Writers only accept consecutive frames and publish atomically on finish();
+an interrupted pass leaves no cache behind.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from backend.utils.logger import get_logger
+
+logger = get_logger('detection_cache')
+
+DET_DTYPE = np.dtype([
+    ('x1', '<f4'), ('y1', '<f4'), ('x2', '<f4'), ('y2', '<f4'),
+    ('conf', '<f4'), ('track_id', '<i4'),
+])
+FRAME_DTYPE = np.dtype([('offset', '<i8'), ('count', '<i4'), ('raw_count', '<i4')])
+
+# Track IDs of batch segment parts are offset by this so they cannot collide when merged
+PART_ID_STRIDE = 1 << 24
+
+_digests = {}  # (path, size, mtime) -> content hash
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """BLAKE2b of the file content, memoized per (path, size, mtime)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _digests.get(memo_key)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _digests[memo_key] = digest
+    return digest
+
+
+def cache_key(path, config, tracker):
+    params = '|'.join(str(p) for p in (
+        file_digest(path),
+        getattr(config, 'YOLO_MODEL', ''),
+        getattr(config, 'YOLO_IMGSZ', 960),
+        getattr(config, 'YOLO_CONFIDENCE', 0.25),
+        getattr(config, 'YOLO_IOU', 0.5),
+        tracker,
+        getattr(config, 'OPTICAL_FLOW_THRESHOLD', 300),
+    ))
+    return hashlib.blake2b(params.encode(), digest_size=16).hexdigest()
+
+
+class DetectionCache:
+    """
+    Reader for a complete cache, writer for one that does not exist yet.
+
+    read(i) returns (xyxy, confs, track_ids, raw_count) for frame i, or None
+    when the cache is not complete; append() records frames while writing.
+    """
+
+    def __init__(self, folder, key, start=0, part=None):
+        self.folder = folder
+        self.key = key
+        name = key if part is None else f'{key}.part{part}'
+        self.dets_path = os.path.join(folder, f'{name}.dets')
+        self.frames_path = os.path.join(folder, f'{name}.frames.npy')
+        # Private temp name: concurrent first passes over one file must not interleave
+        self._tmp_path = f'{self.dets_path}.{os.getpid()}-{id(self):x}.tmp'
+        self._frames = None
+        self._dets = None
+        self._writer = None
+        self._index = []
+        self._offset = 0
+        self._next = start
+        self.start = start
+        # A part holds frames from `start` on; the full cache from frame 0
+        self._base = start if part is not None else 0
+
+        if os.path.exists(self.frames_path):
+            self._open()
+        else:
+            os.makedirs(folder, exist_ok=True)
+            self._writer = open(self._tmp_path, 'wb')
+
+    @classmethod
+    def for_video(cls, path, config, tracker, **kwargs):
+        """Cache for a video file, or None when caching is off or the source is not a file."""
+        if not getattr(config, 'DETECTION_CACHE_ENABLED', True) or not os.path.isfile(str(path)):
+            return None
+        folder = getattr(config, 'DETECTION_CACHE_FOLDER', 'cache')
+        return cls(folder, cache_key(path, config, tracker), **kwargs)
+
+    @classmethod
+    def exists(cls, folder, key):
+        return os.path.exists(os.path.join(folder, f'{key}.frames.npy'))
+
+    @classmethod
+    def discard_parts(cls, folder, key):
+        """Delete segment parts of `key` left behind by an earlier, failed batch run."""
+        prefix = f'{key}.part'
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith(prefix) and '.tmp' not in name:
+                try:
+                    os.remove(os.path.join(folder, name))
+                except OSError:
+                    pass
+
+    @property
+    def complete(self):
+        return self._frames is not None
+
+    def __len__(self):
+        return len(self._frames) if self._frames is not None else 0
+
+    def _open(self):
+        self._frames = np.load(self.frames_path, mmap_mode='r')
+        if os.path.getsize(self.dets_path):
+            self._dets = np.memmap(self.dets_path, dtype=DET_DTYPE, mode='r')
+        else:
+            self._dets = np.empty(0, dtype=DET_DTYPE)
+
+    def read(self, index):
+        index -= self._base
+        if self._frames is None or not 0 <= index < len(self._frames):
+            return None
+        offset, count, raw_count = self._frames[index]
+        rec = self._dets[offset:offset + count]
+        xyxy = np.column_stack([rec['x1'], rec['y1'], rec['x2'], rec['y2']])
+        return xyxy, np.array(rec['conf']), rec['track_id'].astype(int), int(raw_count)
+
+    def append(self, index, xyxy, confs, track_ids, raw_count):
+        """Record frame `index`. Frames before the writer's start are ignored;
+        a gap aborts the writer."""
+        if self._writer is None or index < self._next:
+            return
+        if index != self._next:
+            logger.warning(f"Detection cache {self.key}: frame gap at {index}, not caching")
+            self.close()
+            return
+        n = len(xyxy)
+        rec = np.empty(n, dtype=DET_DTYPE)
+        if n:
+            xyxy = np.asarray(xyxy, dtype=np.float32)
+            rec['x1'], rec['y1'], rec['x2'], rec['y2'] = xyxy[:, 0], xyxy[:, 1], xyxy[:, 2], xyxy[:, 3]
+            rec['conf'] = confs
+            rec['track_id'] = track_ids
+        self._writer.write(rec.tobytes())
+        self._index.append((self._offset, n, raw_count))
+        self._offset += n
+        self._next += 1
+
+    def finish(self):
+        """Publish what has been written; the cache becomes readable."""
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        os.replace(self._tmp_path, self.dets_path)
+        # The index is written last: its presence marks the cache complete
+        frames = np.array(self._index, dtype=FRAME_DTYPE)
+        tmp = self._tmp_path + '.npy'
+        np.save(tmp, frames)
+        os.replace(tmp, self.frames_path)
+        self._index = []
+        self._open()
+        logger.info(f"Detection cache {self.key}: {len(frames)} frames written")
+
+    def close(self):
+        """Discard an unfinished writer."""
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        self._index = []
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+    @classmethod
+    def merge(cls, folder, key, parts):
+        """
+        Join batch segment parts 0..parts-1 (consecutive frame ranges) into
+        the cache for `key`, then delete the parts. Returns the merged cache,
+        or None if any part is missing.
+        """
+        readers = []
+        for i in range(parts):
+            path = os.path.join(folder, f'{key}.part{i}.frames.npy')
+            if not os.path.exists(path):
+                return None
+            readers.append(cls(folder, key, part=i))
+
+        out = cls(folder, key)
+        if out.complete:
+            return out
+        for i, part in enumerate(readers):
+            frames = np.asarray(part._frames)
+            dets = np.array(part._dets)
+            dets['track_id'] += i * PART_ID_STRIDE
+            out._writer.write(dets.tobytes())
+            out._index.extend(
+                (int(o) + out._offset, int(c), int(r)) for o, c, r in frames
+            )
+            out._offset += len(dets)
+        out.finish()
+
+        for part in readers:
+            part._frames = part._dets = None
+            for path in (part.dets_path, part.frames_path):
+                os.remove(path)
+        return out
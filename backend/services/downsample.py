@@ -0,0 +1,115 @@
+"""
+Shape-preserving downsampling of time-ordered metric rows for charts.
+
+Both methods take an iterator of rows (mappings with a `timestamp`
+datetime) in time order, split [t0, t1] into equal time buckets and make a
+single pass, holding at most two buckets of rows, so a week of per-second
+data can be reduced without loading it.
+
+  lttb    Largest-Triangle-Three-Buckets: keeps the first and last row and,
+          per bucket, the row forming the largest triangle with the row kept
+          before it and the average of the next bucket.
+  minmax  Per bucket, the rows holding the minimum and maximum of `field`,
+          in time order (peaks are never lost).
+
+Buckets without rows produce no output, so gaps yield fewer than n rows.
+"""
+
+from datetime import datetime
+
+from backend.utils.helpers import naive_utc
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _seconds(dt):
+    return (naive_utc(dt) - _EPOCH).total_seconds()
+
+
+def _x(row):
+    return _seconds(row['timestamp'])
+
+
+def _buckets(rows, n, t0, t1):
+    """Yield (bucket_index, row) with equal-width time buckets over [t0, t1]."""
+    lo = _seconds(t0)
+    width = max((_seconds(t1) - lo) / max(n, 1), 1e-9)
+    for row in rows:
+        yield min(max(int((_x(row) - lo) / width), 0), n - 1), row
+
+
+def lttb(rows, n, field, t0, t1):
+    """Downsample to at most `n` rows with Largest-Triangle-Three-Buckets on `field`."""
+    if n < 3:
+        return minmax(rows, max(n // 2, 1), field, t0, t1)
+
+    out = []
+    selected = None        # (x, y) of the last kept row
+    cur = []               # rows of the bucket awaiting selection
+    nxt = []               # rows of the following non-empty bucket
+    nxt_index = None
+
+    def pick(bucket, c):
+        ax, ay = selected
+        cx, cy = c
+        best, best_area = None, -1.0
+        for row in bucket:
+            bx, by = _x(row), float(row[field] or 0)
+            area = abs((ax - cx) * (by - ay) - (ax - bx) * (cy - ay))
+            if area > best_area:
+                best, best_area = row, area
+        return best
+
+    def avg(bucket):
+        return (sum(_x(r) for r in bucket) / len(bucket),
+                sum(float(r[field] or 0) for r in bucket) / len(bucket))
+
+    last = None
+    for index, row in _buckets(rows, n - 2, t0, t1):
+        last = row
+        if selected is None:
+            out.append(row)
+            selected = (_x(row), float(row[field] or 0))
+            continue
+        if index != nxt_index:
+            if cur:
+                chosen = pick(cur, avg(nxt))
+                out.append(chosen)
+                selected = (_x(chosen), float(chosen[field] or 0))
+            cur, nxt, nxt_index = nxt, [], index
+        nxt.append(row)
+
+    if last is None or last is out[0]:
+        return out
+    # The final row is always kept; choose from what remains before it
+    nxt.pop()
+    end = (_x(last), float(last[field] or 0))
+    for bucket, c in ((cur, avg(nxt) if nxt else end), (nxt, end)):
+        if bucket:
+            chosen = pick(bucket, c)
+            out.append(chosen)
+            selected = (_x(chosen), float(chosen[field] or 0))
+    out.append(last)
+    return out
+
+
+def minmax(rows, n, field, t0, t1):
+    """Downsample to at most `2 * n` rows: the min and max of `field` per time bucket."""
+    out = []
+    index = None
+    lo = hi = None
+    for i, row in _buckets(rows, n, t0, t1):
+        if i != index:
+            if lo is not None:
+                out.extend((lo, hi) if lo is not hi else (lo,))
+            index, lo, hi = i, row, row
+            continue
+        v = float(row[field] or 0)
+        if v < float(lo[field] or 0):
+            lo = row
+        if v > float(hi[field] or 0):
+            hi = row
+    if lo is not None:
+        out.extend((lo, hi) if lo is not hi else (lo,))
+    out.sort(key=_x)
+    return out
@@ -0,0 +1,217 @@
+"""
+In-process publish/subscribe between the camera frame loops and their I/O.
+
+A frame loop publishes events (per-frame metrics, camera status changes,
+annotated frames for the recording) and returns immediately. Every
+consumer (Socket.IO emitter, camera status writer, alert evaluator, one
+recorder per running camera) has its own bounded queue and worker thread,
+so a slow database, Telegram call or video encoder only delays that
+consumer, never frame processing.
+
+When a consumer's queue is full its policy decides:
+
+  drop_new     discard the incoming event
+  drop_oldest  discard the oldest queued event to make room (latest state wins)
+  block        wait up to EVENT_BLOCK_TIMEOUT seconds for room, then discard
+               (a consumer subscribed with block_timeout=None never discards)
+
+Dropped events, queue depth, publish-to-handle lag and handler time are
+kept per consumer and reported by stats().
+"""
+
+import atexit
+import queue
+import threading
+import time
+
+from backend.utils.logger import get_logger
+
+logger = get_logger('event_bus')
+
+METRICS = 'metrics'   # (camera_id, metrics dict, latest JPEG bytes)
+STATUS = 'status'     # {'camera_id', 'status', ...} as emitted in `camera_status`
+POLICIES = ('drop_new', 'drop_oldest', 'block')
+_STOP = object()
+_DEFAULT = object()
+
+
+def frames_topic(camera_id):
+    """Topic of a camera's annotated frames (payload: (frame, fps))."""
+    return f'frames.{camera_id}'
+
+
+class Consumer:
+
+    def __init__(self, name, topics, handler, maxsize, policy, block_timeout):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown event policy '{policy}'")
+        self.name = name
+        self.topics = frozenset(topics)
+        self.handler = handler
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max(int(maxsize), 1))
+        self._thread = threading.Thread(target=self._run, name=f'events-{name}', daemon=True)
+
+        self.delivered = 0
+        self.handled = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.blocked_ms = 0.0
+        self._total_lag_ms = 0.0
+        self._total_handle_ms = 0.0
+
+    def start(self):
+        self._thread.start()
+
+    def offer(self, topic, payload):
+        """Queue one event according to the policy. False if it was dropped."""
+        item = (topic, payload, time.monotonic())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self.policy == 'drop_new':
+                self.dropped += 1
+                return False
+            if self.policy == 'drop_oldest':
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+                try:
+                    self._queue.put_nowait(item)
+                except queue.Full:
+                    self.dropped += 1
+                    return False
+            else:
+                t0 = time.monotonic()
+                try:
+                    self._queue.put(item, timeout=self.block_timeout)
+                except queue.Full:
+                    self.dropped += 1
+                    return False
+                finally:
+                    self.blocked_ms += (time.monotonic() - t0) * 1000
+        self.delivered += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            topic, payload, published = item
+            t0 = time.monotonic()
+            lag_ms = (t0 - published) * 1000
+            self.last_lag_ms = lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            self._total_lag_ms += lag_ms
+            try:
+                self.handler(topic, payload)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Event consumer {self.name} failed on {topic}: {e}")
+            self.handled += 1
+            self._total_handle_ms += (time.monotonic() - t0) * 1000
+
+    def stop(self, timeout):
+        """Handle everything already queued, then stop. False if the worker did not finish in time."""
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return False
+        self._thread.join(timeout=timeout)
+        return not self._thread.is_alive()
+
+    def stats(self):
+        return {
+            'topics': sorted(self.topics),
+            'policy': self.policy,
+            'queue_depth': self._queue.qsize(),
+            'max_depth': self.max_depth,
+            'capacity': self._queue.maxsize,
+            'delivered': self.delivered,
+            'handled': self.handled,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'last_lag_ms': round(self.last_lag_ms, 2),
+            'max_lag_ms': round(self.max_lag_ms, 2),
+            'avg_lag_ms': round(self._total_lag_ms / self.handled, 2) if self.handled else 0.0,
+            'avg_handle_ms': round(self._total_handle_ms / self.handled, 2) if self.handled else 0.0,
+            'blocked_ms': round(self.blocked_ms, 2),
+        }
+
+
+class EventBus:
+
+    def __init__(self):
+        self._consumers = {}
+        self._by_topic = {}
+        self._lock = threading.Lock()
+        self.queue_size = 256
+        self.block_timeout = 2.0
+        atexit.register(self.stop_all)
+
+    def init_app(self, app):
+        self.queue_size = int(app.config.get('EVENT_QUEUE_SIZE', 256))
+        self.block_timeout = float(app.config.get('EVENT_BLOCK_TIMEOUT', 2.0))
+
+    def subscribe(self, name, topics, handler, policy='drop_oldest', maxsize=None,
+                  block_timeout=_DEFAULT):
+        """
+        Start consumer `name`, calling handler(topic, payload) on its own
+        thread for every event published to one of `topics`. `block_timeout`
+        overrides EVENT_BLOCK_TIMEOUT for a `block` consumer (None: wait).
+        """
+        if block_timeout is _DEFAULT:
+            block_timeout = self.block_timeout
+        consumer = Consumer(name, topics, handler, maxsize or self.queue_size,
+                            policy, block_timeout)
+        with self._lock:
+            if name in self._consumers:
+                raise ValueError(f"Event consumer '{name}' already exists")
+            self._consumers[name] = consumer
+            self._index()
+        consumer.start()
+        return consumer
+
+    def unsubscribe(self, name, timeout=30):
+        """Stop consumer `name` after it has handled its queued events."""
+        with self._lock:
+            consumer = self._consumers.pop(name, None)
+            self._index()
+        if consumer is not None and not consumer.stop(timeout):
+            logger.warning(f"Event consumer {name} still busy after {timeout}s")
+
+    def get(self, name):
+        return self._consumers.get(name)
+
+    def _index(self):
+        by_topic = {}
+        for consumer in self._consumers.values():
+            for topic in consumer.topics:
+                by_topic.setdefault(topic, []).append(consumer)
+        self._by_topic = by_topic
+
+    def has_subscribers(self, topic):
+        return bool(self._by_topic.get(topic))
+
+    def publish(self, topic, payload):
+        """Hand `payload` to every consumer of `topic`; never waits except for `block` consumers."""
+        for consumer in self._by_topic.get(topic, ()):
+            consumer.offer(topic, payload)
+
+    def stop_all(self, timeout=10):
+        for name in list(self._consumers):
+            self.unsubscribe(name, timeout)
+
+    def stats(self):
+        return {name: c.stats() for name, c in list(self._consumers.items())}
+
+
+event_bus = EventBus()
@@ -1,10 +1,12 @@
 """
 Export service for analytics data.
-Generates CSV, DOCX, PDF, and Markdown reports from metrics data.
+Generates CSV, DOCX, PDF, and Markdown reports from metrics data, and
+streams CSV/JSONL exports of unbounded size chunk by chunk.
 """
 
 import csv
 import io
+import json
 from datetime import datetime, timezone, timedelta
 
 IST = timezone(timedelta(hours=5, minutes=30))
@@ -27,34 +29,140 @@ def _now_ist():
     return datetime.now(IST).strftime('%d %b %Y, %I:%M:%S %p IST')
 
 
+CSV_HEADER = [
+    'Timestamp', 'Count', 'Density (p/m²)', 'Avg Velocity (m/s)',
+    'Max Velocity (m/s)', 'Surge Rate', 'Risk Score', 'Risk Level',
+    'Capacity Util (%)', 'Flow In', 'Flow Out'
+]
+
+# Rows per chunk yielded by the streaming exports
+STREAM_CHUNK_ROWS = 1000
+
+
+def _csv_row(m):
+    return [
+        _to_ist(m.get('timestamp', '')),
+        m.get('count', 0),
+        m.get('density', 0),
+        m.get('avg_velocity', 0),
+        m.get('max_velocity', 0),
+        m.get('surge_rate', 0),
+        m.get('risk_score', 0),
+        m.get('risk_level', 'SAFE'),
+        m.get('capacity_utilization', 0),
+        m.get('flow_in', 0),
+        m.get('flow_out', 0),
+    ]
+
+
 def export_csv(metrics, summary):
     """Generate CSV bytes from metrics list."""
     output = io.StringIO()
     writer = csv.writer(output)
-    writer.writerow([
-        'Timestamp', 'Count', 'Density (p/m²)', 'Avg Velocity (m/s)',
-        'Max Velocity (m/s)', 'Surge Rate', 'Risk Score', 'Risk Level',
-        'Capacity Util (%)', 'Flow In', 'Flow Out'
-    ])
+    writer.writerow(CSV_HEADER)
     for m in metrics:
-        writer.writerow([
-            _to_ist(m.get('timestamp', '')),
-            m.get('count', 0),
-            m.get('density', 0),
-            m.get('avg_velocity', 0),
-            m.get('max_velocity', 0),
-            m.get('surge_rate', 0),
-            m.get('risk_score', 0),
-            m.get('risk_level', 'SAFE'),
-            m.get('capacity_utilization', 0),
-            m.get('flow_in', 0),
-            m.get('flow_out', 0),
-        ])
+        writer.writerow(_csv_row(m))
     return output.getvalue().encode('utf-8')
 
 
-def export_docx(metrics, summary, camera_name='Camera'):
-    """Generate DOCX bytes from metrics data."""
+class RunningSummary:
+    """
+    Export summary accumulated row by row (raw `metrics` row mappings in
+    time order), with the same time weighting as the /summary endpoint:
+    each row holds until the next, capped at `max_hold` seconds. The last
+    exported row holds until the camera's first row after the range, passed
+    to hold_until(); without one (the camera's newest row) it has no hold.
+    """
+
+    def __init__(self, max_hold=30.0):
+        self.max_hold = max_hold
+        self.records = 0
+        self.peak_count = 0
+        self.max_risk = 0.0
+        self._prev = None
+        self._hold = 0.0
+        self._sums = {'count': 0.0, 'density': 0.0}
+        self._wsums = {'count': 0.0, 'density': 0.0}
+
+    def _hold_prev(self, ts):
+        prev = self._prev
+        if prev is not None:
+            gap = (ts - prev['timestamp']).total_seconds()
+            hold = min(max(gap, 0.0), self.max_hold)
+            self._hold += hold
+            for k in self._wsums:
+                self._wsums[k] += (prev[k] or 0) * hold
+
+    def add(self, row):
+        self._hold_prev(row['timestamp'])
+        for k in self._sums:
+            self._sums[k] += row[k] or 0
+        self.records += 1
+        self.peak_count = max(self.peak_count, row['count'] or 0)
+        self.max_risk = max(self.max_risk, row['risk_score'] or 0.0)
+        self._prev = row
+
+    def hold_until(self, row):
+        """Hold the last added row until `row` (the first row after the
+        range, or None); `row` itself is not counted."""
+        if row is not None:
+            self._hold_prev(row['timestamp'])
+        self._prev = None
+
+    def _avg(self, key):
+        if self._hold > 0:
+            return self._wsums[key] / self._hold
+        return self._sums[key] / self.records if self.records else 0.0
+
+    def result(self):
+        return {
+            'avg_density': round(self._avg('density'), 3),
+            'peak_count': self.peak_count,
+            'avg_count': round(self._avg('count'), 1),
+            'max_risk_score': round(self.max_risk, 3),
+            'total_records': self.records,
+        }
+
+
+def stream_csv(metrics, summary):
+    """
+    Yield CSV bytes chunk by chunk for an iterator of metric dicts, then a
+    summary section from `summary` (a RunningSummary fed by the same
+    iterator, so it is complete once the rows are exhausted).
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    n = 0
+    for m in metrics:
+        writer.writerow(_csv_row(m))
+        n += 1
+        if n % STREAM_CHUNK_ROWS == 0:
+            yield output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate()
+
+    writer.writerow([])
+    writer.writerow(['Summary'])
+    for key, value in summary.result().items():
+        writer.writerow([key, value])
+    yield output.getvalue().encode('utf-8')
+
+
+def stream_jsonl(metrics, summary):
+    """Yield JSON Lines chunk by chunk: one object per metric, then {"summary": {...}}."""
+    lines = []
+    for m in metrics:
+        lines.append(json.dumps(m))
+        if len(lines) >= STREAM_CHUNK_ROWS:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    lines.append(json.dumps({'summary': summary.result()}))
+    yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def export_docx(metrics, summary, camera_name='Camera', progress=None):
+    """Generate DOCX bytes from metrics data. `progress(done, total)` is called per row."""
     from docx import Document
     from docx.shared import Inches, Pt, RGBColor
     from docx.enum.table import WD_TABLE_ALIGNMENT
@@ -99,7 +207,7 @@ def export_docx(metrics, summary, camera_name='Camera'):
                 run.font.size = Pt(9)
 
     # Data rows
-    for m in metrics:
+    for n, m in enumerate(metrics, 1):
         row = table.add_row()
         row.cells[0].text = _to_ist(m.get('timestamp', ''))
         row.cells[1].text = str(m.get('count', 0))
@@ -113,14 +221,16 @@ def export_docx(metrics, summary, camera_name='Camera'):
             for paragraph in cell.paragraphs:
                 for run in paragraph.runs:
                     run.font.size = Pt(8)
+        if progress:
+            progress(n, len(metrics))
 
     buf = io.BytesIO()
     doc.save(buf)
     return buf.getvalue()
 
 
-def export_pdf(metrics, summary, camera_name='Camera'):
-    """Generate PDF bytes from metrics data."""
+def export_pdf(metrics, summary, camera_name='Camera', progress=None):
+    """Generate PDF bytes from metrics data. `progress(done, total)` is called per row."""
     from fpdf import FPDF
 
     pdf = FPDF()
@@ -177,7 +287,7 @@ def export_pdf(metrics, summary, camera_name='Camera'):
     # Data
     pdf.set_font('Helvetica', '', 7)
     pdf.set_text_color(0, 0, 0)
-    for m in metrics:
+    for n, m in enumerate(metrics, 1):
         ts = _to_ist(m.get('timestamp', ''))
 
         risk_pct = f"{round(m.get('risk_score', 0) * 100, 1)}"
@@ -205,14 +315,16 @@ def export_pdf(metrics, summary, camera_name='Camera'):
         for i, val in enumerate(row_data):
             pdf.cell(col_widths[i], 6, val, border=1, fill=True, align='C')
         pdf.ln()
+        if progress:
+            progress(n, len(metrics))
 
     buf = io.BytesIO()
     pdf.output(buf)
     return buf.getvalue()
 
 
-def export_markdown(metrics, summary, camera_name='Camera'):
-    """Generate Markdown string from metrics data."""
+def export_markdown(metrics, summary, camera_name='Camera', progress=None):
+    """Generate Markdown string from metrics data. `progress(done, total)` is called per row."""
     lines = []
     lines.append('# CrowdSafe Analytics Report')
     lines.append('')
@@ -234,13 +346,15 @@ def export_markdown(metrics, summary, camera_name='Camera'):
     lines.append('| Timestamp | Count | Density | Velocity | Risk Score | Risk Level |')
     lines.append('|---|---|---|---|---|---|')
 
-    for m in metrics:
+    for n, m in enumerate(metrics, 1):
         ts = _to_ist(m.get('timestamp', ''))
         risk_pct = f"{round(m.get('risk_score', 0) * 100, 1)}%"
         lines.append(
             f'| {ts} | {m.get("count", 0)} | {m.get("density", 0)} '
             f'| {m.get("avg_velocity", 0)} | {risk_pct} | {m.get("risk_level", "SAFE")} |'
         )
+        if progress:
+            progress(n, len(metrics))
 
     lines.append('')
     return '\n'.join(lines)
@@ -0,0 +1,142 @@
+"""
+Per-frame analysis pipeline for one camera stream.
+
+Detection -> tracking / optical flow -> crowd analysis -> risk scoring ->
+trend update, with the per-stream state (tracker, motion estimator) owned
+here. The live VideoProcessor and the offline batch analyzer both drive
+the same pipeline, so a file analysed in either mode gives the same numbers.
+
+With a DetectionCache attached, frames are looked up by index: cached
+frames skip the detector and tracker, new ones are recorded.
+"""
+
+from datetime import datetime
+
+import cv2
+
+from backend.services.media_clock import MediaClock
+from backend.services.motion_field import OpticalFlowMotion
+from backend.services.trackers import create_tracker
+
+MAX_FRAME_WIDTH = 1280
+
+# Metrics dict keys persisted as columns of the `metrics` table
+METRIC_COLUMNS = (
+    'camera_id', 'count', 'density', 'avg_velocity', 'max_velocity', 'surge_rate',
+    'flow_in', 'flow_out', 'risk_score', 'risk_level', 'capacity_utilization',
+    'crowd_pressure', 'flow_coherence', 'frame_number',
+)
+
+
+class FramePipeline:
+
+    def __init__(self, camera_id, ai_engine, crowd_analyzer, risk_calculator,
+                 area_sqm=100.0, expected_capacity=500, tracker=None):
+        self.camera_id = camera_id
+        self.ai_engine = ai_engine
+        self.crowd_analyzer = crowd_analyzer
+        self.risk_calculator = risk_calculator
+        self.area_sqm = area_sqm
+        self.expected_capacity = expected_capacity
+        self.tracker = create_tracker(tracker, config=ai_engine.config)
+        self.motion = OpticalFlowMotion(ai_engine.config)
+        self.cache = None
+
+    def reset(self, history=False):
+        """Drop tracking state; `history` also clears the camera's trend state."""
+        self.tracker.reset()
+        self.motion.reset()
+        if history:
+            self.crowd_analyzer.reset_history(self.camera_id)
+
+    def process(self, frame, timestamp, fps=30, frame_index=None):
+        """
+        Analyse one BGR frame taken at `timestamp` (epoch seconds).
+        `frame_index` (0-based position in the file) enables the cache.
+
+        Returns (raw_frame, analysis, ml_analysis, risk_score, risk_level);
+        raw_frame is the (possibly downscaled) frame to annotate.
+        """
+        h, w = frame.shape[:2]
+        if w > MAX_FRAME_WIDTH:
+            scale = MAX_FRAME_WIDTH / w
+            frame = cv2.resize(frame, (MAX_FRAME_WIDTH, int(h * scale)))
+
+        cache = self.cache if frame_index is not None else None
+        cached = cache.read(frame_index) if cache is not None else None
+
+        # AI detection + tracking (or cached replay)
+        raw_frame, analysis = self.ai_engine.analyze_frame(
+            frame, self.area_sqm, self.expected_capacity, int(fps),
+            tracker=self.tracker,
+            motion=self.motion,
+            timestamp=timestamp,
+            detections=cached,
+        )
+        if cache is not None and cached is None:
+            cache.append(frame_index, *analysis['tracked'])
+
+        # ML crowd analysis (clustering, anomalies, flow, pressure)
+        ml_analysis = self.crowd_analyzer.analyze(
+            analysis.get('detections', []),
+            self.tracker.track_history,
+            frame.shape,
+            motion=analysis.get('motion'),
+            camera_id=self.camera_id,
+        )
+
+        # Risk scoring (enhanced with ML signals)
+        risk_score, risk_level = self.risk_calculator.calculate(
+            density=analysis['density'],
+            avg_velocity=analysis['avg_velocity'],
+            surge_rate=analysis['surge_rate'],
+            count=analysis['count'],
+            crowd_pressure=ml_analysis.get('crowd_pressure', 0),
+            flow_coherence=ml_analysis.get('flow_coherence', 0),
+        )
+
+        # Feed trend prediction
+        self.crowd_analyzer.update_history(
+            analysis['density'], analysis['count'], risk_score,
+            crowd_pressure=ml_analysis.get('crowd_pressure', 0),
+            camera_id=self.camera_id,
+            timestamp=timestamp,
+        )
+
+        return raw_frame, analysis, ml_analysis, risk_score, risk_level
+
+    def build_metrics(self, analysis, ml_analysis, risk_score, risk_level,
+                      frame_number, timestamp, media_time=None):
+        """Flat per-frame metrics dict, as emitted to clients and persisted."""
+        trend = ml_analysis.get('trend_prediction', {})
+        return {
+            'camera_id': self.camera_id,
+            'count': analysis['count'],
+            'density': round(analysis['density'], 3),
+            'avg_velocity': round(analysis['avg_velocity'], 2),
+            'max_velocity': round(analysis['max_velocity'], 2),
+            'surge_rate': round(analysis['surge_rate'], 3),
+            'flow_in': analysis.get('flow_in', 0),
+            'flow_out': analysis.get('flow_out', 0),
+            'risk_score': round(risk_score, 3),
+            'risk_level': risk_level,
+            'capacity_utilization': round(analysis.get('capacity_utilization', 0), 1),
+            'num_clusters': ml_analysis.get('num_clusters', 0),
+            'flow_coherence': ml_analysis.get('flow_coherence', 0),
+            'crowd_pressure': ml_analysis.get('crowd_pressure', 0),
+            'num_anomalies': len(ml_analysis.get('anomalies', [])),
+            'density_trend': trend.get('density_trend', 'stable'),
+            'risk_trend': trend.get('risk_trend', 'stable'),
+            'risk_forecast': trend.get('risk_forecast', 0.0),
+            'motion_mode': analysis.get('motion_mode', 'tracking'),
+            'frame_number': frame_number,
+            'media_time': None if media_time is None else round(media_time, 3),
+            'timestamp': MediaClock.to_datetime(timestamp).isoformat(),
+        }
+
+
+def metric_row(metrics):
+    """Column values of a `Metric` row for a metrics dict from build_metrics."""
+    row = {k: metrics.get(k, 0) for k in METRIC_COLUMNS}
+    row['timestamp'] = datetime.fromisoformat(metrics['timestamp'])
+    return row
@@ -0,0 +1,189 @@
+"""
+Rate-limited Socket.IO delivery of live metrics.
+
+publish() is called once per frame (by the `live` event bus consumer, see
+event_bus.py). It only stores the frame's metrics as the camera's pending
+update (a newer frame replaces an unsent one) and never serializes or
+emits. One broadcaster thread flushes the pending updates at most
+LIVE_METRICS_MAX_HZ times per second as `metrics_update` to each camera's
+room (`camera_<id>`), and skips cameras whose room has no subscribers.
+
+Every DASHBOARD_DIGEST_SECONDS the same thread also sends one
+`dashboard_digest` (every camera's latest metrics plus the global counters
+of /api/metrics/summary and /api/system/stats) to the `dashboard` room, if
+anyone has joined it. The dashboard renders from the digest instead of
+polling the REST endpoints.
+"""
+
+import atexit
+import threading
+import time
+from datetime import datetime, timezone
+
+from backend.extensions import socketio
+from backend.utils.logger import get_logger
+
+logger = get_logger('live_broadcaster')
+
+DASHBOARD_ROOM = 'dashboard'
+# Per-camera fields carried in the digest (what the dashboard tiles show)
+DIGEST_FIELDS = ('count', 'density', 'risk_score', 'risk_level', 'timestamp')
+# metric_store.count() scans every partition; between refreshes the digest
+# adds the metric writer's rows written since the last count
+_COUNT_REFRESH_SECONDS = 60
+
+
+def camera_room(camera_id):
+    return f'camera_{camera_id}'
+
+
+def has_subscribers(room):
+    """Whether any client of this server has joined `room` (default namespace)."""
+    server = socketio.server
+    if server is None:
+        return False
+    return next(iter(server.manager.get_participants('/', room)), None) is not None
+
+
+class LiveBroadcaster:
+
+    def __init__(self):
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = {}  # camera_id -> latest unsent metrics
+        self.interval = 0.25
+        self.digest_interval = 2.0
+        self._metric_count = None  # (count, metric_writer.rows_written, monotonic time)
+
+        self.published = 0
+        self.emitted = 0
+        self.coalesced = 0
+        self.unsubscribed = 0
+        self.digests = 0
+
+    def init_app(self, app):
+        """Configure from the app and start the broadcaster thread (idempotent)."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._app = app
+            self.interval = 1.0 / max(float(app.config.get('LIVE_METRICS_MAX_HZ', 4)), 0.1)
+            self.digest_interval = float(app.config.get('DASHBOARD_DIGEST_SECONDS', 2.0))
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='live-broadcaster', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+            logger.info(f"Live broadcaster started ({1.0 / self.interval:g} updates/s per camera)")
+
+    def publish(self, camera_id, metrics):
+        """Make `metrics` the camera's next `metrics_update`, replacing any unsent one."""
+        with self._lock:
+            if camera_id in self._pending:
+                self.coalesced += 1
+            self._pending[camera_id] = metrics
+        self.published += 1
+
+    def stop(self, timeout=5):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run(self):
+        next_digest = time.monotonic()
+        while not self._stop.wait(self.interval):
+            try:
+                self._flush()
+                if time.monotonic() >= next_digest:
+                    next_digest = time.monotonic() + self.digest_interval
+                    if has_subscribers(DASHBOARD_ROOM):
+                        socketio.emit('dashboard_digest', self.digest(), room=DASHBOARD_ROOM)
+                        self.digests += 1
+            except Exception as e:
+                logger.error(f"Live broadcast failed: {e}")
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for camera_id, metrics in pending.items():
+            room = camera_room(camera_id)
+            if not has_subscribers(room):
+                self.unsubscribed += 1
+                continue
+            socketio.emit('metrics_update', metrics, room=room)
+            self.emitted += 1
+
+    def _metrics_recorded(self):
+        from backend.services.metric_store import metric_store
+        from backend.services.metric_writer import metric_writer
+
+        now = time.monotonic()
+        if self._metric_count is None or now - self._metric_count[2] >= _COUNT_REFRESH_SECONDS:
+            self._metric_count = (metric_store.count(), metric_writer.rows_written, now)
+        count, written, _ = self._metric_count
+        return count + metric_writer.rows_written - written
+
+    def digest(self):
+        """Latest metrics of every camera and the global counters, for the dashboard."""
+        from backend.extensions import db
+        from backend.models.alert import Alert
+        from backend.models.camera import Camera
+        from backend.services.camera_manager import camera_manager
+
+        with self._app.app_context():
+            cameras = db.session.query(Camera).order_by(Camera.created_at.desc()).all()
+            unack = Alert.query.filter_by(acknowledged=False).count()
+            recorded = self._metrics_recorded()
+
+        status = camera_manager.get_all_status()
+        total_people = cameras_active = 0
+        max_risk, max_risk_level = 0.0, 'SAFE'
+        out = []
+        for cam in cameras:
+            info = status.get(cam.id)
+            running = bool(info and info['running'])
+            current = {}
+            if running:
+                m = info['metrics']
+                current = {k: m[k] for k in DIGEST_FIELDS if k in m}
+                cameras_active += 1
+                total_people += m.get('count', 0)
+                if m.get('risk_score', 0) > max_risk:
+                    max_risk = m['risk_score']
+                    max_risk_level = m.get('risk_level', 'SAFE')
+            out.append({'id': cam.id, 'name': cam.name, 'status': cam.status,
+                        'is_processing': running, 'current_metrics': current})
+
+        return {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'stats': {
+                'total_people': total_people,
+                'cameras_active': cameras_active,
+                'cameras_total': len(cameras),
+                'max_risk_score': round(max_risk, 3),
+                'max_risk_level': max_risk_level,
+                'alerts_unacknowledged': unack,
+                'metrics_recorded': recorded,
+            },
+            'cameras': out,
+        }
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'max_hz': round(1.0 / self.interval, 2),
+            'published': self.published,
+            'emitted': self.emitted,
+            'coalesced': self.coalesced,
+            'skipped_no_subscribers': self.unsubscribed,
+            'pending': pending,
+            'digests': self.digests,
+        }
+
+
+live_broadcaster = LiveBroadcaster()
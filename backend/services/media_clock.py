@@ -0,0 +1,54 @@
+"""
+Per-frame timestamps taken from the video source rather than the processing loop.
+
+For files the clock follows the media position (CAP_PROP_POS_MSEC, falling
+back to frame index / fps), anchored at the wall time analysis started, so
+velocities, surge and trend figures are identical however fast the file is
+processed. Live feeds use capture time. Timestamps are epoch seconds either
+way, so downstream code can treat both alike.
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+
+import cv2
+
+
+class MediaClock:
+
+    def __init__(self, cap, source_path, origin=None):
+        self.is_file = os.path.isfile(str(source_path))
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        self.origin = time.time() if origin is None else origin
+        self._offset = 0.0    # media duration of completed passes (looping files)
+        self._pos = 0.0       # media position of the last frame in this pass
+        self._index = 0       # frames read in this pass
+        self.media_time = 0.0
+
+    def tick(self, cap):
+        """Timestamp (epoch seconds) of the frame just read from `cap`."""
+        if not self.is_file:
+            self._index += 1
+            return time.time()
+
+        msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        pos = msec / 1000.0 if msec and msec > 0 else self._index / self.fps
+        if self._index and pos <= self._pos:
+            # Backend without usable timestamps: step by the nominal frame period
+            pos = self._pos + 1.0 / self.fps
+        self._pos = pos
+        self._index += 1
+        self.media_time = self._offset + pos
+        return self.origin + self.media_time
+
+    def rewind(self):
+        """Source looped back to the start; keep time moving forward."""
+        if self._index:
+            self._offset += self._pos + 1.0 / self.fps
+        self._pos = 0.0
+        self._index = 0
+
+    @staticmethod
+    def to_datetime(ts):
+        return datetime.fromtimestamp(ts, timezone.utc)
@@ -0,0 +1,142 @@
+"""
+Fixed-size, array-backed ring of full-rate live metrics.
+
+Only deadband/heartbeat rows reach the database (persistence_policy.py),
+so each VideoProcessor also keeps every frame's metrics for the last
+METRIC_RING_MINUTES in preallocated numpy columns. Appending overwrites the
+oldest slot in place (no per-frame allocation or list trimming), and
+"last N minutes at full rate" is a binary search plus a slice, served
+straight from memory.
+"""
+
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Numeric metric columns kept per frame (the `metrics` table's, minus ids)
+RING_FIELDS = (
+    'count', 'density', 'avg_velocity', 'max_velocity', 'surge_rate', 'flow_in', 'flow_out',
+    'risk_score', 'capacity_utilization', 'crowd_pressure', 'flow_coherence', 'frame_number',
+)
+_INT_FIELDS = {'count', 'flow_in', 'flow_out', 'frame_number'}
+RISK_LEVELS = ('SAFE', 'CAUTION', 'WARNING', 'CRITICAL')
+_LEVEL_CODES = {lvl: i for i, lvl in enumerate(RISK_LEVELS)}
+
+
+class MetricRing:
+
+    def __init__(self, capacity):
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = max(int(capacity), 1)
+        self._ts = np.zeros(self.capacity, dtype=np.float64)           # epoch seconds
+        self._values = np.zeros((self.capacity, len(RING_FIELDS)), dtype=np.float64)
+        self._levels = np.zeros(self.capacity, dtype=np.int8)
+        self._next = 0   # slot the next append writes
+        self._size = 0
+
+    def resize(self, capacity):
+        """Reallocate for a new capacity, dropping the contents."""
+        with self._lock:
+            self._allocate(capacity)
+
+    def clear(self):
+        with self._lock:
+            self._next = 0
+            self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, ts, metrics):
+        """Store one frame's metrics dict (as built by FramePipeline) at epoch time `ts`."""
+        with self._lock:
+            if self._size and ts < self._ts[(self._next - 1) % self.capacity]:
+                # Clock stepped back (e.g. wall-clock adjustment): keep the ring sorted
+                self._size = 0
+            i = self._next
+            self._ts[i] = ts
+            self._values[i] = [metrics.get(f) or 0 for f in RING_FIELDS]
+            self._levels[i] = _LEVEL_CODES.get(metrics.get('risk_level'), 0)
+            self._next = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def _ordered(self, index):
+        """Rows of `index` (ring order, oldest first) mapped to physical slots."""
+        start = (self._next - self._size) % self.capacity
+        return (start + index) % self.capacity
+
+    def tail(self, field, n):
+        """The last `n` values of `field`, oldest first (for sparklines)."""
+        col = RING_FIELDS.index(field)
+        with self._lock:
+            n = min(n, self._size)
+            return self._values[self._ordered(np.arange(self._size - n, self._size)), col]
+
+    def oldest(self):
+        """Epoch time of the oldest row held (None when empty)."""
+        with self._lock:
+            return float(self._ts[self._ordered(0)]) if self._size else None
+
+    def latest(self):
+        with self._lock:
+            return float(self._ts[self._ordered(self._size - 1)]) if self._size else None
+
+    def window(self, start=None, end=None):
+        """
+        Rows with start <= ts <= end (epoch seconds, either optional), oldest
+        first, as (timestamps, values[n, len(RING_FIELDS)], level codes)
+        copies. Timestamps are non-decreasing, so the bounds are found by
+        binary search.
+        """
+        with self._lock:
+            slots = self._ordered(np.arange(self._size))
+            ts = self._ts[slots]
+            lo = 0 if start is None else int(np.searchsorted(ts, start, side='left'))
+            hi = self._size if end is None else int(np.searchsorted(ts, end, side='right'))
+            slots = slots[lo:hi]
+            return ts[lo:hi], self._values[slots], self._levels[slots]
+
+    def recent(self, seconds):
+        """
+        (window, oldest): window() of the rows within `seconds` of the newest
+        one and the epoch time of the oldest row held (None when empty), from
+        a single lock so a concurrent clear()/resize() cannot split them.
+        """
+        with self._lock:
+            slots = self._ordered(np.arange(self._size))
+            ts = self._ts[slots]
+            if not self._size:
+                return (ts, self._values[slots], self._levels[slots]), None
+            lo = int(np.searchsorted(ts, ts[-1] - seconds, side='left'))
+            slots = slots[lo:]
+            return (ts[lo:], self._values[slots], self._levels[slots]), float(ts[0])
+
+    @staticmethod
+    def to_columns(camera_id, window):
+        """window() output in the Metric.rows_to_columns() layout (ids are None)."""
+        ts, values, levels = window
+        out = {'camera_id': camera_id, 'timestamps': np.rint(ts * 1000).astype(np.int64).tolist(),
+               'id': [None] * len(ts)}
+        for i, field in enumerate(RING_FIELDS):
+            col = values[:, i]
+            out[field] = col.astype(np.int64).tolist() if field in _INT_FIELDS else col.tolist()
+        out['risk_level'] = [RISK_LEVELS[c] for c in levels.tolist()]
+        return out
+
+    @staticmethod
+    def to_rows(camera_id, window):
+        """window() output as Metric.to_dict()-style dicts (ids are None)."""
+        ts, values, levels = window
+        rows = []
+        for t, vals, level in zip(ts.tolist(), values.tolist(), levels.tolist()):
+            row = {'id': None, 'camera_id': camera_id,
+                   'timestamp': datetime.fromtimestamp(t, timezone.utc).isoformat().replace('+00:00', 'Z'),
+                   'risk_level': RISK_LEVELS[level]}
+            for field, v in zip(RING_FIELDS, vals):
+                row[field] = int(v) if field in _INT_FIELDS else v
+            rows.append(row)
+        return rows
@@ -0,0 +1,289 @@
+"""
+Day-partitioned storage for persisted metrics.
+
+Rows live in one table per UTC day, `metrics_YYYYMMDD`, with the columns of
+the `Metric` model and a (camera_id, timestamp) index. Writes and range
+queries only touch the days they cover, and retention drops whole days with
+DROP TABLE instead of a long DELETE that locks out the camera writers. On
+databases created with incremental auto-vacuum the freed pages are returned
+to the filesystem; otherwise SQLite reuses them for new partitions, so the
+file stops growing once retention is reached.
+
+Row ids are unique across partitions: each day's ids start at
+day.toordinal() << 32 (set through sqlite_sequence when the partition is
+created), so a row's partition can be derived from its id and ids remain
+exact in JSON.
+
+The `metrics` table of the Metric model itself stays empty; rows from
+databases that predate partitioning are moved out of it on startup.
+"""
+
+import re
+import threading
+from datetime import date, datetime
+
+from sqlalchemy import Column, Index, MetaData, Table, false, func, inspect, select, text, union_all
+from sqlalchemy.orm import aliased
+
+from backend.extensions import db
+from backend.models.metric import Metric
+from backend.utils.helpers import naive_utc
+from backend.utils.logger import get_logger
+
+logger = get_logger('metric_store')
+
+_NAME = re.compile(r'^metrics_(\d{8})$')
+_ID_SHIFT = 32
+# SQLite's default SQLITE_MAX_COMPOUND_SELECT; wider fan-outs are nested
+_MAX_COMPOUND = 500
+
+
+def _day(ts):
+    if isinstance(ts, datetime):
+        return naive_utc(ts).date()
+    if isinstance(ts, str):
+        return naive_utc(datetime.fromisoformat(ts.replace('Z', '+00:00'))).date()
+    return ts
+
+
+class MetricStore:
+
+    def __init__(self):
+        self._metadata = MetaData()
+        self._tables = None
+        self._lock = threading.Lock()
+
+    # ---- Partitions ------------------------------------------------------
+
+    def _define(self, day):
+        name = f'metrics_{day:%Y%m%d}'
+        table = self._metadata.tables.get(name)
+        if table is None:
+            cols = [Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable,
+                           default=c.default.arg if c.default is not None else None)
+                    for c in Metric.__table__.columns]
+            table = Table(name, self._metadata, *cols,
+                          Index(f'ix_{name}_camera_ts', 'camera_id', 'timestamp'),
+                          sqlite_autoincrement=True)
+        return table
+
+    def _partitions(self):
+        # Copy-on-write: ensure() and drop_before() publish a new dict under
+        # _lock, so readers may iterate the one they got without locking
+        if self._tables is None:
+            with self._lock:
+                if self._tables is None:
+                    tables = {}
+                    for name in inspect(db.engine).get_table_names():
+                        m = _NAME.match(name)
+                        if m:
+                            day = datetime.strptime(m.group(1), '%Y%m%d').date()
+                            tables[day] = self._define(day)
+                    self._tables = tables
+        return self._tables
+
+    def reload(self):
+        """Forget the cached partition list (e.g. after the database was swapped)."""
+        self._tables = None
+
+    def days(self, start=None, end=None):
+        """Partition days overlapping [start, end], ascending."""
+        return [d for d, _ in self._overlapping(start, end)]
+
+    def tables(self, start=None, end=None):
+        return [t for _, t in self._overlapping(start, end)]
+
+    def _overlapping(self, start, end):
+        lo, hi = _day(start), _day(end)
+        return sorted((d, t) for d, t in self._partitions().items()
+                      if (lo is None or d >= lo) and (hi is None or d <= hi))
+
+    def table_for_id(self, metric_id):
+        return self._partitions().get(date.fromordinal(metric_id >> _ID_SHIFT))
+
+    def ensure(self, timestamps):
+        """
+        Create missing partitions for the given timestamps, in their own
+        transaction. Call before opening a write transaction: SQLite allows
+        one writer, so DDL from a second connection would wait on it.
+        """
+        missing = {_day(ts) for ts in timestamps} - set(self._partitions())
+        if not missing:
+            return
+        with self._lock:
+            tables = dict(self._tables)
+            with db.engine.begin() as conn:
+                for day in sorted(missing):
+                    table = self._define(day)
+                    table.create(conn, checkfirst=True)
+                    conn.execute(text(
+                        'INSERT INTO sqlite_sequence (name, seq) SELECT :name, :seq '
+                        'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)'
+                    ), {'name': table.name, 'seq': day.toordinal() << _ID_SHIFT})
+                    tables[day] = table
+            self._tables = tables
+
+    def drop_before(self, cutoff):
+        """Drop whole-day partitions older than the day of `cutoff`. Returns {day: rows dropped}."""
+        cutoff_day = _day(cutoff)
+        old = [d for d in self.days() if d < cutoff_day]
+        if not old:
+            return {}
+        dropped = {}
+        with self._lock:
+            tables = dict(self._tables)
+            removed = [(d, tables.pop(d)) for d in old if d in tables]
+            with db.engine.begin() as conn:
+                for day, table in removed:
+                    dropped[day] = conn.execute(select(func.count()).select_from(table)).scalar() or 0
+                    table.drop(conn, checkfirst=True)
+            self._tables = tables
+            for _, table in removed:
+                self._metadata.remove(table)
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql('PRAGMA incremental_vacuum')
+        return dropped
+
+    # ---- Writes ----------------------------------------------------------
+
+    def insert(self, conn, rows):
+        """Insert `metrics` column dicts into their day partitions (see ensure())."""
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(_day(row['timestamp']), []).append(row)
+        parts = self._partitions()
+        for day, day_rows in by_day.items():
+            if day not in parts:
+                raise RuntimeError(f'Metric partition for {day} does not exist; call ensure() first')
+            conn.execute(parts[day].insert(), day_rows)
+
+    def delete(self, conn, camera_id, start=None, end=None):
+        """Delete a camera's rows in [start, end]. Returns the number of rows deleted."""
+        deleted = 0
+        for table in self.tables(start, end):
+            stmt = table.delete().where(table.c.camera_id == camera_id)
+            if start is not None:
+                stmt = stmt.where(table.c.timestamp >= naive_utc(start))
+            if end is not None:
+                stmt = stmt.where(table.c.timestamp <= naive_utc(end))
+            deleted += conn.execute(stmt).rowcount
+        return deleted
+
+    def migrate_legacy(self):
+        """Move rows from the unpartitioned `metrics` table into day partitions."""
+        legacy = Metric.__table__
+        days = [d for (d,) in db.session.execute(
+            select(func.date(legacy.c.timestamp)).distinct().where(legacy.c.timestamp.isnot(None)))]
+        if not days:
+            return 0
+        days = [date.fromisoformat(d) for d in days]
+        self.ensure(days)
+        cols = [c.name for c in legacy.columns if c.name != 'id']
+        moved = 0
+        for day in days:
+            part = self._partitions()[day]
+            in_day = func.date(legacy.c.timestamp) == day.isoformat()
+            with db.engine.begin() as conn:
+                moved += conn.execute(part.insert().from_select(
+                    cols, select(*(legacy.c[c] for c in cols)).where(in_day).order_by(legacy.c.timestamp)
+                )).rowcount
+                conn.execute(legacy.delete().where(in_day))
+        logger.info(f"Moved {moved} legacy metrics into {len(days)} day partitions")
+        return moved
+
+    # ---- Reads -----------------------------------------------------------
+
+    @staticmethod
+    def _branch(table, camera_id=None, start=None, end=None):
+        q = select(*table.c)
+        if isinstance(camera_id, (list, tuple, set)):
+            q = q.where(table.c.camera_id.in_(camera_id))
+        elif camera_id is not None:
+            q = q.where(table.c.camera_id == camera_id)
+        if start is not None:
+            q = q.where(table.c.timestamp >= naive_utc(start))
+        if end is not None:
+            q = q.where(table.c.timestamp <= naive_utc(end))
+        return q
+
+    def source(self, camera_id=None, start=None, end=None):
+        """
+        `Metric` entity over the partitions covering [start, end] (UNION ALL
+        of per-day selects, each already filtered to `camera_id`: one id, a
+        list of ids or None for all), for ORM/Core queries that need the
+        whole range at once.
+        """
+        tables = self.tables(start, end)
+        if not tables:
+            empty = select(*Metric.__table__.c).where(false())
+            return aliased(Metric, empty.subquery('metrics_range'), adapt_on_names=True)
+        branches = [self._branch(t, camera_id, start, end) for t in tables]
+        while len(branches) > _MAX_COMPOUND:
+            branches = [select(*union_all(*branches[i:i + _MAX_COMPOUND]).subquery().c)
+                        for i in range(0, len(branches), _MAX_COMPOUND)]
+        if len(branches) == 1:
+            return aliased(Metric, branches[0].subquery('metrics_range'), adapt_on_names=True)
+        return aliased(Metric, union_all(*branches).subquery('metrics_range'), adapt_on_names=True)
+
+    def fetch(self, camera_id, start=None, end=None, limit=None, desc=False, mappings=False):
+        """
+        A camera's rows as Metric objects (or Core mappings) in time order,
+        read partition by partition so a limited query stops at the first
+        days that fill it.
+        """
+        tables = self.tables(start, end)
+        out = []
+        for table in (reversed(tables) if desc else tables):
+            if mappings:
+                q = self._branch(table, camera_id, start, end).order_by(
+                    table.c.timestamp.desc() if desc else table.c.timestamp)
+                if limit is not None:
+                    q = q.limit(limit - len(out))
+                out.extend(db.session.execute(q).mappings())
+            else:
+                branch = self._branch(table, camera_id, start, end).subquery()
+                m = aliased(Metric, branch, adapt_on_names=True)
+                q = db.session.query(m).order_by(m.timestamp.desc() if desc else m.timestamp)
+                if limit is not None:
+                    q = q.limit(limit - len(out))
+                out.extend(q.all())
+            if limit is not None and len(out) >= limit:
+                break
+        return out
+
+    def after(self, camera_id, cursor, start=None, end=None, limit=100):
+        """
+        Keyset page: up to `limit` of a camera's rows (Core mappings) with
+        id > `cursor`, in id order. Ids grow with the partition day and, within
+        a day, with insertion, so only partitions from the cursor's day on are
+        read and each is an id range scan; cost scales with the rows returned.
+        """
+        lo = _day(start)
+        if cursor >> _ID_SHIFT:
+            cursor_day = date.fromordinal(cursor >> _ID_SHIFT)
+            lo = cursor_day if lo is None else max(lo, cursor_day)
+        out = []
+        for table in self.tables(lo, end):
+            q = self._branch(table, camera_id, start, end).where(table.c.id > cursor)
+            q = q.order_by(table.c.id).limit(limit - len(out))
+            out.extend(db.session.execute(q).mappings())
+            if len(out) >= limit:
+                break
+        return out
+
+    def scan(self, camera_id, start=None, end=None, columns=None, batch=5000):
+        """Stream a camera's rows (Core mappings, optionally only `columns`) in time order."""
+        for table in self.tables(start, end):
+            q = self._branch(table, camera_id, start, end)
+            if columns is not None:
+                q = q.with_only_columns(*(table.c[c] for c in columns))
+            q = q.order_by(table.c.timestamp).execution_options(yield_per=batch)
+            yield from db.session.execute(q).mappings()
+
+    def count(self):
+        return sum(db.session.execute(select(func.count()).select_from(t)).scalar() or 0
+                   for t in self.tables())
+
+
+metric_store = MetricStore()
@@ -0,0 +1,152 @@
+"""
+Process-wide write-behind buffer for persisted metrics.
+
+Camera threads hand rows to enqueue(), which never blocks and never touches
+the database. One writer thread drains the queue and inserts in bulk (a
+single Core INSERT executemany per day partition, one transaction), when either
+METRIC_FLUSH_SIZE rows are pending or the oldest pending row is
+METRIC_FLUSH_INTERVAL seconds old. Pending rows are flushed on stop() and at
+interpreter exit. The same transaction folds the rows into the minute/hour/day
+rollups (see rollups.py).
+
+If the database falls behind far enough to fill the queue
+(METRIC_QUEUE_MAX rows), new rows are dropped and counted rather than
+stalling the frame loops.
+"""
+
+import atexit
+import queue
+import threading
+import time
+
+from backend.utils.logger import get_logger
+
+logger = get_logger('metric_writer')
+
+
+class MetricWriter:
+
+    def __init__(self):
+        self._app = None
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self.flush_size = 500
+        self.flush_interval = 2.0
+        self.max_hold = 30.0
+        # camera_id -> last flushed row, so its hold is credited on the next flush
+        self._rollup_last = {}
+
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        self.last_queue_wait_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def init_app(self, app):
+        """Configure from the app and start the writer thread (idempotent)."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._app = app
+            self.flush_size = int(app.config.get('METRIC_FLUSH_SIZE', 500))
+            self.flush_interval = float(app.config.get('METRIC_FLUSH_INTERVAL', 2.0))
+            self.max_hold = float(app.config.get('METRIC_HEARTBEAT_SECONDS', 30.0))
+            self._queue = queue.Queue(maxsize=int(app.config.get('METRIC_QUEUE_MAX', 100_000)))
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='metric-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+            logger.info("Metric writer started")
+
+    def enqueue(self, row):
+        """Queue one `metrics` row (column dict, see frame_pipeline.metric_row)."""
+        if self._queue is None:
+            raise RuntimeError('MetricWriter.init_app() has not been called')
+        try:
+            self._queue.put_nowait((time.monotonic(), row))
+        except queue.Full:
+            self.rows_dropped += 1
+
+    def stop(self, timeout=10):
+        """Flush everything pending and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run(self):
+        batch = []
+        oldest = None
+        while True:
+            if batch:
+                wait = max(0.0, oldest + self.flush_interval - time.monotonic())
+            else:
+                wait = 0.25
+            try:
+                enqueued_at, row = self._queue.get(timeout=wait)
+                if not batch:
+                    oldest = enqueued_at
+                batch.append(row)
+                # Drain whatever is already queued without waiting
+                while len(batch) < self.flush_size:
+                    batch.append(self._queue.get_nowait()[1])
+            except queue.Empty:
+                pass
+
+            stopping = self._stop.is_set()
+            if batch and (stopping or len(batch) >= self.flush_size
+                          or time.monotonic() - oldest >= self.flush_interval):
+                self.last_queue_wait_ms = (time.monotonic() - oldest) * 1000
+                self._flush(batch)
+                batch = []
+            if stopping and self._queue.empty() and not batch:
+                return
+
+    def _flush(self, rows):
+        from backend.extensions import db
+        from backend.services.metric_store import metric_store
+        from backend.services.rollups import RollupBuilder, upsert
+
+        started = time.perf_counter()
+        builder = RollupBuilder(self.max_hold, last=dict(self._rollup_last))
+        for row in sorted(rows, key=lambda r: r['timestamp']):
+            builder.add(row)
+        try:
+            with self._app.app_context():
+                metric_store.ensure(r['timestamp'] for r in rows)
+                with db.engine.begin() as conn:
+                    metric_store.insert(conn, rows)
+                    upsert(conn, builder.pop_rows())
+            self._rollup_last = builder.last
+            self.rows_written += len(rows)
+            self.flushes += 1
+        except Exception as e:
+            self.failed_flushes += 1
+            logger.error(f"Metric flush of {len(rows)} rows failed: {e}")
+        elapsed = (time.perf_counter() - started) * 1000
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        self._total_flush_ms += elapsed
+
+    def stats(self):
+        done = self.flushes + self.failed_flushes
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'last_queue_wait_ms': round(self.last_queue_wait_ms, 2),
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'avg_flush_ms': round(self._total_flush_ms / done, 2) if done else 0.0,
+            'max_flush_ms': round(self.max_flush_ms, 2),
+        }
+
+
+metric_writer = MetricWriter()
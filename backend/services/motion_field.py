@@ -0,0 +1,128 @@
+"""
+Track-free crowd motion from dense optical flow.
+
+Above a few hundred people per-person tracking gets slow and unreliable, so
+the pipeline switches to this estimator: Farneback flow on a downscaled
+grayscale frame, average-pooled into a coarse grid of cells. Everything is
+array math over the grid, so cost depends on frame size, not crowd size.
+
+Produces the same signals the tracking path does:
+  - per-person velocity/direction (sampled from the cell under each person)
+  - flow coherence (magnitude of the mean unit vector over moving cells)
+  - flow vectors for the arrow overlay
+  - the pooled velocity field itself (m/s per cell)
+"""
+
+import cv2
+import numpy as np
+
+
+class OpticalFlowMotion:
+    """Per-camera optical-flow motion estimator with count-based hysteresis."""
+
+    def __init__(self, config):
+        self.threshold = getattr(config, 'OPTICAL_FLOW_THRESHOLD', 300)
+        # Drop back to tracking only well below the threshold to avoid flapping
+        self.release = int(self.threshold * 0.8)
+        self.width = getattr(config, 'OPTICAL_FLOW_WIDTH', 320)
+        self.cell = getattr(config, 'OPTICAL_FLOW_CELL', 16)
+        self.pixel_to_meter = 1.0 / getattr(config, 'PIXELS_PER_METER', 100.0)
+        self.min_shift_px = 0.25  # downscaled px/frame below which a cell is static
+        self.active = False
+        self._prev_gray = None
+        self._prev_t = None
+
+    def update_mode(self, count):
+        """Engage above threshold, release below 80% of it. Returns active flag."""
+        if not self.active and count >= self.threshold:
+            self.active = True
+        elif self.active and count < self.release:
+            self.active = False
+            self.reset()
+        return self.active
+
+    def reset(self):
+        self._prev_gray = None
+        self._prev_t = None
+
+    def estimate(self, frame, timestamp, centers):
+        """
+        Args:
+            frame: BGR frame at full analysis resolution
+            timestamp: frame time in seconds
+            centers: (N, 2) person centers in frame pixels
+
+        Returns dict with velocities (N,), directions (N, 2), flow_coherence,
+        flow_vectors and velocity_field (gh, gw, 2) in m/s.
+        """
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.width / float(w))
+        sw, sh = max(1, int(w * scale)), max(1, int(h * scale))
+        small = cv2.resize(frame, (sw, sh), interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        prev, prev_t = self._prev_gray, self._prev_t
+        self._prev_gray, self._prev_t = gray, timestamp
+
+        n = len(centers)
+        c = self.cell
+        gh, gw = max(1, sh // c), max(1, sw // c)
+        if prev is None or prev.shape != gray.shape or timestamp <= prev_t:
+            return self._empty(n, gh, gw)
+
+        flow = cv2.calcOpticalFlowFarneback(prev, gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+
+        # Average-pool the dense field into (gh, gw) cells of shift per frame
+        cells = flow[:gh * c, :gw * c].reshape(gh, c, gw, c, 2).mean(axis=(1, 3))
+        shift = np.hypot(cells[..., 0], cells[..., 1])
+        dt = timestamp - prev_t
+        to_mps = self.pixel_to_meter / (scale * dt)
+        velocity_field = cells * to_mps
+        unit = cells / np.maximum(shift, 1e-6)[..., np.newaxis]
+        moving = shift > self.min_shift_px
+
+        # Per-person samples from the cell under each center
+        velocities = np.zeros(n)
+        directions = np.zeros((n, 2))
+        occupied = np.zeros((gh, gw), dtype=bool)
+        if n:
+            gx = np.clip((centers[:, 0] * scale / c).astype(int), 0, gw - 1)
+            gy = np.clip((centers[:, 1] * scale / c).astype(int), 0, gh - 1)
+            velocities = shift[gy, gx] * to_mps
+            directions = np.where(moving[gy, gx, np.newaxis], unit[gy, gx], 0.0)
+            occupied[gy, gx] = True
+
+        # Coherence over cells that hold people and actually move
+        active = moving & occupied if n else moving
+        coherence = 0.0
+        if active.sum() >= 2:
+            mean_vec = unit[active].mean(axis=0)
+            coherence = min(1.0, float(np.hypot(mean_vec[0], mean_vec[1])))
+
+        ys, xs = np.nonzero(active)
+        cell_px = c / scale
+        flow_vectors = [{
+            'cx': float((x + 0.5) * cell_px),
+            'cy': float((y + 0.5) * cell_px),
+            'dx': round(float(unit[y, x, 0]), 3),
+            'dy': round(float(unit[y, x, 1]), 3),
+            'magnitude': round(float(shift[y, x] / scale), 1),
+        } for y, x in zip(ys, xs)]
+
+        return {
+            'velocities': velocities,
+            'directions': directions,
+            'flow_coherence': coherence,
+            'flow_vectors': flow_vectors,
+            'velocity_field': velocity_field,
+        }
+
+    @staticmethod
+    def _empty(n, gh, gw):
+        return {
+            'velocities': np.zeros(n),
+            'directions': np.zeros((n, 2)),
+            'flow_coherence': 0.0,
+            'flow_vectors': [],
+            'velocity_field': np.zeros((gh, gw, 2)),
+        }
@@ -0,0 +1,49 @@
+"""
+Change-driven persistence of per-frame metrics.
+
+Instead of storing every Nth frame, a camera stores a row when its state
+moves: when count, density or risk score leaves the deadband around the last
+stored row, and always when the risk level changes. A heartbeat row is stored
+at least every METRIC_HEARTBEAT_SECONDS so quiet periods stay visible.
+
+Stored rows therefore form a step series: each row's values hold until the
+next row (for at most one heartbeat interval). The analytics queries in
+api/metrics.py weight rows by that hold time.
+"""
+
+
+class DeadbandPolicy:
+    """Persistence decision for one camera's metric stream."""
+
+    def __init__(self, config):
+        self.deadbands = {
+            'count': getattr(config, 'METRIC_DEADBAND_COUNT', 2),
+            'density': getattr(config, 'METRIC_DEADBAND_DENSITY', 0.1),
+            'risk_score': getattr(config, 'METRIC_DEADBAND_RISK', 0.02),
+        }
+        self.heartbeat = getattr(config, 'METRIC_HEARTBEAT_SECONDS', 30.0)
+        self.min_interval = getattr(config, 'METRIC_MIN_INTERVAL_SECONDS', 0.1)
+        self.reset()
+
+    def reset(self):
+        self._last = None
+        self._last_t = None
+
+    def should_persist(self, metrics, timestamp):
+        """Decide for one frame's metrics at `timestamp` (seconds); records the row if True."""
+        last = self._last
+        if last is None or metrics['risk_level'] != last['risk_level']:
+            persist = True
+        else:
+            elapsed = timestamp - self._last_t
+            if elapsed >= self.heartbeat or elapsed < 0:
+                persist = True
+            elif elapsed < self.min_interval:
+                persist = False
+            else:
+                persist = any(abs(metrics[k] - last[k]) > band for k, band in self.deadbands.items())
+
+        if persist:
+            self._last = {k: metrics[k] for k in (*self.deadbands, 'risk_level')}
+            self._last_t = timestamp
+        return persist
@@ -0,0 +1,259 @@
+"""
+Background generation of PDF/DOCX/Markdown reports.
+
+Rendering a few thousand rows with fpdf or python-docx takes long enough to
+tie up a request thread, so the export endpoint only gathers the rows and
+summary and hands them to a small process pool (REPORT_WORKERS). Each job
+gets an id, reports rendered-row progress and is downloaded once complete.
+
+Finished reports are kept in REPORT_CACHE_FOLDER under a key derived from
+the camera, range, format and a digest of the exact rows and summary, so a
+repeat request for unchanged data is served from disk without rendering,
+and any change to the underlying rows (new data in an open range,
+re-analysis, re-scoring) produces a fresh report. The newest
+REPORT_CACHE_MAX_FILES reports are kept, plus any file a job in the
+registry still points to. Finished jobs leave the registry after
+REPORT_JOB_TTL seconds, or oldest first beyond REPORT_JOB_MAX_FINISHED.
+"""
+
+import atexit
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from backend.utils.helpers import generate_id
+from backend.utils.logger import get_logger
+
+logger = get_logger('report_jobs')
+
+FORMATS = {
+    'pdf': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'md': 'text/markdown',
+}
+_PROGRESS_EVERY = 100  # rows between worker progress reports
+
+
+def _render(job_id, fmt, metrics, summary, camera_name, path, progress):
+    """Worker: render one report to `path`. Returns its size in bytes."""
+    from backend.services import export_service
+
+    def report(done, total):
+        if done % _PROGRESS_EVERY == 0 or done == total:
+            progress.put((job_id, done))
+
+    render = {
+        'pdf': export_service.export_pdf,
+        'docx': export_service.export_docx,
+        'md': export_service.export_markdown,
+    }[fmt]
+    data = render(metrics, summary, camera_name, progress=report)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+def cache_key(camera_id, fmt, start, end, metrics, summary):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([camera_id, fmt, start, end, summary], default=str).encode())
+    for m in metrics:
+        h.update(json.dumps(m, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+class ReportJob:
+
+    def __init__(self, camera_id, camera_name, fmt, start, end, rows, key, path, filename):
+        self.job_id = generate_id('RPT')
+        self.camera_id = camera_id
+        self.camera_name = camera_name
+        self.format = fmt
+        self.start = start
+        self.end = end
+        self.rows = rows
+        self.key = key
+        self.path = path
+        self.filename = filename
+
+        self.status = 'queued'  # queued, running, completed, failed
+        self.rendered_rows = 0
+        self.size_bytes = 0
+        self.cached = False
+        self.error = None
+        self.created_at = datetime.now(timezone.utc)
+        self.finished_at = None
+        self.done = threading.Event()
+
+    @property
+    def mimetype(self):
+        return FORMATS[self.format]
+
+    @property
+    def progress(self):
+        if self.status == 'completed':
+            return 100.0
+        if not self.rows:
+            return 0.0
+        return min(99.9, 100.0 * self.rendered_rows / self.rows)
+
+    def to_dict(self):
+        elapsed_end = self.finished_at or datetime.now(timezone.utc)
+        return {
+            'job_id': self.job_id,
+            'camera_id': self.camera_id,
+            'format': self.format,
+            'start': self.start,
+            'end': self.end,
+            'status': self.status,
+            'progress': round(self.progress, 1),
+            'rows': self.rows,
+            'rendered_rows': self.rendered_rows,
+            'size_bytes': self.size_bytes,
+            'cached': self.cached,
+            'error': self.error,
+            'filename': self.filename,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'elapsed_seconds': round((elapsed_end - self.created_at).total_seconds(), 1),
+        }
+
+
+class ReportService:
+    """Registry, cache and process pool for report jobs."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._manager = None
+        self._progress = None
+
+    def _start(self, cfg):
+        if self._pool is not None:
+            return
+        # spawn: workers must not inherit the server's threads, sockets or CUDA state
+        ctx = mp.get_context('spawn')
+        self._manager = ctx.Manager()
+        self._progress = self._manager.Queue()
+        self._pool = ProcessPoolExecutor(
+            max_workers=max(1, int(cfg.get('REPORT_WORKERS', 2))), mp_context=ctx,
+        )
+        threading.Thread(target=self._drain, name='report-progress', daemon=True).start()
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
+            self._pool = None
+
+    def submit(self, app, camera_id, camera_name, fmt, start, end, metrics, summary):
+        """
+        Queue a report of `metrics`/`summary` (as built by the export
+        endpoint); returns the ReportJob. An identical report that is cached
+        or already being generated is reused.
+        """
+        cfg = app.config
+        folder = cfg['REPORT_CACHE_FOLDER']
+        key = cache_key(camera_id, fmt, start, end, metrics, summary)
+        path = os.path.join(folder, f'{key}.{fmt}')
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f'crowdsafe_{camera_name}_{stamp}.{fmt}'
+
+        with self._lock:
+            self._evict(cfg)
+            for job in self._jobs.values():
+                if job.key == key and job.status in ('queued', 'running'):
+                    return job
+            job = ReportJob(camera_id, camera_name, fmt, start, end, len(metrics), key, path, filename)
+            self._jobs[job.job_id] = job
+
+            if os.path.exists(path):
+                os.utime(path)
+                job.cached = True
+                job.status = 'completed'
+                job.rendered_rows = job.rows
+                job.size_bytes = os.path.getsize(path)
+                job.finished_at = datetime.now(timezone.utc)
+                job.done.set()
+                return job
+
+            self._start(cfg)
+            job.status = 'running'
+            future = self._pool.submit(_render, job.job_id, fmt, metrics, summary,
+                                       camera_name, path, self._progress)
+        future.add_done_callback(lambda f: self._finish(job, f, folder, cfg))
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, camera_id=None):
+        jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return [j for j in jobs if camera_id is None or j.camera_id == camera_id]
+
+    def _finish(self, job, future, folder, cfg):
+        try:
+            job.size_bytes = future.result()
+            job.rendered_rows = job.rows
+            job.status = 'completed'
+            logger.info(f"Report {job.job_id} ({job.format}, {job.rows} rows) ready")
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            logger.error(f"Report {job.job_id} failed: {e}")
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            job.done.set()
+        with self._lock:
+            self._evict(cfg)
+            self._prune(folder, int(cfg.get('REPORT_CACHE_MAX_FILES', 200)),
+                        {j.path for j in self._jobs.values()})
+
+    def _drain(self):
+        while self._pool is not None:
+            try:
+                job_id, done = self._progress.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == 'running':
+                job.rendered_rows = max(job.rendered_rows, done)
+
+    def _evict(self, cfg):
+        """Drop finished jobs past REPORT_JOB_TTL, then the oldest beyond REPORT_JOB_MAX_FINISHED."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=float(cfg.get('REPORT_JOB_TTL', 3600)))
+        finished = sorted((j for j in self._jobs.values() if j.finished_at is not None),
+                          key=lambda j: j.finished_at)
+        excess = len(finished) - int(cfg.get('REPORT_JOB_MAX_FINISHED', 500))
+        for i, job in enumerate(finished):
+            if i < excess or job.finished_at < cutoff:
+                del self._jobs[job.job_id]
+
+    @staticmethod
+    def _prune(folder, keep, referenced):
+        """Delete cached reports beyond the newest `keep`, except `referenced` paths."""
+        files = [os.path.join(folder, f) for f in os.listdir(folder)
+                 if os.path.splitext(f)[1].lstrip('.') in FORMATS]
+        files.sort(key=os.path.getmtime, reverse=True)
+        for path in files[keep:]:
+            if path in referenced:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+report_service = ReportService()
@@ -1,9 +1,22 @@
+import numpy as np
+
+RISK_LEVELS = np.array(['SAFE', 'CAUTION', 'WARNING', 'CRITICAL'], dtype=object)
+
+
 class RiskCalculator:
     """Multi-factor risk scoring with ML-enhanced signals."""
 
     def __init__(self, config):
         self.config = config
 
+    def _weights(self, weights=None):
+        weights = weights or {}
+        return (
+            weights.get('density', self.config.RISK_WEIGHT_DENSITY),
+            weights.get('surge', self.config.RISK_WEIGHT_SURGE),
+            weights.get('velocity', self.config.RISK_WEIGHT_VELOCITY),
+        )
+
     def calculate(self, density, avg_velocity, surge_rate, count,
                   crowd_pressure=0.0, flow_coherence=0.0):
         """
@@ -29,9 +42,7 @@ class RiskCalculator:
         else:
             velocity_inv_norm = 1.0 - ((avg_velocity - 0.2) / 1.3)
 
-        w1 = self.config.RISK_WEIGHT_DENSITY
-        w2 = self.config.RISK_WEIGHT_SURGE
-        w3 = self.config.RISK_WEIGHT_VELOCITY
+        w1, w2, w3 = self._weights()
 
         base_score = (w1 * density_norm) + (w2 * surge_norm) + (w3 * velocity_inv_norm)
 
@@ -62,3 +73,43 @@ class RiskCalculator:
             risk_level = 'SAFE'
 
         return risk_score, risk_level
+
+    def calculate_batch(self, density, avg_velocity, surge_rate, count,
+                        crowd_pressure=None, flow_coherence=None, weights=None):
+        """
+        Vectorized calculate() over arrays of frames, same formula and same
+        float operations, so scores match the scalar path exactly.
+
+        `weights` optionally overrides {'density', 'surge', 'velocity'} for
+        what-if scoring. Returns (risk_scores float64 array, risk_levels
+        object array of level strings).
+        """
+        density = np.asarray(density, dtype=np.float64)
+        avg_velocity = np.asarray(avg_velocity, dtype=np.float64)
+        surge_rate = np.asarray(surge_rate, dtype=np.float64)
+        count = np.asarray(count)
+        crowd_pressure = (np.zeros_like(density) if crowd_pressure is None
+                          else np.asarray(crowd_pressure, dtype=np.float64))
+        flow_coherence = (np.zeros_like(density) if flow_coherence is None
+                          else np.asarray(flow_coherence, dtype=np.float64))
+
+        density_norm = np.minimum(1.0, density / 10.0)
+        surge_norm = np.minimum(1.0, surge_rate / 2.0)
+        velocity_inv_norm = np.where(
+            avg_velocity <= 0.2, 1.0,
+            np.where(avg_velocity >= 1.5, 0.0, 1.0 - ((avg_velocity - 0.2) / 1.3)),
+        )
+
+        w1, w2, w3 = self._weights(weights)
+        base_score = (w1 * density_norm) + (w2 * surge_norm) + (w3 * velocity_inv_norm)
+
+        pressure_boost = np.maximum(0.0, crowd_pressure - 0.3) * 0.15
+        coherence_boost = np.maximum(0.0, flow_coherence - 0.5) * 0.2
+
+        risk_score = base_score + pressure_boost + coherence_boost
+        risk_score = np.where(count > 100, risk_score * 1.15, risk_score)
+        risk_score = np.maximum(0.0, np.minimum(1.0, risk_score))
+
+        pct = risk_score * 100
+        level_idx = (pct >= 25).astype(int) + (pct >= 50) + (pct >= 75)
+        return risk_score, RISK_LEVELS[level_idx]
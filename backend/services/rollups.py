@@ -0,0 +1,453 @@
+"""
+Minute/hour/day rollups of the stored metric step series.
+
+Rows are stored on change (persistence_policy.py), so every row's values
+hold until the next row, capped at METRIC_HEARTBEAT_SECONDS. A rollup bucket
+keeps, per camera:
+
+  - samples, and per metric the sum/min/max over stored rows
+  - hold_seconds and per metric the hold-weighted sum, for time-weighted
+    averages (wsum / hold)
+  - seconds spent at each risk level
+
+Rollups are maintained incrementally by the metric writer as rows are
+flushed (a row's hold becomes known when the next row for its camera
+arrives), and rebuilt from raw rows by rebuild() for backfills or after raw
+history changes (batch re-analysis, re-scoring).
+
+range_stats() answers summary/aggregate queries from rollups for closed
+buckets and from raw rows only for the partial or still-open edges, so its
+cost does not grow with the length of the range.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, case, func
+
+from backend.extensions import db
+from backend.models.metric_rollup import MetricRollup, ROLLUP_METRICS, RISK_LEVEL_COLUMNS
+from backend.services.metric_store import metric_store
+from backend.utils.helpers import naive_utc
+
+RESOLUTIONS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+# Pending buckets held in memory before a rebuild writes them out
+_REBUILD_FLUSH_BUCKETS = 20000
+
+
+def bucket_start(dt, resolution):
+    if resolution == 'minute':
+        return dt.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def empty_bucket():
+    b = {'samples': 0, 'hold_seconds': 0.0}
+    for m in ROLLUP_METRICS:
+        b[f'{m}_sum'] = 0.0
+        b[f'{m}_wsum'] = 0.0
+        b[f'{m}_min'] = None
+        b[f'{m}_max'] = None
+    for col in RISK_LEVEL_COLUMNS.values():
+        b[col] = 0.0
+    return b
+
+
+class RollupBuilder:
+    """
+    Folds time-ordered metric rows into additive bucket partials.
+
+    `last` maps camera_id -> previous row and carries hold attribution
+    across calls; pass the same dict to consecutive builders.
+    """
+
+    def __init__(self, max_hold, last=None):
+        self.max_hold = max_hold
+        self.last = {} if last is None else last
+        self.buckets = {}
+
+    def _bucket(self, camera_id, resolution, start):
+        key = (camera_id, resolution, start)
+        b = self.buckets.get(key)
+        if b is None:
+            b = self.buckets[key] = empty_bucket()
+        return b
+
+    def add(self, row):
+        """Add one stored row (dict with camera_id, timestamp, metric values, risk_level)."""
+        camera_id = row['camera_id']
+        ts = naive_utc(row['timestamp'])
+        self.close_hold(camera_id, ts)
+
+        values = {m: float(row.get(m) or 0.0) for m in ROLLUP_METRICS}
+        for res in RESOLUTIONS:
+            b = self._bucket(camera_id, res, bucket_start(ts, res))
+            b['samples'] += 1
+            for m, v in values.items():
+                b[f'{m}_sum'] += v
+                if b[f'{m}_min'] is None or v < b[f'{m}_min']:
+                    b[f'{m}_min'] = v
+                if b[f'{m}_max'] is None or v > b[f'{m}_max']:
+                    b[f'{m}_max'] = v
+        self.last[camera_id] = {'timestamp': ts, 'risk_level': row.get('risk_level'), **values}
+
+    def close_hold(self, camera_id, next_ts):
+        """Credit the camera's previous row with its hold up to `next_ts`."""
+        prev = self.last.get(camera_id)
+        if prev is None:
+            return
+        hold = min(max((naive_utc(next_ts) - prev['timestamp']).total_seconds(), 0.0), self.max_hold)
+        if hold <= 0:
+            return
+        level_col = RISK_LEVEL_COLUMNS.get(prev['risk_level'])
+        for res in RESOLUTIONS:
+            b = self._bucket(camera_id, res, bucket_start(prev['timestamp'], res))
+            b['hold_seconds'] += hold
+            for m in ROLLUP_METRICS:
+                b[f'{m}_wsum'] += prev[m] * hold
+            if level_col:
+                b[level_col] += hold
+
+    def pop_rows(self):
+        """Bucket partials as MetricRollup column dicts; clears the builder's buckets."""
+        rows = [
+            {'camera_id': cam, 'resolution': res, 'bucket_start': start, **b}
+            for (cam, res, start), b in self.buckets.items()
+        ]
+        self.buckets = {}
+        return rows
+
+
+def upsert(conn, rows):
+    """Merge bucket partials into metric_rollups (additive sums, min/max of extremes)."""
+    if not rows:
+        return
+    table = MetricRollup.__table__
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        least, greatest = func.least, func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        least, greatest = func.min, func.max
+
+    stmt = insert(table)
+    ex = stmt.excluded
+    updates = {'samples': table.c.samples + ex.samples, 'hold_seconds': table.c.hold_seconds + ex.hold_seconds}
+    for m in ROLLUP_METRICS:
+        for suffix in ('sum', 'wsum'):
+            col = f'{m}_{suffix}'
+            updates[col] = table.c[col] + ex[col]
+        for suffix, pick in (('min', least), ('max', greatest)):
+            col = f'{m}_{suffix}'
+            # Either side may be NULL (hold-only partials carry no samples)
+            updates[col] = pick(func.coalesce(table.c[col], ex[col]), func.coalesce(ex[col], table.c[col]))
+    for col in RISK_LEVEL_COLUMNS.values():
+        updates[col] = table.c[col] + ex[col]
+
+    conn.execute(
+        stmt.on_conflict_do_update(index_elements=['camera_id', 'resolution', 'bucket_start'], set_=updates),
+        rows,
+    )
+
+
+_RAW_COLUMNS = ('camera_id', 'timestamp', 'count', 'density', 'avg_velocity', 'risk_score', 'risk_level')
+
+
+def rebuild(camera_id, start=None, end=None, max_hold=30.0):
+    """
+    Recompute a camera's rollups from raw rows over whole days covering
+    [start, end] (the full history when both are None). Runs in the current
+    app context and commits. Returns the number of raw rows read.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    if start is None or end is None:
+        m = metric_store.source(camera_id)
+        first, last = db.session.query(func.min(m.timestamp), func.max(m.timestamp)).one()
+        if first is None:
+            return 0
+        start = start or first
+        end = end or last
+    day_start = bucket_start(start, 'day')
+    day_end = bucket_start(end, 'day') + RESOLUTIONS['day']
+
+    MetricRollup.query.filter(
+        MetricRollup.camera_id == camera_id,
+        MetricRollup.bucket_start >= day_start,
+        MetricRollup.bucket_start < day_end,
+    ).delete(synchronize_session=False)
+
+    builder = RollupBuilder(max_hold)
+    conn = db.session.connection()
+    n = 0
+    for row in metric_store.scan(camera_id, day_start, day_end, columns=_RAW_COLUMNS):
+        if row['timestamp'] >= day_end:
+            break
+        builder.add(row)
+        n += 1
+        if len(builder.buckets) >= _REBUILD_FLUSH_BUCKETS:
+            upsert(conn, builder.pop_rows())
+
+    # The last row's hold runs up to the first row after the range
+    following = metric_store.fetch(camera_id, day_end, limit=1)
+    if following:
+        builder.close_hold(camera_id, following[0].timestamp)
+    upsert(conn, builder.pop_rows())
+    db.session.commit()
+    return n
+
+
+# ---- Queries -------------------------------------------------------------
+
+def _stat_columns(src, hold, level, samples=None):
+    """Partial-aggregate select columns shared by the raw and rollup paths."""
+    cols = [
+        (func.count() if samples is None else func.sum(samples)).label('samples'),
+        func.sum(hold).label('hold_seconds'),
+    ]
+    for m in ROLLUP_METRICS:
+        cols += [
+            func.sum(src[f'{m}_sum']).label(f'{m}_sum'),
+            func.sum(src[f'{m}_wsum']).label(f'{m}_wsum'),
+            func.min(src[f'{m}_min']).label(f'{m}_min'),
+            func.max(src[f'{m}_max']).label(f'{m}_max'),
+        ]
+    for lvl, col in RISK_LEVEL_COLUMNS.items():
+        cols.append(func.sum(level[lvl]).label(col))
+    return cols
+
+
+def _julianday(dt):
+    return dt.replace(tzinfo=timezone.utc).timestamp() / 86400.0 + 2440587.5
+
+
+def _raw_partials(camera_ids, lo, hi, fmt, max_hold):
+    """
+    Partials per (camera, bucket) from raw rows with lo <= timestamp < hi
+    (either bound optional). Each row holds min(next row - row, max_hold),
+    as in RollupBuilder: the last row before `hi` is held up to the camera's
+    first row at or after `hi`, however far away, and only a camera's
+    newest row has no hold yet.
+    """
+    m = metric_store.source(camera_ids, lo, hi)
+    q = db.session.query(m)
+    next_ts = func.julianday(func.lead(m.timestamp).over(partition_by=m.camera_id, order_by=m.timestamp))
+    if hi is not None:
+        q = q.filter(m.timestamp < hi)
+        cameras = camera_ids
+        if cameras is None:
+            cameras = [cam for (cam,) in q.with_entities(m.camera_id).distinct()]
+        following = {}
+        for cam in cameras:
+            row = metric_store.fetch(cam, hi, limit=1, mappings=True)
+            if row:
+                following[cam] = _julianday(row[0]['timestamp'])
+        if following:
+            next_ts = func.coalesce(next_ts, case(
+                *((m.camera_id == cam, jd) for cam, jd in following.items()), else_=None))
+    gap = (next_ts - func.julianday(m.timestamp)) * 86400.0
+    held = q.with_entities(
+        m.camera_id, m.timestamp, m.count, m.density, m.avg_velocity, m.risk_score, m.risk_level,
+        func.min(func.coalesce(gap, 0.0), max_hold).label('hold'),
+    ).subquery()
+    c = held.c
+
+    src = {}
+    for m in ROLLUP_METRICS:
+        src[f'{m}_sum'] = c[m]
+        src[f'{m}_wsum'] = c[m] * c.hold
+        src[f'{m}_min'] = c[m]
+        src[f'{m}_max'] = c[m]
+    level = {lvl: case((c.risk_level == lvl, c.hold), else_=0.0) for lvl in RISK_LEVEL_COLUMNS}
+    bucket = func.strftime(fmt, c.timestamp).label('bucket')
+
+    q = db.session.query(c.camera_id, bucket, *_stat_columns(src, c.hold, level))
+    return q.group_by(c.camera_id, bucket).all()
+
+
+def _rollup_partials(camera_ids, resolution, lo, hi, fmt):
+    t = MetricRollup.__table__.c
+    src = {f'{m}_{s}': t[f'{m}_{s}'] for m in ROLLUP_METRICS for s in ('sum', 'wsum', 'min', 'max')}
+    level = {lvl: t[col] for lvl, col in RISK_LEVEL_COLUMNS.items()}
+    bucket = func.strftime(fmt, t.bucket_start).label('bucket')
+    q = db.session.query(t.camera_id, bucket,
+                         *_stat_columns(src, t.hold_seconds, level, samples=t.samples)).filter(
+        and_(t.resolution == resolution, t.bucket_start >= lo, t.bucket_start < hi))
+    if camera_ids is not None:
+        q = q.filter(t.camera_id.in_(camera_ids))
+    return q.group_by(t.camera_id, bucket).all()
+
+
+def _merge(acc, partial):
+    b = acc.setdefault(partial.camera_id, {}).setdefault(partial.bucket, empty_bucket())
+    b['samples'] += partial.samples or 0
+    b['hold_seconds'] += partial.hold_seconds or 0.0
+    for m in ROLLUP_METRICS:
+        b[f'{m}_sum'] += getattr(partial, f'{m}_sum') or 0.0
+        b[f'{m}_wsum'] += getattr(partial, f'{m}_wsum') or 0.0
+        for suffix, pick in (('min', min), ('max', max)):
+            v = getattr(partial, f'{m}_{suffix}')
+            if v is not None:
+                cur = b[f'{m}_{suffix}']
+                b[f'{m}_{suffix}'] = v if cur is None else pick(cur, v)
+    for col in RISK_LEVEL_COLUMNS.values():
+        b[col] += getattr(partial, col) or 0.0
+
+
+def combine(buckets):
+    """Merge bucket partials (e.g. the values of range_stats()) into one."""
+    out = empty_bucket()
+    for b in buckets:
+        out['samples'] += b['samples']
+        out['hold_seconds'] += b['hold_seconds']
+        for m in ROLLUP_METRICS:
+            out[f'{m}_sum'] += b[f'{m}_sum']
+            out[f'{m}_wsum'] += b[f'{m}_wsum']
+            for suffix, pick in (('min', min), ('max', max)):
+                v, cur = b[f'{m}_{suffix}'], out[f'{m}_{suffix}']
+                if v is not None:
+                    out[f'{m}_{suffix}'] = v if cur is None else pick(cur, v)
+        for col in RISK_LEVEL_COLUMNS.values():
+            out[col] += b[col]
+    return out
+
+
+def finalize(b):
+    """Bucket partial -> averages (time-weighted when holds are known) and extremes."""
+    out = {'samples': b['samples'], 'hold_seconds': b['hold_seconds']}
+    for m in ROLLUP_METRICS:
+        if b['hold_seconds'] > 0:
+            avg = b[f'{m}_wsum'] / b['hold_seconds']
+        elif b['samples']:
+            avg = b[f'{m}_sum'] / b['samples']
+        else:
+            avg = 0.0
+        out[f'{m}_avg'] = avg
+        out[f'{m}_min'] = b[f'{m}_min'] or 0.0
+        out[f'{m}_max'] = b[f'{m}_max'] or 0.0
+    out['level_seconds'] = {lvl: b[col] for lvl, col in RISK_LEVEL_COLUMNS.items()}
+    return out
+
+
+def summarize(stats):
+    """The /summary payload for one finalize()d bucket."""
+    return {
+        'avg_density': round(stats['density_avg'], 3),
+        'peak_count': int(stats['count_max']),
+        'avg_count': round(stats['count_avg'], 1),
+        'max_risk_score': round(stats['risk_score_max'], 3),
+        'avg_velocity': round(stats['avg_velocity_avg'], 2),
+        'avg_risk': round(stats['risk_score_avg'], 3),
+        'max_density': round(stats['density_max'], 3),
+        'total_records': stats['samples'],
+    }
+
+
+def range_stats(camera_id, start=None, end=None, fmt='all', resolution='day',
+                max_hold=30.0, closed_lag=35.0):
+    """
+    Bucketed statistics of one camera over [start, end], keyed by
+    strftime(fmt) of the time (a constant fmt gives one bucket for the
+    whole range). Returns {bucket: partial dict}; see finalize().
+    """
+    return range_stats_multi([camera_id], start, end, fmt, resolution,
+                             max_hold, closed_lag).get(camera_id, {})
+
+
+def range_stats_multi(camera_ids, start=None, end=None, fmt='all', resolution='day',
+                      max_hold=30.0, closed_lag=35.0):
+    """
+    range_stats() for several cameras (None for all) at once, grouped by
+    camera in the same queries, so the number of round trips does not grow
+    with the number of cameras.
+
+    Whole `resolution` buckets that closed more than `closed_lag` seconds
+    ago come from rollups; the partial edges and the open bucket come from
+    raw rows. Returns {camera_id: {bucket: partial dict}}.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    step = RESOLUTIONS[resolution]
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    closed_until = bucket_start(now - timedelta(seconds=closed_lag), resolution)
+
+    lo = start
+    if lo is not None:
+        floor = bucket_start(lo, resolution)
+        lo = floor if floor == lo else floor + step
+    hi = closed_until if end is None else min(closed_until, bucket_start(end, resolution))
+
+    acc = {}
+    if lo is None:
+        # Open start: rollups cover everything up to hi
+        q = db.session.query(func.min(MetricRollup.bucket_start)).filter(
+            MetricRollup.resolution == resolution)
+        if camera_ids is not None:
+            q = q.filter(MetricRollup.camera_id.in_(camera_ids))
+        first = q.scalar()
+        lo = first if first is not None else hi
+        head = None
+    else:
+        head = (start, lo)
+
+    if lo < hi:
+        for p in _rollup_partials(camera_ids, resolution, lo, hi, fmt):
+            _merge(acc, p)
+        if head is not None and head[0] < head[1]:
+            for p in _raw_partials(camera_ids, head[0], head[1], fmt, max_hold):
+                _merge(acc, p)
+        tail_lo = hi
+    else:
+        tail_lo = start
+
+    # Partial/open tail straight from raw rows
+    tail_hi = None if end is None else end + timedelta(microseconds=1)
+    for p in _raw_partials(camera_ids, tail_lo, tail_hi, fmt, max_hold):
+        _merge(acc, p)
+    return acc
+
+
+def raw_stats(camera_id, start=None, end=None, fmt='all', max_hold=30.0):
+    """range_stats() computed from raw rows only (no rollups), e.g. to verify them."""
+    start, end = naive_utc(start), naive_utc(end)
+    hi = None if end is None else end + timedelta(microseconds=1)
+    acc = {}
+    for p in _raw_partials([camera_id], start, hi, fmt, max_hold):
+        _merge(acc, p)
+    return acc.get(camera_id, {})
+
+
+def compare(a, b, tolerance=1e-4):
+    """Fields of two bucket partials that differ by more than `tolerance` (relative), as {field: (a, b)}."""
+    diff = {}
+    for key, va in a.items():
+        vb = b.get(key)
+        if va is None or vb is None:
+            if va != vb:
+                diff[key] = (va, vb)
+        elif abs(va - vb) > tolerance * max(1.0, abs(va), abs(vb)):
+            diff[key] = (va, vb)
+    return diff
+
+
+def fingerprint(camera_id, start=None, end=None):
+    """
+    Cheap version stamp of a camera's data over [start, end]: totals of the
+    hour rollups touching the range, which change whenever a row in those
+    hours is added, replaced or re-scored.
+    """
+    t = MetricRollup.__table__.c
+    q = db.session.query(
+        func.count(), func.sum(t.samples), func.sum(t.hold_seconds),
+        *(func.sum(t[f'{m}_sum']) for m in ROLLUP_METRICS),
+    ).filter(t.camera_id == camera_id, t.resolution == 'hour')
+    if start is not None:
+        q = q.filter(t.bucket_start >= bucket_start(naive_utc(start), 'hour'))
+    if end is not None:
+        q = q.filter(t.bucket_start <= naive_utc(end))
+    return tuple(round(v, 6) if isinstance(v, float) else v for v in q.one())
@@ -0,0 +1,58 @@
+"""
+Per-frame spatial index over person centers.
+
+Built once per frame and shared by proximity scoring, crowd pressure and
+DBSCAN clustering, replacing the dense N x N distance matrices. Radius pairs
+come out of the KD-tree as arrays, so memory and time scale with the number
+of close pairs instead of N^2.
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
+
+
+class SpatialIndex:
+
+    def __init__(self, centers, radius):
+        """
+        Args:
+            centers: (N, 2) float array of person centers in pixels
+            radius: largest neighbour radius any consumer will ask for
+        """
+        self.centers = centers
+        self.radius = radius
+        self.tree = cKDTree(centers)
+
+        pairs = self.tree.query_pairs(radius, output_type='ndarray')
+        if len(pairs):
+            # Row-major (i, then j) order, matching the old upper-triangle walk
+            pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+            d = centers[pairs[:, 0]] - centers[pairs[:, 1]]
+            self._pairs = pairs
+            self._dists = np.sqrt((d ** 2).sum(axis=1))
+        else:
+            self._pairs = np.empty((0, 2), dtype=int)
+            self._dists = np.empty(0)
+
+    def pairs_within(self, r):
+        """Unique pairs i < j with distance strictly below r. Returns (i, j, dist)."""
+        mask = self._dists < r
+        return self._pairs[mask, 0], self._pairs[mask, 1], self._dists[mask]
+
+    def neighbor_graph(self, eps):
+        """Symmetric sparse distance graph of pairs within eps, for DBSCAN(metric='precomputed')."""
+        n = len(self.centers)
+        mask = self._dists <= eps
+        i, j, d = self._pairs[mask, 0], self._pairs[mask, 1], self._dists[mask]
+        return csr_matrix(
+            (np.concatenate([d, d]), (np.concatenate([i, j]), np.concatenate([j, i]))),
+            shape=(n, n),
+        )
+
+    def nearest_distances(self):
+        """Distance from each point to its nearest other point."""
+        if len(self.centers) < 2:
+            return np.full(len(self.centers), np.inf)
+        dists, _ = self.tree.query(self.centers, k=2)
+        return dists[:, 1]
@@ -0,0 +1,221 @@
+"""
+Nightly maintenance scheduler.
+
+Runs the retention, rollup and report tasks in backend/tasks on an
+APScheduler background thread during off-peak hours (NIGHTLY_HOUR in
+SCHEDULER_TIMEZONE), one after another:
+
+  cleanup_metrics   :00  drop metric day partitions older than METRIC_RETENTION_DAYS
+  cleanup_logs      :10  delete system logs older than LOG_RETENTION_DAYS, in chunks
+  refresh_rollups   :20  rebuild yesterday's rollups for every camera
+  daily_reports     :40  pre-generate yesterday's summary and export files
+
+On-demand tasks that take arguments (ON_DEMAND, e.g. re-scoring a camera's
+history) run through the same machinery but are never scheduled.
+
+Every run, scheduled or triggered through the API, is recorded as a JobRun
+with its duration and rows affected. Only one process per instance folder
+runs the scheduler (a file lock), so multiple workers or the debug reloader
+do not repeat the nightly work.
+"""
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+from backend.utils.logger import get_logger
+
+logger = get_logger('task_scheduler')
+
+
+def _cleanup_metrics(app):
+    from backend.tasks.cleanup import cleanup_old_metrics
+    return cleanup_old_metrics(app, days=int(app.config.get('METRIC_RETENTION_DAYS', 30)))
+
+
+def _cleanup_logs(app):
+    from backend.tasks.cleanup import cleanup_old_logs
+    return cleanup_old_logs(app, days=int(app.config.get('LOG_RETENTION_DAYS', 90)))
+
+
+def _refresh_rollups(app):
+    from backend.tasks.rollups import backfill_rollups
+    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).replace(tzinfo=None)
+    return backfill_rollups(app, start=yesterday, end=yesterday)
+
+
+def _daily_reports(app):
+    from backend.tasks.daily_reports import generate_daily_reports
+    return generate_daily_reports(app)
+
+
+def _rescore(app, **kwargs):
+    from backend.tasks.rescore import rescore_metrics
+    return rescore_metrics(app, **kwargs)
+
+
+# name -> (task, minute past NIGHTLY_HOUR)
+JOBS = {
+    'cleanup_metrics': (_cleanup_metrics, 0),
+    'cleanup_logs': (_cleanup_logs, 10),
+    'refresh_rollups': (_refresh_rollups, 20),
+    'daily_reports': (_daily_reports, 40),
+}
+
+# name -> task(app, **kwargs); started through start_run() only
+ON_DEMAND = {
+    'rescore': _rescore,
+}
+
+
+class TaskScheduler:
+
+    def __init__(self):
+        self._app = None
+        self._scheduler = None
+        self._lock_file = None
+        self._running = set()
+        self._guard = threading.Lock()
+
+    def _acquire_lock(self, app):
+        try:
+            import fcntl
+        except ImportError:
+            return True  # no flock on this platform; assume a single process
+        f = open(os.path.join(app.instance_path, 'scheduler.lock'), 'w')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        return True
+
+    def init_app(self, app):
+        """Remember the app for manual runs and start the nightly schedule if enabled."""
+        self._app = app
+        if not app.config.get('SCHEDULER_ENABLED', True) or self._scheduler is not None:
+            return
+        if not self._acquire_lock(app):
+            logger.info("Scheduler already running in another process")
+            return
+
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from apscheduler.triggers.cron import CronTrigger
+
+        tz = app.config.get('SCHEDULER_TIMEZONE', 'UTC')
+        hour = int(app.config.get('NIGHTLY_HOUR', 2))
+        self._scheduler = BackgroundScheduler(timezone=tz, daemon=True)
+        for name, (_, minute) in JOBS.items():
+            self._scheduler.add_job(
+                self.run, CronTrigger(hour=hour, minute=minute, timezone=tz),
+                args=[name], id=name, name=name,
+                max_instances=1, coalesce=True, misfire_grace_time=3600,
+            )
+        self._scheduler.start()
+        logger.info(f"Scheduler started: nightly jobs at {hour:02d}:00 {tz}")
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def run(self, name, trigger='scheduled', app=None, **kwargs):
+        """Run one job now in the calling thread, recording a JobRun. Returns its dict."""
+        app = app or self._app
+        run_id = self._claim(app, name, trigger, kwargs)
+        if run_id is None:
+            return None
+        return self._execute(app, name, run_id, kwargs)
+
+    def _claim(self, app, name, trigger, kwargs):
+        """Mark `name` running and record its JobRun. Returns the run id (None if already running)."""
+        from backend.extensions import db
+        from backend.models.job_run import JobRun
+
+        with self._guard:
+            if name in self._running:
+                logger.warning(f"Job {name} is already running; skipped")
+                return None
+            self._running.add(name)
+        try:
+            with app.app_context():
+                run = JobRun(job_name=name, trigger=trigger, status='running',
+                             details=json.dumps({'params': kwargs} if kwargs else {}, default=str))
+                db.session.add(run)
+                db.session.commit()
+                return run.id
+        except Exception:
+            with self._guard:
+                self._running.discard(name)
+            raise
+
+    def _execute(self, app, name, run_id, kwargs):
+        from backend.extensions import db
+        from backend.models.job_run import JobRun
+
+        task = JOBS[name][0] if name in JOBS else ON_DEMAND[name]
+        try:
+            t0 = time.perf_counter()
+            status, error, result = 'completed', None, None
+            try:
+                result = task(app, **kwargs)
+            except Exception as e:
+                status, error = 'failed', f'{e}\n{traceback.format_exc(limit=5)}'
+                logger.error(f"Job {name} failed: {e}")
+            duration_ms = (time.perf_counter() - t0) * 1000
+
+            rows = result.get('rows', 0) if isinstance(result, dict) else int(result or 0)
+            with app.app_context():
+                run = db.session.get(JobRun, run_id)
+                run.status = status
+                run.error = error
+                run.finished_at = datetime.now(timezone.utc)
+                run.duration_ms = duration_ms
+                run.rows_affected = rows
+                details = result if isinstance(result, dict) else {}
+                if kwargs:
+                    details = {'params': kwargs, **details}
+                run.details = json.dumps(details, default=str)
+                db.session.commit()
+                logger.info(f"Job {name} {status} in {duration_ms:.0f} ms ({rows} rows)")
+                return run.to_dict()
+        finally:
+            with self._guard:
+                self._running.discard(name)
+
+    def is_running(self, name):
+        return name in self._running
+
+    def start_run(self, app, name, **kwargs):
+        """
+        Run a job on a background thread (manual trigger), passing `kwargs`
+        to its task. Returns the JobRun id, or None if it is already running.
+        """
+        run_id = self._claim(app, name, 'manual', kwargs)
+        if run_id is None:
+            return None
+        threading.Thread(target=self._execute, args=(app, name, run_id, kwargs),
+                         name=f'job-{name}', daemon=True).start()
+        return run_id
+
+    def schedule(self):
+        """Each job with its next scheduled run (None when the scheduler is not running here)."""
+        out = []
+        for name in JOBS:
+            job = self._scheduler.get_job(name) if self._scheduler is not None else None
+            out.append({
+                'job_name': name,
+                'scheduled': job is not None,
+                'next_run': job.next_run_time.isoformat() if job and job.next_run_time else None,
+                'running': self.is_running(name),
+            })
+        return out
+
+
+task_scheduler = TaskScheduler()
@@ -0,0 +1,161 @@
+"""
+Multi-object trackers selectable per camera.
+
+  - botsort:   Ultralytics BoT-SORT (Kalman + global motion compensation)
+  - bytetrack: Ultralytics ByteTrack (Kalman + two-stage IoU association)
+  - centroid:  Lightweight mutual-nearest-neighbour centroid tracker for
+               very dense, fixed-camera scenes where GMC/appearance steps
+               cost more than they help.
+
+Every tracker exposes the same interface:
+    update(xyxy, confs, frame) -> (xyxy, confs, track_ids)
+    reset()
+and owns the per-track point history used for flow analysis plus the
+Kalman velocity filter keyed by its track IDs.
+"""
+
+import itertools
+from types import SimpleNamespace
+
+import numpy as np
+
+from backend.services.velocity_filter import VelocityKalman
+
+TRACKER_CHOICES = ('botsort', 'bytetrack', 'centroid')
+DEFAULT_TRACKER = 'botsort'
+
+# Process-wide ID source so centroid track IDs never collide across cameras
+_centroid_ids = itertools.count(1)
+
+
+class BaseTracker:
+    """Common state shared by all trackers."""
+
+    name = ''
+
+    def __init__(self, velocity_filter=None):
+        self.track_history = {}
+        self.velocity_filter = velocity_filter or VelocityKalman()
+
+    def update(self, xyxy, confs, frame=None):
+        raise NotImplementedError
+
+    def reset(self):
+        self.track_history.clear()
+        self.velocity_filter.reset()
+
+
+class UltralyticsTracker(BaseTracker):
+    """Thin wrapper driving an Ultralytics BOTSORT/BYTETracker directly."""
+
+    def __init__(self, name, frame_rate=30, velocity_filter=None):
+        super().__init__(velocity_filter)
+        self.name = name
+        self.frame_rate = frame_rate
+        self._tracker = self._build()
+
+    def _build(self):
+        from ultralytics.trackers import BOTSORT, BYTETracker
+        from ultralytics.utils import IterableSimpleNamespace, yaml_load
+        from ultralytics.utils.checks import check_yaml
+
+        cfg = IterableSimpleNamespace(**yaml_load(check_yaml(f'{self.name}.yaml')))
+        cls = BOTSORT if self.name == 'botsort' else BYTETracker
+        return cls(args=cfg, frame_rate=self.frame_rate)
+
+    def update(self, xyxy, confs, frame=None):
+        n = len(xyxy)
+        if n == 0:
+            return xyxy, confs, np.empty(0, dtype=int)
+
+        xywh = np.empty_like(xyxy, dtype=np.float32)
+        xywh[:, 0] = (xyxy[:, 0] + xyxy[:, 2]) / 2
+        xywh[:, 1] = (xyxy[:, 1] + xyxy[:, 3]) / 2
+        xywh[:, 2] = xyxy[:, 2] - xyxy[:, 0]
+        xywh[:, 3] = xyxy[:, 3] - xyxy[:, 1]
+        dets = SimpleNamespace(conf=confs, xywh=xywh, cls=np.zeros(n, dtype=np.float32))
+
+        tracks = self._tracker.update(dets, frame)
+        if len(tracks) == 0:
+            # Same fallback as YOLO.track(): untracked boxes keep positional IDs
+            return xyxy, confs, np.arange(n)
+        return tracks[:, :4], tracks[:, 5], tracks[:, 4].astype(int)
+
+    def reset(self):
+        super().reset()
+        self._tracker = self._build()
+
+
+class CentroidTracker(BaseTracker):
+    """
+    Association by mutual nearest centroid, fully vectorized.
+
+    A detection and a live track are matched when each is the other's nearest
+    neighbour and their distance is within `gate` times the detection's box
+    diagonal. Unmatched tracks survive `max_age` frames before removal.
+    """
+
+    name = 'centroid'
+
+    def __init__(self, gate=0.6, max_age=15, velocity_filter=None):
+        super().__init__(velocity_filter)
+        self.gate = gate
+        self.max_age = max_age
+        self._ids = np.empty(0, dtype=int)
+        self._centers = np.empty((0, 2), dtype=np.float64)
+        self._age = np.empty(0, dtype=int)
+
+    def update(self, xyxy, confs, frame=None):
+        n = len(xyxy)
+        centers = np.column_stack([
+            (xyxy[:, 0] + xyxy[:, 2]) / 2,
+            (xyxy[:, 1] + xyxy[:, 3]) / 2,
+        ]) if n else np.empty((0, 2), dtype=np.float64)
+
+        det_ids = np.full(n, -1, dtype=int)
+        matched_tracks = np.zeros(len(self._ids), dtype=bool)
+
+        if n and len(self._ids):
+            diffs = centers[:, np.newaxis, :] - self._centers[np.newaxis, :, :]
+            dists = np.sqrt((diffs ** 2).sum(axis=2))
+            nearest_track = dists.argmin(axis=1)
+            nearest_det = dists.argmin(axis=0)
+            diag = np.hypot(xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1])
+            det_idx = np.arange(n)
+            mutual = nearest_det[nearest_track] == det_idx
+            within = dists[det_idx, nearest_track] <= self.gate * diag
+            ok = mutual & within
+            det_ids[ok] = self._ids[nearest_track[ok]]
+            matched_tracks[nearest_track[ok]] = True
+
+        new = det_ids < 0
+        det_ids[new] = [next(_centroid_ids) for _ in range(int(new.sum()))]
+
+        # Carry unmatched tracks forward until they age out
+        age = self._age + 1
+        keep = ~matched_tracks & (age <= self.max_age)
+        self._ids = np.concatenate([det_ids, self._ids[keep]])
+        self._centers = np.concatenate([centers, self._centers[keep]])
+        self._age = np.concatenate([np.zeros(n, dtype=int), age[keep]])
+
+        return xyxy, confs, det_ids
+
+    def reset(self):
+        super().reset()
+        self._ids = np.empty(0, dtype=int)
+        self._centers = np.empty((0, 2), dtype=np.float64)
+        self._age = np.empty(0, dtype=int)
+
+
+def create_tracker(name=None, frame_rate=30, config=None):
+    """Build a tracker by name, falling back to the default for unknown names."""
+    name = (name or DEFAULT_TRACKER).lower()
+    if name not in TRACKER_CHOICES:
+        name = DEFAULT_TRACKER
+    velocity_filter = VelocityKalman(
+        accel_sigma=getattr(config, 'VELOCITY_KALMAN_ACCEL_PX', 150.0),
+        meas_sigma=getattr(config, 'VELOCITY_KALMAN_MEAS_PX', 3.0),
+    )
+    if name == 'centroid':
+        return CentroidTracker(velocity_filter=velocity_filter)
+    return UltralyticsTracker(name, frame_rate=frame_rate, velocity_filter=velocity_filter)
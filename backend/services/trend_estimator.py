@@ -0,0 +1,109 @@
+"""
+Streaming trend estimation, O(1) per sample.
+
+TrendEstimator keeps, for one metric:
+  - an EMA (alpha=0.3 by default) plus the EMA value from `lag` samples ago,
+    giving the same increasing/decreasing/stable call as recomputing the EMA
+    over the whole history each frame
+  - a time-aware Holt level + slope (units per second) for short-horizon
+    forecasts such as "risk 10 seconds from now"
+
+MetricTrends bundles one estimator per metric for a single camera.
+"""
+
+import time
+from collections import deque
+
+
+class TrendEstimator:
+
+    def __init__(self, alpha=0.3, beta=0.1, lag=5, threshold=0.1, min_samples=10):
+        self.alpha = alpha
+        self.beta = beta
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.n = 0
+        self.ema = 0.0
+        self._ema_lag = deque(maxlen=lag + 1)
+        self.level = 0.0
+        self.slope = 0.0
+        self._last_t = None
+
+    def update(self, value, timestamp=None):
+        value = float(value)
+        t = time.time() if timestamp is None else timestamp
+
+        if self.n == 0:
+            self.ema = value
+            self.level = value
+            self.slope = 0.0
+        else:
+            self.ema = self.alpha * value + (1 - self.alpha) * self.ema
+            dt = t - self._last_t
+            if dt > 0:
+                prev_level = self.level
+                predicted = self.level + self.slope * dt
+                self.level = self.alpha * value + (1 - self.alpha) * predicted
+                self.slope = (self.beta * (self.level - prev_level) / dt
+                              + (1 - self.beta) * self.slope)
+        self._ema_lag.append(self.ema)
+        self._last_t = t
+        self.n += 1
+
+    @property
+    def delta(self):
+        """EMA change over the last `lag` samples."""
+        if len(self._ema_lag) < self._ema_lag.maxlen:
+            return 0.0
+        return self.ema - self._ema_lag[0]
+
+    def direction(self):
+        if self.n < self.min_samples:
+            return 'stable'
+        d = self.delta
+        if d > self.threshold:
+            return 'increasing'
+        if d < -self.threshold:
+            return 'decreasing'
+        return 'stable'
+
+    def forecast(self, horizon_s):
+        """Holt projection `horizon_s` seconds past the last sample."""
+        return self.level + self.slope * horizon_s
+
+    def reset(self):
+        self.n = 0
+        self.ema = 0.0
+        self._ema_lag.clear()
+        self.level = 0.0
+        self.slope = 0.0
+        self._last_t = None
+
+
+class MetricTrends:
+    """Per-camera trend state for density, count, risk and pressure."""
+
+    THRESHOLDS = {
+        'density': 0.1,
+        'count': 2.0,
+        'risk': 0.03,
+        'pressure': 0.03,
+    }
+
+    def __init__(self, alpha=0.3, beta=0.1):
+        self.metrics = {
+            name: TrendEstimator(alpha=alpha, beta=beta, threshold=thr)
+            for name, thr in self.THRESHOLDS.items()
+        }
+
+    def update(self, timestamp=None, **values):
+        for name, value in values.items():
+            if value is not None and name in self.metrics:
+                self.metrics[name].update(value, timestamp)
+
+    def __getitem__(self, name):
+        return self.metrics[name]
+
+    def reset(self):
+        for est in self.metrics.values():
+            est.reset()
@@ -0,0 +1,121 @@
+"""
+Batch constant-velocity Kalman filter for per-track velocity smoothing.
+
+All tracks live in flat arrays indexed by slot; one predict + update over
+every observed track is a handful of numpy expressions per frame.
+
+The x and y axes share the same dynamics, noise and measurement model, so
+their covariances are identical and each slot stores a single 2x2
+(position, velocity) covariance as three scalars instead of a 4x4 matrix.
+"""
+
+import numpy as np
+
+
+class VelocityKalman:
+
+    def __init__(self, accel_sigma=150.0, meas_sigma=3.0, init_vel_sigma=200.0, capacity=256):
+        """
+        Args:
+            accel_sigma: process noise, px/s^2 of unmodelled acceleration
+            meas_sigma: detection center noise, px
+            init_vel_sigma: velocity uncertainty of a newly seen track, px/s
+        """
+        self.q2 = accel_sigma ** 2
+        self.r = meas_sigma ** 2
+        self.v0 = init_vel_sigma ** 2
+        self._slots = {}    # track_id -> slot
+        self._free = []
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.p00 = np.zeros(capacity)
+        self.p01 = np.zeros(capacity)
+        self.p11 = np.zeros(capacity)
+        self.t = np.zeros(capacity)
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def _grow(self):
+        old = len(self.t)
+        arrays = (self.pos, self.vel, self.p00, self.p01, self.p11, self.t)
+        self.pos, self.vel, self.p00, self.p01, self.p11, self.t = (
+            np.concatenate([a, np.zeros_like(a)]) for a in arrays
+        )
+        self._free = list(range(2 * old - 1, old - 1, -1)) + self._free
+
+    def _slot_for(self, track_id):
+        slot = self._slots.get(track_id)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._slots[track_id] = slot
+            return slot, True
+        return slot, False
+
+    def update(self, track_ids, centers, timestamp):
+        """
+        Fold one frame of observations into the filter.
+
+        Args:
+            track_ids: sequence of N track IDs
+            centers: (N, 2) measured centers in px
+            timestamp: frame time in seconds
+
+        Returns (N, 2) smoothed velocities in px/s.
+        """
+        n = len(track_ids)
+        if n == 0:
+            return np.zeros((0, 2))
+        z = np.asarray(centers, dtype=np.float64).reshape(n, 2)
+
+        slots = np.empty(n, dtype=int)
+        new = np.zeros(n, dtype=bool)
+        for k, tid in enumerate(track_ids):
+            slots[k], new[k] = self._slot_for(tid)
+
+        # Initialise new tracks at the measurement, at rest
+        ns = slots[new]
+        self.pos[ns] = z[new]
+        self.vel[ns] = 0.0
+        self.p00[ns] = self.r
+        self.p01[ns] = 0.0
+        self.p11[ns] = self.v0
+        self.t[ns] = timestamp
+
+        s = slots[~new]
+        if len(s):
+            zs = z[~new]
+            dt = np.maximum(timestamp - self.t[s], 0.0)
+
+            # Predict
+            pos = self.pos[s] + self.vel[s] * dt[:, np.newaxis]
+            p00 = self.p00[s] + 2 * dt * self.p01[s] + dt ** 2 * self.p11[s] + self.q2 * dt ** 4 / 4
+            p01 = self.p01[s] + dt * self.p11[s] + self.q2 * dt ** 3 / 2
+            p11 = self.p11[s] + self.q2 * dt ** 2
+
+            # Update (position measured, velocity inferred)
+            k0 = p00 / (p00 + self.r)
+            k1 = p01 / (p00 + self.r)
+            innov = zs - pos
+            self.pos[s] = pos + k0[:, np.newaxis] * innov
+            self.vel[s] = self.vel[s] + k1[:, np.newaxis] * innov
+            self.p00[s] = (1 - k0) * p00
+            self.p01[s] = (1 - k0) * p01
+            self.p11[s] = p11 - k1 * p01
+            self.t[s] = timestamp
+
+        return self.vel[slots].copy()
+
+    def drop(self, track_ids):
+        """Release slots of tracks that are gone."""
+        for tid in track_ids:
+            slot = self._slots.pop(tid, None)
+            if slot is not None:
+                self._free.append(slot)
+
+    def reset(self):
+        self._slots.clear()
+        self._alloc(len(self.t))
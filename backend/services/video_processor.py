@@ -1,23 +1,33 @@
 import cv2
+import itertools
 import os
 import time
 import threading
 from datetime import datetime, timezone
-from backend.extensions import db, socketio
-from backend.models.metric import Metric
+from backend.extensions import db
 from backend.models.recording import Recording
+from backend.services.detection_cache import DetectionCache
+from backend.services.event_bus import METRICS, STATUS, event_bus, frames_topic
+from backend.services.frame_pipeline import FramePipeline, metric_row
+from backend.services.media_clock import MediaClock
+from backend.services.metric_ring import MetricRing
+from backend.services.metric_writer import metric_writer
+from backend.services.persistence_policy import DeadbandPolicy
 from backend.utils.helpers import generate_id
 from backend.utils.logger import get_logger
 
 logger = get_logger('video_processor')
 
+# Distinguishes the runs of all processors, so late events of a stopped run can be told apart
+_RUNS = itertools.count(1)
+
 
 class VideoProcessor:
     """Processes video frames in a background thread, provides MJPEG stream."""
 
     def __init__(self, camera_id, source_path, ai_engine, crowd_analyzer,
                  risk_calculator, alert_manager, app,
-                 area_sqm=100.0, expected_capacity=500):
+                 area_sqm=100.0, expected_capacity=500, tracker=None):
         self.camera_id = camera_id
         self.source_path = source_path
         self.ai_engine = ai_engine
@@ -28,16 +38,21 @@ class VideoProcessor:
         self.area_sqm = area_sqm
         self.expected_capacity = expected_capacity
         self.show_heatmap = False
+        self.pipeline = FramePipeline(
+            camera_id, ai_engine, crowd_analyzer, risk_calculator,
+            area_sqm=area_sqm, expected_capacity=expected_capacity, tracker=tracker,
+        )
 
         self._running = False
+        self.run = 0
         self._thread = None
         self._lock = threading.Lock()
         self._latest_frame = None
         self._latest_metrics = {}
         self._frame_count = 0
-        self._metric_interval = 10
-        self._density_history = []
-        self._risk_history = []
+        self._persist_policy = DeadbandPolicy(ai_engine.config)
+        # Full-rate metrics of the last METRIC_RING_MINUTES (sized per source fps on start)
+        self.ring = MetricRing(1)
         self._video_writer = None
         self._recording_path = None
         self._recording_start = None
@@ -60,7 +75,9 @@ class VideoProcessor:
         if self._running:
             return
         self._running = True
-        self.ai_engine.reset_tracker()
+        self.run = next(_RUNS)
+        self.pipeline.reset(history=True)
+        self._persist_policy.reset()
         self._thread = threading.Thread(target=self._process_loop, daemon=True)
         self._thread.start()
 
@@ -87,73 +104,57 @@ class VideoProcessor:
         if not cap.isOpened():
             logger.error(f"Cannot open video: {self.source_path}")
             self._running = False
-            self._update_camera_status('error')
+            self._publish_status('error')
             return
 
-        self._update_camera_status('processing')
-        socketio.emit('camera_status', {'camera_id': self.camera_id, 'status': 'processing'})
+        self._publish_status('processing')
 
         fps = cap.get(cv2.CAP_PROP_FPS) or 30
         frame_delay = 1.0 / min(fps, 30)
+        clock = MediaClock(cap, self.source_path)
+        ring_minutes = float(self.app.config.get('METRIC_RING_MINUTES', 10))
+        self.ring.resize(ring_minutes * 60 * min(fps, 30))
 
+        recorder = f'recorder_{self.camera_id}'
+        frames = frames_topic(self.camera_id)
         try:
+            # The recording is encoded on its own consumer thread; frames are never
+            # dropped from it, but a stalled encoder only holds the loop for
+            # EVENT_BLOCK_TIMEOUT per frame
+            event_bus.subscribe(
+                recorder, (frames,), lambda topic, payload: self._write_recording_frame(*payload),
+                policy='block', maxsize=int(self.app.config.get('EVENT_RECORDER_QUEUE_SIZE', 30)),
+            )
+            # First pass over a file records detections; later loops replay them
+            self.pipeline.cache = DetectionCache.for_video(
+                self.source_path, self.ai_engine.config, self.pipeline.tracker.name,
+            )
             while self._running:
                 ret, frame = cap.read()
                 if not ret:
+                    if self.pipeline.cache is not None:
+                        self.pipeline.cache.finish()
                     cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    self.ai_engine.reset_tracker()
+                    clock.rewind()
+                    self.pipeline.reset()
                     self._frame_count = 0
                     continue
 
                 self._frame_count += 1
+                frame_ts = clock.tick(cap)
 
-                # Resize large frames
-                h, w = frame.shape[:2]
-                if w > 1280:
-                    scale = 1280 / w
-                    frame = cv2.resize(frame, (1280, int(h * scale)))
-
-                # AI detection + tracking
-                raw_frame, analysis = self.ai_engine.analyze_frame(
-                    frame, self.area_sqm, self.expected_capacity, int(fps)
-                )
-
+                raw_frame, analysis, ml_analysis, risk_score, risk_level = \
+                    self.pipeline.process(frame, frame_ts, fps, frame_index=self._frame_count - 1)
                 detections = analysis.get('detections', [])
 
-                # ML crowd analysis (clustering, anomalies, flow, pressure)
-                ml_analysis = self.crowd_analyzer.analyze(
-                    detections,
-                    self.ai_engine.track_history,
-                    frame.shape,
-                )
-
-                # Risk scoring (enhanced with ML signals)
-                risk_score, risk_level = self.risk_calculator.calculate(
-                    density=analysis['density'],
-                    avg_velocity=analysis['avg_velocity'],
-                    surge_rate=analysis['surge_rate'],
-                    count=analysis['count'],
-                    crowd_pressure=ml_analysis.get('crowd_pressure', 0),
-                    flow_coherence=ml_analysis.get('flow_coherence', 0),
-                )
-
-                # Feed trend prediction
-                self.crowd_analyzer.update_history(
-                    analysis['density'], analysis['count'], risk_score
-                )
-
-                # Track density/risk history for sparkline chart
-                self._density_history.append(analysis['density'])
-                self._risk_history.append(risk_score)
-                if len(self._density_history) > 120:
-                    self._density_history = self._density_history[-120:]
-                    self._risk_history = self._risk_history[-120:]
-                ml_analysis['density_history'] = self._density_history
-                ml_analysis['risk_history'] = self._risk_history
+                # Density/risk history for the sparkline chart, from the ring
+                ml_analysis['density_history'] = self.ring.tail('density', 120)
+                ml_analysis['risk_history'] = self.ring.tail('risk_score', 120)
 
                 # Professional multi-layer annotation
                 annotated = self.ai_engine.annotate_frame(
-                    raw_frame, detections, ml_analysis, risk_level, risk_score
+                    raw_frame, detections, ml_analysis, risk_level, risk_score,
+                    track_history=self.pipeline.tracker.track_history,
                 )
 
                 # Optional heatmap overlay
@@ -162,58 +163,43 @@ class VideoProcessor:
                         annotated, analysis['density_map']
                     )
 
-                # Write annotated frame to recording file
-                self._write_recording_frame(annotated, fps)
+                # Annotated frame to the recorder (not modified after this point)
+                event_bus.publish(frames, (annotated, fps))
 
                 # Encode JPEG
                 _, jpeg = cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, 80])
                 with self._lock:
                     self._latest_frame = jpeg.tobytes()
 
-                metrics = {
-                    'camera_id': self.camera_id,
-                    'count': analysis['count'],
-                    'density': round(analysis['density'], 3),
-                    'avg_velocity': round(analysis['avg_velocity'], 2),
-                    'max_velocity': round(analysis['max_velocity'], 2),
-                    'surge_rate': round(analysis['surge_rate'], 3),
-                    'flow_in': analysis.get('flow_in', 0),
-                    'flow_out': analysis.get('flow_out', 0),
-                    'risk_score': round(risk_score, 3),
-                    'risk_level': risk_level,
-                    'capacity_utilization': round(analysis.get('capacity_utilization', 0), 1),
-                    'num_clusters': ml_analysis.get('num_clusters', 0),
-                    'flow_coherence': ml_analysis.get('flow_coherence', 0),
-                    'crowd_pressure': ml_analysis.get('crowd_pressure', 0),
-                    'num_anomalies': len(ml_analysis.get('anomalies', [])),
-                    'density_trend': ml_analysis.get('trend_prediction', {}).get('density_trend', 'stable'),
-                    'risk_trend': ml_analysis.get('trend_prediction', {}).get('risk_trend', 'stable'),
-                    'frame_number': self._frame_count,
-                    'timestamp': datetime.now(timezone.utc).isoformat(),
-                }
+                metrics = self.pipeline.build_metrics(
+                    analysis, ml_analysis, risk_score, risk_level,
+                    frame_number=self._frame_count,
+                    timestamp=frame_ts,
+                    media_time=clock.media_time if clock.is_file else None,
+                )
                 self._latest_metrics = metrics
+                self.ring.append(frame_ts, metrics)
 
-                socketio.emit('metrics_update', metrics, room=f'camera_{self.camera_id}')
+                # Live updates and alert evaluation run on their own consumers
+                event_bus.publish(METRICS, (self.camera_id, metrics, self._latest_frame))
 
-                if self._frame_count % self._metric_interval == 0:
+                if self._persist_policy.should_persist(metrics, frame_ts):
                     self._save_metric(metrics)
 
-                self.alert_manager.check_and_alert(self.camera_id, metrics, self.app, frame_jpeg=self._latest_frame)
-
                 time.sleep(frame_delay)
 
         except Exception as e:
             logger.error(f"Error processing camera {self.camera_id}: {e}")
         finally:
             cap.release()
+            if self.pipeline.cache is not None:
+                self.pipeline.cache.close()
+                self.pipeline.cache = None
+            # Let the recorder write its queued frames before closing the file
+            event_bus.unsubscribe(recorder)
             self._finalize_recording()
             self._running = False
-            self._update_camera_status('offline')
-            socketio.emit('camera_status', {
-                'camera_id': self.camera_id,
-                'status': 'offline',
-                'recording_id': self._last_recording_id,
-            })
+            self._publish_status('offline', recording_id=self._last_recording_id)
 
     def _write_recording_frame(self, frame, fps):
         """Initialize video writer on first frame, then write each annotated frame."""
@@ -284,34 +270,9 @@ class VideoProcessor:
             logger.error(f"Error finalizing recording: {e}")
 
     def _save_metric(self, metrics):
-        try:
-            with self.app.app_context():
-                m = Metric(
-                    camera_id=metrics['camera_id'],
-                    count=metrics['count'],
-                    density=metrics['density'],
-                    avg_velocity=metrics['avg_velocity'],
-                    max_velocity=metrics['max_velocity'],
-                    surge_rate=metrics['surge_rate'],
-                    flow_in=metrics.get('flow_in', 0),
-                    flow_out=metrics.get('flow_out', 0),
-                    risk_score=metrics['risk_score'],
-                    risk_level=metrics['risk_level'],
-                    capacity_utilization=metrics.get('capacity_utilization', 0),
-                    frame_number=metrics['frame_number'],
-                )
-                db.session.add(m)
-                db.session.commit()
-        except Exception as e:
-            logger.error(f"DB save error: {e}")
+        # Write-behind: the metric writer thread batches rows into bulk inserts
+        metric_writer.enqueue(metric_row(metrics))
 
-    def _update_camera_status(self, status):
-        try:
-            with self.app.app_context():
-                from backend.models.camera import Camera
-                cam = db.session.get(Camera, self.camera_id)
-                if cam:
-                    cam.status = status
-                    db.session.commit()
-        except Exception as e:
-            logger.error(f"Status update error: {e}")
+    def _publish_status(self, status, **extra):
+        # Stored on the camera and emitted as `camera_status` by the status consumers
+        event_bus.publish(STATUS, {'camera_id': self.camera_id, 'status': status, 'run': self.run, **extra})
@@ -1,26 +1,38 @@
 """Background cleanup tasks for data retention."""
 from datetime import datetime, timezone, timedelta
 from backend.extensions import db
-from backend.models.metric import Metric
 from backend.models.system_log import SystemLog
+from backend.services.metric_store import metric_store
 from backend.utils.logger import get_logger
 
 logger = get_logger('cleanup')
 
 
 def cleanup_old_metrics(app, days=30):
-    """Delete metrics older than N days."""
+    """Drop metric day partitions entirely older than N days (rollups are kept). Returns rows removed."""
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
     with app.app_context():
-        deleted = Metric.query.filter(Metric.timestamp < cutoff).delete()
-        db.session.commit()
-        logger.info(f"Cleaned up {deleted} metrics older than {days} days")
+        dropped = metric_store.drop_before(cutoff)
+        rows = sum(dropped.values())
+        logger.info(f"Dropped {len(dropped)} metric partitions ({rows} rows) older than {days} days")
+        return rows
 
 
-def cleanup_old_logs(app, days=90):
-    """Delete system logs older than N days."""
+def cleanup_old_logs(app, days=90, chunk_size=5000):
+    """
+    Delete system logs older than N days in id-chunked transactions, so
+    writers are never locked out for longer than one chunk. Returns rows deleted.
+    """
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    deleted = 0
     with app.app_context():
-        deleted = SystemLog.query.filter(SystemLog.timestamp < cutoff).delete()
-        db.session.commit()
+        while True:
+            ids = [i for (i,) in db.session.query(SystemLog.id)
+                   .filter(SystemLog.timestamp < cutoff).limit(chunk_size)]
+            if not ids:
+                break
+            SystemLog.query.filter(SystemLog.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += len(ids)
         logger.info(f"Cleaned up {deleted} logs older than {days} days")
+        return deleted
@@ -0,0 +1,189 @@
+"""
+Pre-generated previous-day reports.
+
+After the nightly rollup refresh, each camera's previous UTC day is
+summarized and exported once into
+
+    REPORT_CACHE_FOLDER/daily/<camera_id>/<YYYY-MM-DD>/
+
+as manifest.json (summary, row count, files) plus one file per format in
+DAILY_REPORT_FORMATS. CSV/JSONL hold every row of the day; PDF/DOCX/MD are
+rendered by the report pool with the usual REPORT_ROW_LIMIT. The daily
+endpoints serve these files, so morning requests for yesterday's report
+never touch the metric tables. Days whose rows are later replaced
+(re-analysis, re-scoring) are invalidated and regenerated on the next run.
+"""
+import json
+import os
+import shutil
+from datetime import datetime, time, timedelta, timezone
+
+from werkzeug.utils import secure_filename
+
+from backend.extensions import db
+from backend.models.camera import Camera
+from backend.models.metric import Metric
+from backend.services.metric_store import metric_store
+from backend.services.report_jobs import FORMATS, report_service
+from backend.services.rollups import finalize, range_stats, summarize
+from backend.utils.helpers import naive_utc
+from backend.utils.logger import get_logger
+
+logger = get_logger('daily_reports')
+
+STREAM_FORMATS = ('csv', 'jsonl')
+MIMETYPES = {**FORMATS, 'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+MANIFEST = 'manifest.json'
+_RENDER_TIMEOUT = 1800  # seconds to wait for one document render
+
+
+def daily_folder(cfg, camera_id, day=None):
+    """Folder of a camera's daily reports (or of one day's, given `day`)."""
+    path = os.path.join(cfg['REPORT_CACHE_FOLDER'], 'daily', camera_id)
+    return path if day is None else os.path.join(path, day.isoformat())
+
+
+def load_manifest(cfg, camera_id, day):
+    path = os.path.join(daily_folder(cfg, camera_id, day), MANIFEST)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _formats(cfg, formats=None):
+    if formats is None:
+        formats = cfg.get('DAILY_REPORT_FORMATS', 'pdf,csv')
+    if isinstance(formats, str):
+        formats = formats.split(',')
+    formats = [f.strip().lower() for f in formats if f.strip()]
+    unknown = [f for f in formats if f not in MIMETYPES]
+    if unknown:
+        raise ValueError(f"Unsupported daily report formats: {', '.join(unknown)}")
+    return formats
+
+
+def _write_stream(path, chunks):
+    tmp = f'{path}.tmp'
+    size = 0
+    with open(tmp, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+    os.replace(tmp, path)
+    return size
+
+
+def _generate(app, camera, day, formats, max_hold):
+    from backend.services.export_service import RunningSummary, stream_csv, stream_jsonl
+
+    cfg = app.config
+    start = datetime.combine(day, time.min)
+    end = start + timedelta(days=1) - timedelta(microseconds=1)
+    stats = range_stats(camera.id, start, end, resolution='hour', max_hold=max_hold)
+    if 'all' not in stats:
+        return 0, []
+    summary = summarize(finalize(stats['all']))
+
+    folder = daily_folder(cfg, camera.id, day)
+    os.makedirs(folder, exist_ok=True)
+    files = {}
+    for fmt in formats:
+        filename = secure_filename(f'crowdsafe_{camera.name}_{day:%Y%m%d}.{fmt}')
+        path = os.path.join(folder, filename)
+        if fmt in STREAM_FORMATS:
+            running = RunningSummary(max_hold)
+
+            def rows():
+                for row in metric_store.scan(camera.id, start, end):
+                    running.add(row)
+                    yield Metric.row_to_dict(row)
+                following = metric_store.fetch(camera.id, start + timedelta(days=1),
+                                               limit=1, mappings=True)
+                running.hold_until(following[0] if following else None)
+
+            stream = stream_csv if fmt == 'csv' else stream_jsonl
+            size = _write_stream(path, stream(rows(), running))
+        else:
+            records = metric_store.fetch(camera.id, start, end, limit=cfg.get('REPORT_ROW_LIMIT', 5000))
+            job = report_service.submit(app, camera.id, camera.name, fmt, start.isoformat(),
+                                        end.isoformat(), [m.to_dict() for m in records], summary)
+            if not job.done.wait(_RENDER_TIMEOUT) or job.status != 'completed':
+                raise RuntimeError(f"{fmt} report for camera {camera.id} on {day} "
+                                   f"{job.status}: {job.error or 'timed out'}")
+            shutil.copyfile(job.path, path)
+            size = job.size_bytes
+        files[fmt] = {'filename': filename, 'size_bytes': size}
+
+    manifest = {
+        'camera_id': camera.id,
+        'camera_name': camera.name,
+        'day': day.isoformat(),
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'rows': summary['total_records'],
+        'summary': summary,
+        'files': files,
+    }
+    tmp = os.path.join(folder, f'{MANIFEST}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(folder, MANIFEST))
+    return summary['total_records'], list(files)
+
+
+def _prune(cfg, camera_id, keep_days):
+    root = daily_folder(cfg, camera_id)
+    if not os.path.isdir(root):
+        return
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=keep_days)).date().isoformat()
+    for name in os.listdir(root):
+        if name < cutoff:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def generate_daily_reports(app, day=None, formats=None, force=False):
+    """
+    Write the summary and export files of `day` (default: yesterday, UTC)
+    for every camera with data that day. Days already generated are skipped
+    unless `force`. A camera whose reports fail is logged and skipped.
+    Returns {'rows', 'files', 'cameras', 'failed', 'day'}.
+    """
+    with app.app_context():
+        cfg = app.config
+        day = day or (datetime.now(timezone.utc) - timedelta(days=1)).date()
+        formats = _formats(cfg, formats)
+        max_hold = float(cfg.get('METRIC_HEARTBEAT_SECONDS', 30.0))
+        keep_days = int(cfg.get('DAILY_REPORT_KEEP_DAYS', 30))
+
+        rows = files = 0
+        cameras = {}
+        failed = []
+        for camera in db.session.query(Camera).order_by(Camera.id):
+            _prune(cfg, camera.id, keep_days)
+            if not force and load_manifest(cfg, camera.id, day) is not None:
+                continue
+            try:
+                n, written = _generate(app, camera, day, formats, max_hold)
+            except Exception as e:
+                db.session.rollback()
+                failed.append(camera.id)
+                logger.error(f"Daily reports for camera {camera.id} on {day} failed: {e}")
+                continue
+            if written:
+                cameras[camera.id] = n
+                rows += n
+                files += len(written)
+        logger.info(f"Generated {files} daily report files for {day} "
+                    f"({len(cameras)} cameras, {rows} rows, {len(failed)} failed)")
+        return {'day': day.isoformat(), 'rows': rows, 'files': files, 'cameras': cameras,
+                'failed': failed}
+
+
+def invalidate_daily_reports(cfg, camera_id, start, end):
+    """Remove a camera's daily reports for the UTC days overlapping [start, end]."""
+    start, end = naive_utc(start).date(), naive_utc(end).date()
+    day = start
+    while day <= end:
+        shutil.rmtree(daily_folder(cfg, camera_id, day), ignore_errors=True)
+        day += timedelta(days=1)
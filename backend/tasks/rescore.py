@@ -0,0 +1,107 @@
+"""Re-score stored metric history with the current or what-if risk weights."""
+from collections import Counter
+
+import numpy as np
+from sqlalchemy import bindparam, select
+
+from backend.extensions import db
+from backend.services.metric_store import metric_store
+from backend.services.risk_calculator import RiskCalculator
+from backend.services.rollups import rebuild as rebuild_rollups
+from backend.tasks.daily_reports import invalidate_daily_reports
+from backend.utils.helpers import naive_utc
+from backend.utils.logger import get_logger
+
+logger = get_logger('rescore')
+
+WEIGHT_KEYS = {'density': 'RISK_WEIGHT_DENSITY', 'surge': 'RISK_WEIGHT_SURGE',
+               'velocity': 'RISK_WEIGHT_VELOCITY'}
+
+_INPUTS = ('id', 'timestamp', 'density', 'avg_velocity', 'surge_rate', 'count',
+           'crowd_pressure', 'flow_coherence', 'risk_level')
+
+
+def is_what_if(cfg, weights):
+    """Whether `weights` differ from the configured RISK_WEIGHT_* values."""
+    return any(abs(float(v) - float(cfg.get(WEIGHT_KEYS[k]))) > 1e-9 for k, v in (weights or {}).items())
+
+
+def rescore_metrics(app, camera_id, weights=None, start=None, end=None,
+                    chunk_size=5000, dry_run=False):
+    """
+    Recompute risk_score/risk_level for a camera's stored metrics.
+
+    Rows are read partition by partition in id-ordered chunks (keyset, so
+    each chunk is an index range scan) and scored with
+    RiskCalculator.calculate_batch. Scores come from the stored, rounded
+    inputs; rows written before crowd pressure and flow coherence were
+    persisted score those boosts as zero.
+
+    `weights` overrides {'density', 'surge', 'velocity'}; with `dry_run`
+    nothing is written and only the level distribution is reported. Stored
+    scores must agree with live scoring, so writes are refused with
+    weights that differ from the configured RISK_WEIGHT_* values.
+    """
+    with app.app_context():
+        cfg = app.config
+        if not dry_run and is_what_if(cfg, weights):
+            raise ValueError('What-if weights can only be used with dry_run; '
+                             'change RISK_WEIGHT_* to re-score stored history')
+        calculator = RiskCalculator(type('Cfg', (), {k: cfg[k] for k in cfg if k.startswith('RISK_')})())
+        before, after = Counter(), Counter()
+        changed = 0
+        total = 0
+        first_ts = last_ts = None
+
+        for table in metric_store.tables(start, end):
+            last_id = 0
+            while True:
+                q = select(*(table.c[c] for c in _INPUTS)).where(
+                    table.c.camera_id == camera_id, table.c.id > last_id,
+                )
+                if start:
+                    q = q.where(table.c.timestamp >= naive_utc(start))
+                if end:
+                    q = q.where(table.c.timestamp <= naive_utc(end))
+                rows = db.session.execute(q.order_by(table.c.id).limit(chunk_size)).all()
+                if not rows:
+                    break
+
+                ids, stamps, density, velocity, surge, count, pressure, coherence, old_levels = zip(*rows)
+                scores, levels = calculator.calculate_batch(
+                    density, velocity, surge, count,
+                    crowd_pressure=np.nan_to_num(np.array(pressure, dtype=np.float64)),
+                    flow_coherence=np.nan_to_num(np.array(coherence, dtype=np.float64)),
+                    weights=weights,
+                )
+                before.update(old_levels)
+                after.update(levels.tolist())
+                changed += int(sum(a != b for a, b in zip(old_levels, levels)))
+                total += len(rows)
+                last_id = ids[-1]
+                first_ts = min(first_ts or stamps[0], *stamps)
+                last_ts = max(last_ts or stamps[0], *stamps)
+
+                if not dry_run:
+                    db.session.execute(
+                        table.update().where(table.c.id == bindparam('row_id')),
+                        [{'row_id': i, 'risk_score': round(float(s), 3), 'risk_level': lvl}
+                         for i, s, lvl in zip(ids, scores, levels)],
+                    )
+                    db.session.commit()
+
+        if not dry_run and total:
+            rebuild_rollups(camera_id, first_ts, last_ts,
+                            max_hold=cfg.get('METRIC_HEARTBEAT_SECONDS', 30.0))
+            invalidate_daily_reports(cfg, camera_id, first_ts, last_ts)
+        logger.info(f"Rescored {total} metrics for camera {camera_id}"
+                    f"{' (dry run)' if dry_run else ''}: {changed} level changes")
+        return {
+            'camera_id': camera_id,
+            'rows': total,
+            'level_changes': changed,
+            'levels_before': dict(before),
+            'levels_after': dict(after),
+            'dry_run': dry_run,
+        }
+
@@ -1,5 +1,6 @@
 import uuid
 import os
+from datetime import timezone
 
 
 def generate_id(prefix=''):
@@ -12,3 +13,10 @@ def ensure_dir(path):
     """Create directory if it doesn't exist."""
     os.makedirs(path, exist_ok=True)
     return path
+
+
+def naive_utc(dt):
+    """Naive UTC datetime, as stored in the database."""
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
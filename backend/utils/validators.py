@@ -24,6 +24,10 @@ def validate_source_type(source_type):
     return source_type in ('rtsp', 'http', 'file', 'usb')
 
 
+def validate_tracker(tracker):
+    return tracker in ('botsort', 'bytetrack', 'centroid')
+
+
 def sanitize_string(s, max_length=500):
     """Basic string sanitization."""
     if not isinstance(s, str):
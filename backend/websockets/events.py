@@ -26,6 +26,19 @@ def handle_unsubscribe(data):
         leave_room(f'camera_{camera_id}')
 
 
+@socketio.on('subscribe_dashboard')
+def handle_subscribe_dashboard(data=None):
+    from backend.services.live_broadcaster import DASHBOARD_ROOM, live_broadcaster
+    join_room(DASHBOARD_ROOM)
+    emit('dashboard_digest', live_broadcaster.digest())
+
+
+@socketio.on('unsubscribe_dashboard')
+def handle_unsubscribe_dashboard(data=None):
+    from backend.services.live_broadcaster import DASHBOARD_ROOM
+    leave_room(DASHBOARD_ROOM)
+
+
 @socketio.on('get_metrics')
 def handle_get_metrics(data):
     camera_id = data.get('camera_id')
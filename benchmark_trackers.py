@@ -0,0 +1,141 @@
+"""
+Tracker benchmark: replay a video through each tracker and compare cost and quality.
+
+YOLO runs once per frame and its detections are replayed into every tracker,
+so the numbers isolate tracking cost from detection cost.
+
+Reported per tracker:
+  - ms/frame (mean, p95) spent in tracker.update()
+  - unique IDs created
+  - ID switches: a new ID appearing within one box diagonal of where another
+    track vanished in the previous few frames (ground-truth-free proxy)
+  - velocity jitter: mean |dv| between consecutive per-track speed samples (m/s);
+    lower means steadier velocities downstream
+
+Usage:
+    python benchmark_trackers.py path/to/video.mp4 [--trackers botsort,bytetrack,centroid]
+                                 [--max-frames 600] [--json]
+"""
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from config import Config
+from backend.services.ai_engine import CrowdSafeAI
+from backend.services.trackers import TRACKER_CHOICES, create_tracker
+
+SWITCH_WINDOW = 5  # frames a vanished track can be "taken over" by a new ID
+
+
+def read_frames(path, max_frames):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    n = 0
+    try:
+        while n < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            h, w = frame.shape[:2]
+            if w > 1280:
+                frame = cv2.resize(frame, (1280, int(h * 1280 / w)))
+            n += 1
+            yield fps, frame
+    finally:
+        cap.release()
+
+
+def detect_all(ai, path, max_frames):
+    detections = []
+    fps = 30
+    for fps, frame in read_frames(path, max_frames):
+        detections.append(ai.detect(frame))
+    return fps, detections
+
+
+def run_tracker(name, path, detections, fps, pixel_to_meter):
+    tracker = create_tracker(name, frame_rate=int(fps))
+    times = []
+    seen_ids = set()
+    last_pos = {}      # tid -> (cx, cy, diag, frame_idx)
+    last_speed = {}    # tid -> m/s
+    jitter = []
+    switches = 0
+
+    for idx, (_, frame) in enumerate(read_frames(path, len(detections))):
+        xyxy, confs = detections[idx]
+        t0 = time.perf_counter()
+        boxes, _, ids = tracker.update(xyxy, confs, frame)
+        times.append((time.perf_counter() - t0) * 1000)
+
+        frame_tracks = []
+        for box, tid in zip(boxes, ids):
+            cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+            diag = float(np.hypot(box[2] - box[0], box[3] - box[1]))
+            frame_tracks.append((int(tid), cx, cy, diag))
+        current = {t[0] for t in frame_tracks}
+        vanished = [p for tid, p in last_pos.items() if tid not in current]
+
+        for tid, cx, cy, diag in frame_tracks:
+            if tid not in seen_ids:
+                seen_ids.add(tid)
+                if any(np.hypot(cx - p[0], cy - p[1]) < diag for p in vanished):
+                    switches += 1
+            elif tid in last_pos:
+                px, py, _, pidx = last_pos[tid]
+                speed = np.hypot(cx - px, cy - py) * pixel_to_meter * fps / max(idx - pidx, 1)
+                if tid in last_speed:
+                    jitter.append(abs(speed - last_speed[tid]))
+                last_speed[tid] = speed
+            last_pos[tid] = (cx, cy, diag, idx)
+
+        # Forget tracks gone longer than the switch window
+        for tid in [t for t, p in last_pos.items() if p[3] < idx - SWITCH_WINDOW]:
+            del last_pos[tid]
+
+    times = np.array(times) if times else np.zeros(1)
+    return {
+        'tracker': name,
+        'frames': len(detections),
+        'ms_per_frame': round(float(times.mean()), 3),
+        'ms_p95': round(float(np.percentile(times, 95)), 3),
+        'unique_ids': len(seen_ids),
+        'id_switches': switches,
+        'velocity_jitter': round(float(np.mean(jitter)) if jitter else 0.0, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CrowdSafe trackers on a video.')
+    parser.add_argument('video')
+    parser.add_argument('--trackers', default=','.join(TRACKER_CHOICES))
+    parser.add_argument('--max-frames', type=int, default=600)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    ai = CrowdSafeAI(Config)
+    fps, detections = detect_all(ai, args.video, args.max_frames)
+    pixel_to_meter = 1.0 / Config.PIXELS_PER_METER
+
+    results = [run_tracker(name, args.video, detections, fps, pixel_to_meter)
+               for name in args.trackers.split(',') if name in TRACKER_CHOICES]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = f"{'tracker':<10} {'frames':>6} {'ms/frame':>9} {'p95':>8} {'ids':>6} {'switches':>9} {'jitter':>8}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['tracker']:<10} {r['frames']:>6} {r['ms_per_frame']:>9.3f} {r['ms_p95']:>8.3f} "
+              f"{r['unique_ids']:>6} {r['id_switches']:>9} {r['velocity_jitter']:>8.4f}")
+
+
+if __name__ == '__main__':
+    main()
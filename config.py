@@ -21,29 +21,89 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
     RECORDING_FOLDER = os.path.join(BASE_DIR, 'recordings')
     MODEL_FOLDER = os.path.join(BASE_DIR, 'models')
+    DETECTION_CACHE_FOLDER = os.path.join(BASE_DIR, 'cache', 'detections')
+    REPORT_CACHE_FOLDER = os.path.join(BASE_DIR, 'cache', 'reports')
 
     # YOLO / AI
     YOLO_MODEL = os.environ.get('MODEL_PATH', 'yolo11s.pt')
     YOLO_CONFIDENCE = float(os.environ.get('YOLO_CONFIDENCE', '0.25'))
     YOLO_IOU = float(os.environ.get('YOLO_IOU', '0.5'))
     YOLO_IMGSZ = int(os.environ.get('YOLO_IMGSZ', '960'))
+    YOLO_DEVICE = os.environ.get('YOLO_DEVICE', '')  # '' = auto, 'cpu', '0', 'cuda:1', ...
     YOLO_MIN_BOX_AREA = int(os.environ.get('YOLO_MIN_BOX_AREA', '100'))
     YOLO_MAX_BOX_RATIO = float(os.environ.get('YOLO_MAX_BOX_RATIO', '5.0'))
+    TRACKER = os.environ.get('TRACKER', 'botsort')  # botsort, bytetrack, centroid
+    DETECTION_CACHE_ENABLED = os.environ.get('DETECTION_CACHE_ENABLED', 'True').lower() == 'true'
     DENSE_CROWD_THRESHOLD = 50
     GRID_SIZE = 50
     OCCLUSION_FACTOR = 1.3
 
     # ML / Crowd Analysis
     PROXIMITY_THRESHOLD_PX = 80
+    MAX_PROXIMITY_ALERTS = 200
     CLUSTER_MIN_SAMPLES = 2
     CLUSTER_EPS_PX = 120
     ANOMALY_VELOCITY_ZSCORE = 2.0
     COHERENCE_WINDOW = 10
+    TREND_FORECAST_SECONDS = 10
+
+    # Kalman velocity smoothing (per-track constant-velocity model)
+    VELOCITY_KALMAN_ACCEL_PX = 150.0  # process noise, px/s^2
+    VELOCITY_KALMAN_MEAS_PX = 3.0     # detection center noise, px
+
+    # Optical-flow motion (replaces per-person tracking in very dense scenes)
+    OPTICAL_FLOW_THRESHOLD = int(os.environ.get('OPTICAL_FLOW_THRESHOLD', '300'))
+    OPTICAL_FLOW_WIDTH = 320   # downscaled frame width for flow
+    OPTICAL_FLOW_CELL = 16     # pooling cell size in downscaled px
 
     # Processing
     PROCESS_FPS = 15
     FRAME_SKIP = 2
 
+    # Offline batch analysis of uploaded recordings
+    BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    BATCH_SEGMENT_SECONDS = 300  # target segment length per worker task
+    BATCH_WARMUP_SECONDS = 3     # overlap analysed before each segment, not stored
+
+    # Background PDF/DOCX/MD report generation
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '2'))
+    REPORT_CACHE_MAX_FILES = 200  # generated reports kept on disk
+    REPORT_JOB_TTL = 3600         # seconds a finished report job stays downloadable
+    REPORT_JOB_MAX_FINISHED = 500  # finished report jobs kept in the registry
+    REPORT_ROW_LIMIT = 5000       # metric rows in a PDF/DOCX/MD report
+
+    # Nightly maintenance (cron hour in SCHEDULER_TIMEZONE)
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'True').lower() == 'true'
+    SCHEDULER_TIMEZONE = os.environ.get('SCHEDULER_TIMEZONE', 'UTC')
+    NIGHTLY_HOUR = int(os.environ.get('NIGHTLY_HOUR', '2'))
+    METRIC_RETENTION_DAYS = 30
+    LOG_RETENTION_DAYS = 90
+    DAILY_REPORT_FORMATS = os.environ.get('DAILY_REPORT_FORMATS', 'pdf,csv')
+    DAILY_REPORT_KEEP_DAYS = 30
+
+    # Metric persistence: store a row when a value leaves its deadband around the
+    # last stored row, on every risk-level change, and at least every heartbeat
+    METRIC_DEADBAND_COUNT = 2
+    METRIC_DEADBAND_DENSITY = 0.1
+    METRIC_DEADBAND_RISK = 0.02
+    METRIC_HEARTBEAT_SECONDS = 30.0
+    METRIC_MIN_INTERVAL_SECONDS = 0.1
+
+    # Write-behind buffer
+    METRIC_FLUSH_SIZE = 500       # rows per bulk insert
+    METRIC_FLUSH_INTERVAL = 2.0   # max seconds a row waits before being flushed
+    METRIC_RING_MINUTES = 10      # minutes of full-rate live metrics kept in memory per camera
+    METRIC_QUEUE_MAX = 100000     # rows buffered before new ones are dropped
+
+    # Live Socket.IO updates
+    LIVE_METRICS_MAX_HZ = 4          # max metrics_update events per second per camera
+    DASHBOARD_DIGEST_SECONDS = 2.0   # interval of the combined dashboard_digest event
+
+    # In-process event bus between the frame loops and their I/O consumers
+    EVENT_QUEUE_SIZE = 256           # events buffered per consumer
+    EVENT_RECORDER_QUEUE_SIZE = 30   # annotated frames buffered per recording camera
+    EVENT_BLOCK_TIMEOUT = 2.0        # max seconds a blocking consumer may hold a frame loop
+
     # Risk thresholds
     DENSITY_SAFE = 2.0
     DENSITY_CAUTION = 4.0
@@ -38,7 +38,9 @@ function getDateRange() {
     if (customStart && customEnd) {
         return { start: customStart, end: customEnd };
     }
-    const now = new Date();
+    // Open-ended ranges starting on a whole minute keep the same URL for a
+    // minute, so refreshes can be answered with 304 Not Modified
+    const now = Math.floor(Date.now() / 60000) * 60000;
     let start = null;
     switch (currentRange) {
         case '1h':  start = new Date(now - 3600 * 1000); break;
@@ -47,7 +49,16 @@ function getDateRange() {
         case '30d': start = new Date(now - 30 * 86400 * 1000); break;
         case 'all': return {};
     }
-    return start ? { start: start.toISOString(), end: now.toISOString() } : {};
+    return start ? { start: start.toISOString() } : {};
+}
+
+function aggregateInterval(range) {
+    const start = range.start ? new Date(range.start) : null;
+    const end = range.end ? new Date(range.end) : new Date();
+    if (!start) return 'daily';
+    const days = (end - start) / 86400000;
+    if (days <= 3) return 'hourly';
+    return days <= 90 ? 'daily' : 'weekly';
 }
 
 function selectRange(range) {
@@ -85,21 +96,20 @@ async function loadAnalytics() {
     let params = new URLSearchParams();
     if (range.start) params.set('start', range.start);
     if (range.end) params.set('end', range.end);
-    params.set('limit', '2000');
-
-    const qs = params.toString();
+    params.set('interval', aggregateInterval(range));
+    // Shape-preserving downsample keeps long ranges at a fixed chart size
+    params.set('points', '1000');
 
     try {
-        const [metricsRes, summaryRes] = await Promise.all([
-            apiFetch('/api/metrics/' + camId + '?' + qs),
-            apiFetch('/api/metrics/' + camId + '/summary?' + qs),
-        ]);
-        const metrics = await metricsRes.json();
-        const summary = await summaryRes.json();
-
-        updateSummary(summary);
-        updateCharts(metrics);
-        updateDataTable(metrics);
+        // One bundle (summary, aggregates, risk distribution, series); the
+        // browser revalidates it with its ETag
+        const res = await apiFetch('/api/metrics/' + camId + '/analytics?' + params.toString());
+        const bundle = await res.json();
+
+        updateSummary(bundle.summary);
+        updateRiskDistribution(bundle.risk_distribution);
+        updateCharts(bundle.series);
+        updateDataTable(bundle.series);
     } catch (err) {
         console.error('Analytics load error:', err);
     }
@@ -122,6 +132,34 @@ function updateSummary(summary) {
     el('sumTotalRecords', String(summary.total_records || 0));
 }
 
+const RISK_LEVEL_COLORS = {
+    'SAFE': '#00e676',
+    'CAUTION': '#ffd60a',
+    'WARNING': '#ff9500',
+    'CRITICAL': '#ff3b5c',
+};
+
+function updateRiskDistribution(dist) {
+    const bar = document.getElementById('riskDistBar');
+    const text = document.getElementById('riskDistText');
+    if (!bar || !text) return;
+    while (bar.firstChild) bar.removeChild(bar.firstChild);
+
+    const parts = [];
+    Object.keys(RISK_LEVEL_COLORS).forEach(level => {
+        const pct = (dist && dist[level]) ? dist[level].percent : 0;
+        if (pct <= 0) return;
+        const seg = document.createElement('div');
+        seg.className = 'progress-bar';
+        seg.style.width = pct + '%';
+        seg.style.background = RISK_LEVEL_COLORS[level];
+        seg.title = level + ': ' + pct.toFixed(1) + '%';
+        bar.appendChild(seg);
+        parts.push(level + ' ' + pct.toFixed(1) + '%');
+    });
+    text.textContent = parts.length ? parts.join(' \u00B7 ') : 'No data';
+}
+
 /* ---------- Charts ---------- */
 
 function updateCharts(metrics) {
@@ -220,13 +258,6 @@ function updateDataTable(metrics) {
         return;
     }
 
-    const levelColors = {
-        'CRITICAL': '#ff3b5c',
-        'WARNING': '#ff9500',
-        'CAUTION': '#ffd60a',
-        'SAFE': '#00e676',
-    };
-
     // Show most recent first in table
     const sorted = [...metrics].reverse();
 
@@ -261,7 +292,7 @@ function updateDataTable(metrics) {
         const tdLevel = document.createElement('td');
         const badge = document.createElement('span');
         badge.className = 'badge';
-        badge.style.background = levelColors[m.risk_level] || '#64748b';
+        badge.style.background = RISK_LEVEL_COLORS[m.risk_level] || '#64748b';
         badge.style.color = '#000';
         badge.style.fontSize = '0.7rem';
         badge.textContent = m.risk_level || 'SAFE';
@@ -274,6 +305,16 @@ function updateDataTable(metrics) {
 
 /* ---------- Export ---------- */
 
+async function waitForReport(jobId, headers) {
+    const statusUrl = '/api/metrics/reports/' + jobId;
+    for (;;) {
+        await new Promise(r => setTimeout(r, 1000));
+        const job = await (await fetch(statusUrl, { headers })).json();
+        if (job.status === 'completed') return fetch(statusUrl + '/download', { headers });
+        if (job.status === 'failed' || job.error) throw new Error(job.error || 'Report failed');
+    }
+}
+
 function exportData(format) {
     const camId = document.getElementById('cameraSelect').value;
     if (!camId) {
@@ -288,10 +329,17 @@ function exportData(format) {
     if (range.end) params.set('end', range.end);
 
     const token = localStorage.getItem('access_token');
+    const headers = token ? { 'Authorization': 'Bearer ' + token } : {};
     const url = '/api/metrics/' + camId + '/export?' + params.toString();
 
-    fetch(url, {
-        headers: token ? { 'Authorization': 'Bearer ' + token } : {}
+    fetch(url, { headers })
+    .then(res => {
+        // PDF/DOCX/MD render as a background job unless already cached
+        if (res.status === 202) {
+            if (typeof showToast === 'function') showToast('Generating ' + format.toUpperCase() + ' report...', 'info');
+            return res.json().then(job => waitForReport(job.job_id, headers));
+        }
+        return res;
     })
     .then(res => {
         if (!res.ok) throw new Error('Export failed');
@@ -7,14 +7,7 @@ async function loadDashboard() {
 async function loadStats() {
     try {
         const res = await apiFetch('/api/metrics/summary');
-        const d = await res.json();
-        setText('totalPeople', String(d.total_people || 0));
-        setText('activeCameras', String(d.cameras_active || 0));
-        const riskEl = document.getElementById('maxRisk');
-        if (riskEl) {
-            riskEl.textContent = d.max_risk_level || 'SAFE';
-            riskEl.className = 'stat-value ' + riskClass(d.max_risk_level);
-        }
+        renderSummary(await res.json());
     } catch { /* ignore */ }
 
     try {
@@ -25,68 +18,83 @@ async function loadStats() {
 
     try {
         const res3 = await apiFetch('/api/system/stats');
-        const d3 = await res3.json();
-        setText('statCamTotal', String(d3.cameras_total || 0));
-        setText('statMetrics', String(d3.metrics_recorded || 0));
+        renderTotals(await res3.json());
     } catch { /* ignore */ }
 }
 
+function renderSummary(d) {
+    setText('totalPeople', String(d.total_people || 0));
+    setText('activeCameras', String(d.cameras_active || 0));
+    const riskEl = document.getElementById('maxRisk');
+    if (riskEl) {
+        riskEl.textContent = d.max_risk_level || 'SAFE';
+        riskEl.className = 'stat-value ' + riskClass(d.max_risk_level);
+    }
+}
+
+function renderTotals(d) {
+    setText('statCamTotal', String(d.cameras_total || 0));
+    setText('statMetrics', String(d.metrics_recorded || 0));
+}
+
 async function loadCameraGrid() {
+    try {
+        const res = await apiFetch('/api/cameras');
+        renderCameraGrid(await res.json());
+    } catch { /* ignore */ }
+}
+
+function renderCameraGrid(cameras) {
     const grid = document.getElementById('cameraGrid');
     const empty = document.getElementById('emptyState');
     if (!grid) return;
 
-    try {
-        const res = await apiFetch('/api/cameras');
-        const cameras = await res.json();
-        const active = cameras.filter(c => c.is_processing);
-
-        if (active.length === 0) {
-            if (empty) empty.style.display = '';
-            return;
+    const active = cameras.filter(c => c.is_processing);
+    const existingTiles = grid.querySelectorAll('.cam-tile-wrap');
+    const activeIds = new Set(active.map(c => c.id));
+    existingTiles.forEach(t => { if (!activeIds.has(t.dataset.camId)) t.remove(); });
+
+    if (active.length === 0) {
+        if (empty) empty.style.display = '';
+        return;
+    }
+    if (empty) empty.style.display = 'none';
+
+    active.forEach(cam => {
+        let wrap = grid.querySelector('[data-cam-id="' + cam.id + '"]');
+        if (!wrap) {
+            wrap = document.createElement('div');
+            wrap.className = 'col-md-6 col-xl-4 cam-tile-wrap';
+            wrap.dataset.camId = cam.id;
+
+            const tile = document.createElement('div');
+            tile.className = 'camera-tile';
+            tile.addEventListener('click', () => { window.location.href = '/camera/' + cam.id; });
+
+            const img = document.createElement('img');
+            img.className = 'camera-thumb';
+            img.alt = cam.name || cam.id;
+            img.src = '/api/cameras/' + cam.id + '/stream';
+
+            const info = document.createElement('div');
+            info.className = 'camera-tile-info';
+            const name = document.createElement('span');
+            name.textContent = cam.name || cam.id;
+            const meta = document.createElement('span');
+            meta.className = 'camera-tile-meta tile-meta';
+            info.appendChild(name);
+            info.appendChild(meta);
+
+            tile.appendChild(img);
+            tile.appendChild(info);
+            wrap.appendChild(tile);
+            grid.appendChild(wrap);
         }
-        if (empty) empty.style.display = 'none';
-
-        const existingTiles = grid.querySelectorAll('.cam-tile-wrap');
-        const activeIds = new Set(active.map(c => c.id));
-        existingTiles.forEach(t => { if (!activeIds.has(t.dataset.camId)) t.remove(); });
-
-        active.forEach(cam => {
-            let wrap = grid.querySelector('[data-cam-id="' + cam.id + '"]');
-            if (!wrap) {
-                wrap = document.createElement('div');
-                wrap.className = 'col-md-6 col-xl-4 cam-tile-wrap';
-                wrap.dataset.camId = cam.id;
-
-                const tile = document.createElement('div');
-                tile.className = 'camera-tile';
-                tile.addEventListener('click', () => { window.location.href = '/camera/' + cam.id; });
-
-                const img = document.createElement('img');
-                img.className = 'camera-thumb';
-                img.alt = cam.name || cam.id;
-                img.src = '/api/cameras/' + cam.id + '/stream';
-
-                const info = document.createElement('div');
-                info.className = 'camera-tile-info';
-                const name = document.createElement('span');
-                name.textContent = cam.name || cam.id;
-                const meta = document.createElement('span');
-                meta.className = 'camera-tile-meta tile-meta';
-                info.appendChild(name);
-                info.appendChild(meta);
-
-                tile.appendChild(img);
-                tile.appendChild(info);
-                wrap.appendChild(tile);
-                grid.appendChild(wrap);
-            }
-            const meta = wrap.querySelector('.tile-meta');
-            if (meta && cam.current_metrics) {
-                meta.textContent = (cam.current_metrics.count || 0) + ' people | ' + (cam.current_metrics.risk_level || 'SAFE');
-            }
-        });
-    } catch { /* ignore */ }
+        const meta = wrap.querySelector('.tile-meta');
+        if (meta && cam.current_metrics) {
+            meta.textContent = (cam.current_metrics.count || 0) + ' people | ' + (cam.current_metrics.risk_level || 'SAFE');
+        }
+    });
 }
 
 async function loadAlertFeed() {
@@ -133,9 +141,19 @@ async function loadAlertFeed() {
 }
 
 function setupDashSocket() {
-    if (!CS.socket) return;
-    CS.socket.on('metrics_update', () => { loadStats(); loadCameraGrid(); });
+    if (!CS.socket) return false;
+    // One digest every few seconds replaces polling the stats and camera endpoints
+    const subscribe = () => CS.socket.emit('subscribe_dashboard');
+    CS.socket.on('connect', subscribe);
+    if (CS.socket.connected) subscribe();
+    CS.socket.on('dashboard_digest', (d) => {
+        renderSummary(d.stats);
+        renderTotals(d.stats);
+        setText('unackAlerts', String(d.stats.alerts_unacknowledged || 0));
+        renderCameraGrid(d.cameras);
+    });
     CS.socket.on('new_alert', () => { loadAlertFeed(); });
+    return true;
 }
 
 function setText(id, text) { const el = document.getElementById(id); if (el) el.textContent = text; }
@@ -147,6 +165,5 @@ function fmtTime(ts) {
 
 document.addEventListener('DOMContentLoaded', () => {
     loadDashboard();
-    setupDashSocket();
-    setInterval(loadStats, 5000);
+    if (!setupDashSocket()) setInterval(loadStats, 5000);
 });